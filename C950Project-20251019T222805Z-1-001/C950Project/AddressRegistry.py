@@ -0,0 +1,166 @@
+# This class interns delivery addresses to integer ids.
+# Addresses are normalized (case, whitespace, punctuation and common abbreviations) so that
+# "410 S State St" and "410 South State Street" resolve to the same id with one dictionary lookup.
+import csv
+import re
+
+# Spellings that are folded to a single canonical token
+ABBREVIATIONS = {
+    "n": "north", "s": "south", "e": "east", "w": "west",
+    "st": "street", "ave": "avenue", "av": "avenue", "blvd": "boulevard", "rd": "road",
+    "dr": "drive", "ln": "lane", "pkwy": "parkway", "ct": "court", "hwy": "highway",
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_address(text):
+    """
+    Normalizes an address for comparison.
+
+    Parameters:
+    text (str): The address as written (e.g., '410 S State St').
+
+    Returns:
+    str: The normalized address (e.g., '410 south state street').
+    """
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    return " ".join(ABBREVIATIONS.get(token, token) for token in tokens)
+
+
+class AddressRegistry:
+    def __init__(self):
+        """
+        Creates an empty address registry.
+        """
+        self.ids = {}  # Normalized address -> address id
+        self.addresses = {}  # Address id -> address as originally written
+        self.tokens = {}  # Address id -> set of its normalized tokens
+        self.token_index = {}  # Normalized token -> set of address ids containing it (fuzzy fallback)
+
+    def __len__(self):
+        """
+        Returns the number of registered addresses.
+        """
+        return len(self.addresses)
+
+    def __contains__(self, text_address):
+        """
+        Returns True if the address resolves to a registered id.
+        """
+        return self.get(text_address) is not None
+
+    def add(self, address_id, text_address):
+        """
+        Registers an address under the given id.
+
+        Parameters:
+        address_id (int): The id of the address.
+        text_address (str): The address as written.
+        """
+        normalized = normalize_address(text_address)
+        self.ids.setdefault(normalized, address_id)
+        self.addresses[address_id] = text_address
+        self.tokens[address_id] = frozenset(normalized.split())
+        for token in self.tokens[address_id]:
+            self.token_index.setdefault(token, set()).add(address_id)
+
+    def address(self, address_id):
+        """
+        Returns the address registered under an id, as originally written.
+        """
+        return self.addresses[address_id]
+
+    def get(self, text_address):
+        """
+        Finds the id of an address, or returns None if it cannot be resolved.
+
+        An exact match on the normalized address is tried first, then the street line alone
+        (text before the first comma), then the registered address sharing the most tokens
+        with the same house number.
+
+        Parameters:
+        text_address (str): The address to search for.
+
+        Returns:
+        int: The id of the address, or None.
+        """
+        normalized = normalize_address(text_address)
+        address_id = self.ids.get(normalized)
+        if address_id is not None:
+            return address_id
+        address_id = self.ids.get(normalize_address(text_address.split(",")[0]))
+        if address_id is not None:
+            return address_id
+        return self._fuzzy_lookup(normalized)
+
+    def lookup(self, text_address):
+        """
+        Finds the id of an address.
+
+        Parameters:
+        text_address (str): The address to search for.
+
+        Returns:
+        int: The id of the address.
+
+        Raises:
+        ValueError: If the address cannot be located in the registry.
+        """
+        address_id = self.get(text_address)
+        if address_id is None:
+            raise ValueError(f"Address '{text_address}' could not be located")
+        return address_id
+
+    def _fuzzy_lookup(self, normalized):
+        """
+        Returns the registered address with the highest token overlap, or None if no address shares the
+        house number and at least half of its tokens.
+        """
+        tokens = set(normalized.split())
+        if not tokens:
+            return None
+        house_number = normalized.split()[0]
+        candidates = self.token_index.get(house_number, set()) if house_number.isdigit() else set()
+        if not house_number.isdigit():
+            for token in tokens:
+                candidates |= self.token_index.get(token, set())
+
+        best_id, best_score = None, 0.0
+        for address_id in sorted(candidates):
+            candidate_tokens = self.tokens[address_id]
+            score = len(tokens & candidate_tokens) / len(candidate_tokens)
+            if score >= 0.5 and score > best_score:
+                best_id, best_score = address_id, score
+        return best_id
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds a registry from 'id,address' rows.
+
+        Parameters:
+        rows (iterable of list of str): The rows of the address file.
+
+        Returns:
+        AddressRegistry: The populated registry.
+        """
+        registry = cls()
+        for row in rows:
+            if len(row) >= 2 and row[0].strip():
+                registry.add(int(row[0]), row[1].strip())
+        return registry
+
+    @classmethod
+    def from_csv(cls, filepath):
+        """
+        Loads a registry from an 'id,address' CSV file such as CSV/Addresses.csv.
+
+        Parameters:
+        filepath (str): The path to the CSV file containing address data.
+
+        Returns:
+        AddressRegistry: The populated registry.
+        """
+        with open(filepath, newline='', encoding='utf-8-sig') as csvfile:
+            return cls.from_rows(csv.reader(csvfile))
@@ -0,0 +1,283 @@
+# This module measures the planner on synthetic datasets written by DataGenerator.
+# For each size it times CSV ingest, the shortest-path precomputation, the compiled cache, hash table
+# operations, address lookups, route planning, a vectorized replay of the planned routes (FleetState) and
+# status queries. It records the peak memory of the process and the quality of the plan (mileage and share of
+# packages delivered on time). The results are written as JSON.
+# Each size runs in a fresh process, so the peak memory of one size does not hide the next.
+# With --baseline, the results are compared with an earlier run. The exit status is 1 when a stage got
+# slower, or the plan got worse, by more than the allowed tolerance.
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak memory is then not reported
+    resource = None
+
+import numpy as np
+
+from DataGenerator import generate
+from DeliveryPlanner import Dataset, default_trucks, plan
+from FleetState import FleetState
+from HashTableCreation import HashMapCreation
+from TimeModel import clock
+
+# Package counts measured by default, with the number of addresses generated for each
+DEFAULT_SIZES = (100, 10000, 1000000)
+ADDRESSES_FOR_SIZE = {100: 30, 10000: 500, 1000000: 2000}
+
+# Packages each truck is expected to deliver over the day (about four trips of 16)
+PACKAGES_PER_TRUCK = 64
+
+# Status queries timed per size (random packages at random times)
+STATUS_QUERIES = 10000
+
+# Seconds the route optimizer may spend on each trip
+ROUTE_TIME_LIMIT = 0.05
+
+# A stage only counts as slower when it took longer than this many seconds (shorter ones are mostly noise)
+MIN_REGRESSION_SECONDS = 0.05
+
+# Default tolerances for --baseline: a stage may take 50% longer, mileage may grow by 2%, and the on-time
+# share may drop by half a percentage point
+TIME_TOLERANCE = 0.5
+MILEAGE_TOLERANCE = 0.02
+ON_TIME_TOLERANCE = 0.5
+
+
+def addresses_for(packages):
+    """
+    Returns the number of addresses generated for a package count: the table value, else about
+    one address per five packages, between 30 and 2000.
+    """
+    if packages in ADDRESSES_FOR_SIZE:
+        return ADDRESSES_FOR_SIZE[packages]
+    return max(30, min(2000, packages // 5))
+
+
+def _peak_memory_mb():
+    """
+    Returns the peak resident memory of this process in MB (None where it cannot be read).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+class _Stages:
+    """
+    Records the wall time and peak memory after each stage.
+    """
+    def __init__(self):
+        self.results = {}
+
+    def time(self, name, function, *args, operations=None):
+        start = time.perf_counter()
+        value = function(*args)
+        seconds = time.perf_counter() - start
+        result = {"seconds": round(seconds, 4), "peak_memory_mb": _peak_memory_mb()}
+        if operations:
+            result["operations"] = operations
+            result["operations_per_second"] = round(operations / seconds) if seconds > 0 else None
+        self.results[name] = result
+        return value
+
+
+def run_size(packages, addresses=None, seed=0, directory=None):
+    """
+    Generates a dataset and measures every stage on it.
+
+    Parameters:
+    packages (int): Number of packages.
+    addresses (int): Number of addresses (default: addresses_for(packages)).
+    seed (int): Seed for the generator and the random queries.
+    directory (str): Where to write the CSV files (default: a temporary directory, removed afterwards).
+
+    Returns:
+    dict: packages, addresses, trucks, stages (name -> seconds, peak_memory_mb and, for repeated operations,
+        operations per second) and quality (total_mileage, on_time_percent, late, undelivered, unassigned).
+    """
+    addresses = addresses or addresses_for(packages)
+    if directory is None:
+        with tempfile.TemporaryDirectory(prefix="c950bench") as temporary:
+            return run_size(packages, addresses, seed, temporary)
+
+    stages = _Stages()
+    paths = stages.time("generate", generate, directory, addresses, packages, seed)
+    dataset = Dataset(*paths)
+    stages.time("ingest", lambda: (dataset.address_registry, dataset.distance_matrix, dataset.hash_table),
+                operations=packages)
+    stages.time("shortest_paths", lambda: dataset.shortest_paths, operations=addresses)
+    cache_path = os.path.join(directory, "dataset.c950cache")
+    stages.time("cache_write", dataset.save_cache, cache_path)
+    stages.time("cache_load", lambda: Dataset(*paths, cache_path=cache_path).hash_table)
+
+    rng = np.random.default_rng(seed)
+    parcels = [parcel for _, parcel in dataset.hash_table.items()]
+    keys = rng.permutation([parcel.parcel_id for parcel in parcels]).tolist()
+    table = HashMapCreation()
+    stages.time("hash_insert", lambda: [table.insert(parcel.parcel_id, parcel) for parcel in parcels],
+                operations=len(parcels))
+    stages.time("hash_lookup", lambda: [table.lookup(key) for key in keys], operations=len(keys))
+    stages.time("hash_update", lambda: [table.update(parcel) for parcel in parcels], operations=len(parcels))
+    stages.time("hash_remove", lambda: [table.remove_item(key) for key in keys], operations=len(keys))
+
+    texts = [parcel.delivery_address for parcel in parcels[:STATUS_QUERIES]]
+    stages.time("address_lookup", lambda: [dataset.find_address_id(text) for text in texts], operations=len(texts))
+
+    truck_count = max(3, math.ceil(packages / PACKAGES_PER_TRUCK))
+    trucks = default_trucks(dataset, [clock(8)] * truck_count)
+    delivery_plan = stages.time("plan", lambda: plan(dataset, trucks, events=[], drivers=None, partition=True,
+                                                     time_limit=ROUTE_TIME_LIMIT, seed=seed))
+
+    # Drive every planned trip again, all trucks one leg per step
+    fleet = FleetState.from_trips(delivery_plan.trucks, delivery_plan.simulation.trips, dataset.shortest_paths)
+    stages.time("fleet_replay", fleet.run, operations=int(fleet.remaining_stops().sum()))
+
+    query_ids = rng.choice(keys, min(STATUS_QUERIES, len(keys))).tolist()
+    query_times = rng.integers(clock(8), clock(17), len(query_ids)).tolist()
+    stages.time("status_query", lambda: [delivery_plan.package_status(parcel_id, query_time)
+                                         for parcel_id, query_time in zip(query_ids, query_times)],
+                operations=len(query_ids))
+    stages.time("status_all", delivery_plan.all_package_status, clock(10, 30), operations=packages)
+
+    late = len(delivery_plan.late_packages())
+    return {
+        "packages": packages,
+        "addresses": addresses,
+        "trucks": truck_count,
+        "stages": stages.results,
+        "peak_memory_mb": _peak_memory_mb(),
+        "quality": {
+            "total_mileage": round(delivery_plan.total_mileage, 1),
+            "on_time_percent": round(100 * (packages - late) / packages, 2) if packages else 100.0,
+            "late": late,
+            "undelivered": len(delivery_plan.simulation.undelivered),
+            "unassigned": len(delivery_plan.unassigned),
+        },
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, seed=0, isolate=True):
+    """
+    Runs run_size for every size.
+
+    Parameters:
+    sizes (iterable of int): Package counts.
+    seed (int): Seed for the generated data.
+    isolate (bool): Run each size in a fresh process so peak memory is measured per size.
+
+    Returns:
+    dict: The environment and one run_size result per size.
+    """
+    results = []
+    for packages in sizes:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                results.append(executor.submit(run_size, packages, None, seed).result())
+        else:
+            results.append(run_size(packages, seed=seed))
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(report, baseline, time_tolerance=TIME_TOLERANCE, mileage_tolerance=MILEAGE_TOLERANCE,
+            on_time_tolerance=ON_TIME_TOLERANCE):
+    """
+    Compares a benchmark report with a baseline report. Only sizes present in both are compared.
+
+    Parameters:
+    report (dict): The new run_benchmarks result.
+    baseline (dict): An earlier result.
+    time_tolerance (float): Allowed relative growth of a stage's time.
+    mileage_tolerance (float): Allowed relative growth of total mileage.
+    on_time_tolerance (float): Allowed drop of the on-time share, in percentage points.
+
+    Returns:
+    list of str: One message per regression (empty if there is none).
+    """
+    previous_by_size = {result["packages"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        previous = previous_by_size.get(result["packages"])
+        if previous is None:
+            continue
+        label = f"{result['packages']} packages"
+        for name, stage in result["stages"].items():
+            before = previous["stages"].get(name)
+            if before is None or stage["seconds"] < MIN_REGRESSION_SECONDS:
+                continue
+            if stage["seconds"] > before["seconds"] * (1 + time_tolerance):
+                regressions.append(f"{label}: {name} took {stage['seconds']:.3f} s (baseline {before['seconds']:.3f} s)")
+        quality, before = result["quality"], previous["quality"]
+        if quality["total_mileage"] > before["total_mileage"] * (1 + mileage_tolerance):
+            regressions.append(f"{label}: mileage {quality['total_mileage']} (baseline {before['total_mileage']})")
+        if quality["on_time_percent"] < before["on_time_percent"] - on_time_tolerance:
+            regressions.append(f"{label}: {quality['on_time_percent']}% on time (baseline {before['on_time_percent']}%)")
+    return regressions
+
+
+def main(argv=None):
+    """
+    Command-line entry point.
+
+    Parameters:
+    argv (list of str): Command-line arguments (default: sys.argv[1:]).
+
+    Returns:
+    int: The exit status (1 if --baseline found a regression).
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the planner on synthetic datasets.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated package counts (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--output", help="write the JSON report to this file (default: stdout)")
+    parser.add_argument("--baseline", help="earlier JSON report to compare with")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE,
+                        help="allowed relative slowdown of a stage (default: %(default)s)")
+    parser.add_argument("--mileage-tolerance", type=float, default=MILEAGE_TOLERANCE,
+                        help="allowed relative growth of mileage (default: %(default)s)")
+    parser.add_argument("--on-time-tolerance", type=float, default=ON_TIME_TOLERANCE,
+                        help="allowed drop of the on-time share in percentage points (default: %(default)s)")
+    parser.add_argument("--in-process", action="store_true", help="run every size in this process")
+    args = parser.parse_args(argv)
+    try:
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    except ValueError:
+        parser.error(f"invalid --sizes '{args.sizes}'")
+
+    report = run_benchmarks(sizes, args.seed, not args.in_process)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(report, baseline, args.time_tolerance, args.mileage_tolerance, args.on_time_tolerance)
+    for message in regressions:
+        print(f"Regression: {message}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
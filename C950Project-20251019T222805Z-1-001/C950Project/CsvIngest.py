@@ -0,0 +1,380 @@
+# This module reads the address, distance and package CSV files as streams.
+# Rows are pulled through generators and packages are parsed in fixed-size chunks, so memory stays bounded
+# by the chunk size plus the structures being filled. Rows that cannot be used are recorded in an
+# IngestReport (file, line, field, reason) instead of being printed one by one.
+import csv
+import re
+from itertools import chain, islice
+
+import numpy as np
+
+from AddressRegistry import AddressRegistry
+from DistanceMatrix import DistanceMatrix, LAYOUT_SAMPLE_ROWS, is_triple_layout, location_ids
+from TimeModel import EOD, parse_deadline
+from TruckLoader import parse_special_note
+
+# Packages parsed and stored per batch
+DEFAULT_CHUNK_SIZE = 10000
+
+_WEIGHT_PATTERN = re.compile(r"^\s*([0-9]*\.?[0-9]+)\s*(kilos?|kgs?)?\s*$", re.IGNORECASE)
+
+
+class IngestError:
+    def __init__(self, filepath, line, field, message, row=None):
+        """
+        Describes one rejected row (or cell).
+
+        Parameters:
+        filepath (str): The file the row came from.
+        line (int): The 1-based line number of the row.
+        field (str): The field that failed validation (e.g., 'weight').
+        message (str): Why the row was rejected.
+        row (list of str): The raw row, kept for the first errors only.
+        """
+        self.filepath = filepath
+        self.line = line
+        self.field = field
+        self.message = message
+        self.row = row
+
+    def to_dict(self):
+        """
+        Returns the error as a plain dictionary (for JSON output).
+        """
+        return {"file": self.filepath, "line": self.line, "field": self.field, "message": self.message,
+                "row": self.row}
+
+    def __str__(self):
+        return "{}:{}: {}: {}".format(self.filepath, self.line, self.field, self.message)
+
+
+class IngestReport:
+    def __init__(self, max_errors=1000):
+        """
+        Collects the outcome of an ingestion run.
+
+        Parameters:
+        max_errors (int): Number of individual errors to keep; later errors are only counted.
+        """
+        self.max_errors = max_errors
+        self.errors = []  # First max_errors IngestError objects
+        self.error_count = 0  # Total number of errors, including those not kept
+        self.errors_by_field = {}  # Field name -> number of errors
+        self.rows_read = {}  # File -> number of rows read
+        self.rows_accepted = {}  # File -> number of rows accepted
+
+    def add_error(self, filepath, line, field, message, row=None):
+        """
+        Records a rejected row.
+        """
+        self.error_count += 1
+        self.errors_by_field[field] = self.errors_by_field.get(field, 0) + 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(IngestError(filepath, line, field, message, row))
+
+    def count(self, filepath, read, accepted):
+        """
+        Adds to the number of rows read and accepted from a file.
+        """
+        self.rows_read[filepath] = self.rows_read.get(filepath, 0) + read
+        self.rows_accepted[filepath] = self.rows_accepted.get(filepath, 0) + accepted
+
+    @classmethod
+    def from_dict(cls, data, max_errors=1000):
+        """
+        Rebuilds a report from the dictionary returned by to_dict().
+        """
+        report = cls(max_errors)
+        report.rows_read = dict(data.get("rows_read", {}))
+        report.rows_accepted = dict(data.get("rows_accepted", {}))
+        report.error_count = data.get("error_count", 0)
+        report.errors_by_field = dict(data.get("errors_by_field", {}))
+        report.errors = [IngestError(error["file"], error["line"], error["field"], error["message"], error["row"])
+                         for error in data.get("errors", [])[:max_errors]]
+        return report
+
+    def merge(self, other):
+        """
+        Adds the counts and errors of another report to this one.
+        """
+        for filepath, read in other.rows_read.items():
+            self.count(filepath, read, other.rows_accepted.get(filepath, 0))
+        self.error_count += other.error_count
+        for field, count in other.errors_by_field.items():
+            self.errors_by_field[field] = self.errors_by_field.get(field, 0) + count
+        self.errors.extend(other.errors[:max(0, self.max_errors - len(self.errors))])
+
+    def __bool__(self):
+        """
+        Returns True if any row was rejected.
+        """
+        return self.error_count > 0
+
+    def to_dict(self):
+        """
+        Returns the report as a plain dictionary (for JSON output).
+        """
+        return {
+            "rows_read": dict(self.rows_read),
+            "rows_accepted": dict(self.rows_accepted),
+            "error_count": self.error_count,
+            "errors_by_field": dict(self.errors_by_field),
+            "errors": [error.to_dict() for error in self.errors],
+        }
+
+    def summary(self):
+        """
+        Returns a one-line summary, e.g. '3 rows rejected (weight: 2, parcel_id: 1)'.
+        """
+        if not self.error_count:
+            return "0 rows rejected"
+        fields = ", ".join(f"{field}: {count}" for field, count in sorted(self.errors_by_field.items()))
+        return f"{self.error_count} rows rejected ({fields})"
+
+
+def iter_rows(filepath):
+    """
+    Yields (line number, row) for every non-blank row of a CSV file, reading it lazily.
+
+    Parameters:
+    filepath (str): The path to the CSV file.
+    """
+    with open(filepath, newline='', encoding='utf-8-sig') as csvfile:
+        reader = csv.reader(csvfile)
+        for row in reader:
+            if any(cell.strip() for cell in row):
+                yield reader.line_num, row
+
+
+def iter_chunks(items, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Groups an iterable into lists of at most chunk_size items.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_weight(weight_str):
+    """
+    Parses a weight string such as '88 Kilos' or '2.5 kg'.
+
+    Parameters:
+    weight_str (str): The weight string to be parsed.
+
+    Returns:
+    float: The weight value as a float.
+
+    Raises:
+    ValueError: If the text is not a non-negative number with an optional kilo unit.
+    """
+    match = _WEIGHT_PATTERN.match(weight_str)
+    if match is None:
+        raise ValueError(f"Invalid weight '{weight_str.strip()}'")
+    return float(match.group(1))
+
+
+def stream_addresses(filepath, report):
+    """
+    Reads an 'id,address' CSV file into an AddressRegistry, recording bad rows in the report.
+
+    Parameters:
+    filepath (str): The path to the CSV file containing address data.
+    report (IngestReport): Collects rejected rows.
+
+    Returns:
+    AddressRegistry: The populated registry.
+    """
+    registry = AddressRegistry()
+    read = accepted = 0
+    for line, row in iter_rows(filepath):
+        read += 1
+        if len(row) < 2 or not row[1].strip():
+            report.add_error(filepath, line, "address", "expected 'id,address'", row)
+            continue
+        try:
+            registry.add(int(row[0]), row[1].strip())
+            accepted += 1
+        except ValueError:
+            report.add_error(filepath, line, "address_id", f"invalid address id '{row[0]}'", row)
+    report.count(filepath, read, accepted)
+    return registry
+
+
+def stream_distances(filepath, report, address_ids=None, first_id=1):
+    """
+    Reads a distance CSV file into a DistanceMatrix, converting each row to floats (or each triple to ids
+    and a distance) as it is read, so the whole file is never held as strings. The layout is told from the
+    first rows with DistanceMatrix.is_triple_layout. Unreadable matrix cells are recorded and treated as
+    blank; unreadable triples are recorded and skipped.
+
+    Parameters:
+    filepath (str): The path to the CSV file containing distance data.
+    report (IngestReport): Collects rejected cells and rows.
+    address_ids (callable): Maps address names to ids for 'location1,location2,distance' files.
+    first_id (int): The address id stored in row 0.
+
+    Returns:
+    DistanceMatrix: The parsed distance matrix.
+    """
+    rows = ((line, [cell.strip() for cell in row]) for line, row in iter_rows(filepath))
+    sample = list(islice(rows, LAYOUT_SAMPLE_ROWS))
+    rows = chain(sample, rows)
+    if is_triple_layout([row for _, row in sample]):
+        counts = [0, 0]  # Rows read, rows accepted
+        to_id = location_ids(address_ids, first_id)
+
+        def triples():
+            for line, row in rows:
+                counts[0] += 1
+                if len(row) != 3:
+                    report.add_error(filepath, line, "row", f"expected 3 fields, got {len(row)}", row)
+                    continue
+                try:
+                    address_id1, address_id2 = to_id(row[0]), to_id(row[1])
+                except ValueError as e:
+                    report.add_error(filepath, line, "location", str(e), row)
+                    continue
+                if address_id1 is None or address_id2 is None or min(address_id1, address_id2) < first_id:
+                    report.add_error(filepath, line, "location", f"unknown location in {row[:2]}", row)
+                    continue
+                try:
+                    distance = float(row[2])
+                except ValueError:
+                    report.add_error(filepath, line, "distance", f"invalid distance '{row[2]}'", row)
+                    continue
+                counts[1] += 1
+                yield address_id1, address_id2, distance
+
+        matrix = DistanceMatrix.from_triples(triples(), first_id)
+        report.count(filepath, counts[0], counts[1])
+        return matrix
+
+    def float_rows():
+        for line, row in rows:
+            values = np.full(len(row), np.nan)
+            for column, cell in enumerate(row):
+                if not cell:
+                    continue
+                try:
+                    values[column] = float(cell)
+                except ValueError:
+                    report.add_error(filepath, line, "distance", f"invalid distance '{cell}' in column {column + 1}")
+            yield values
+
+    matrix = DistanceMatrix.from_float_rows(float_rows(), first_id)
+    report.count(filepath, len(matrix), len(matrix))
+    return matrix
+
+
+def stream_packages(filepath, store, report, hash_table=None, constraints=None, address_ids=None,
+                    chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Reads a package CSV file chunk by chunk into a PackageStore.
+
+    Each chunk is validated field by field, the good rows are added to the store with one extend() call,
+    and views of the new rows are bulk-inserted into the hash table. Special notes are stored in the note
+    column and parsed into constraints. Bad rows and repeated package ids are recorded in the report and skipped.
+
+    Parameters:
+    filepath (str): The path to the CSV file containing package data.
+    store (PackageStore): Receives the packages.
+    report (IngestReport): Collects rejected rows.
+    hash_table (HashMapCreation): Optional table to map each package ID to its view.
+    constraints (dict): Optional dict to fill with package ID -> PackageConstraints.
+    address_ids (callable): Maps a delivery address to its id, returning None if unknown.
+    chunk_size (int): Number of rows parsed and stored per batch.
+
+    Returns:
+    IngestReport: The report passed in.
+    """
+    for chunk in iter_chunks(iter_rows(filepath), chunk_size):
+        columns = _parse_package_chunk(filepath, chunk, report, address_ids, store)
+        rows = store.extend(columns["parcel_id"], columns["address"], columns["city"], columns["state"],
+                            columns["zipcode"], columns["deadline"], columns["weight"], columns["address_id"],
+                            notes=columns["note"])
+        if hash_table is not None:
+            hash_table.bulk_insert((parcel_id, store.view(row))
+                                   for parcel_id, row in zip(columns["parcel_id"], rows))
+        if constraints is not None:
+            # Only packages with a note get constraints; missing entries are treated as unconstrained
+            for parcel_id, note in zip(columns["parcel_id"], columns["note"]):
+                if note:
+                    constraints[parcel_id] = parse_special_note(parcel_id, note)
+        report.count(filepath, len(chunk), len(rows))
+    return report
+
+
+def _parse_package_chunk(filepath, chunk, report, address_ids, store):
+    """
+    Validates a chunk of package rows and returns the accepted rows as columns.
+    A package id already in the store or earlier in the chunk is rejected, so the store and the hash table
+    always hold the same packages.
+    """
+    columns = {name: [] for name in ("parcel_id", "address", "city", "state", "zipcode", "deadline", "weight",
+                                     "address_id", "note")}
+    deadline_cache = {}
+    seen = set()
+    for line, row in chunk:
+        if len(row) < 7:
+            report.add_error(filepath, line, "row", f"expected at least 7 fields, got {len(row)}", row)
+            continue
+        try:
+            parcel_id = int(row[0])
+        except ValueError:
+            report.add_error(filepath, line, "parcel_id", f"invalid package id '{row[0]}'", row)
+            continue
+        if parcel_id in seen or parcel_id in store:
+            report.add_error(filepath, line, "parcel_id", f"duplicate package id {parcel_id}", row)
+            continue
+        address = row[1].strip()
+        if not address:
+            report.add_error(filepath, line, "address", "missing delivery address", row)
+            continue
+        deadline = row[5].strip()
+        if deadline not in deadline_cache:
+            deadline_cache[deadline] = parse_deadline(deadline) != EOD or deadline.upper() == "EOD"
+        if not deadline_cache[deadline]:
+            report.add_error(filepath, line, "deadline", f"invalid deadline '{deadline}'", row)
+            continue
+        try:
+            weight = parse_weight(row[6])
+        except ValueError as e:
+            report.add_error(filepath, line, "weight", str(e), row)
+            continue
+        address_id = address_ids(address) if address_ids is not None else None
+        if address_ids is not None and address_id is None:
+            report.add_error(filepath, line, "address", f"address '{address}' is not in the address file", row)
+            continue
+
+        seen.add(parcel_id)
+        columns["parcel_id"].append(parcel_id)
+        columns["address"].append(address)
+        columns["city"].append(row[2].strip())
+        columns["state"].append(row[3].strip())
+        columns["zipcode"].append(row[4].strip())
+        columns["deadline"].append(deadline)
+        columns["weight"].append(weight)
+        columns["address_id"].append(address_id)
+        columns["note"].append(clean_note(row[7:]))
+    return columns
+
+
+def clean_note(fields):
+    """
+    Rebuilds a special note from the fields after the weight column.
+    Notes are not quoted as CSV in the package file, so a note containing commas spans several fields, and
+    rows end with empty fields and a trailing comma. The note's own quote marks are removed as well.
+
+    Parameters:
+    fields (list of str): The fields from the note column on.
+
+    Returns:
+    str: The note, e.g. 'Must be delivered with 15, 19' ('' if there is none).
+    """
+    return ",".join(fields).strip().rstrip(",").strip().strip("'\"").strip()
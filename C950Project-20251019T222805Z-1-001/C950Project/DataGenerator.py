@@ -0,0 +1,213 @@
+# This module writes synthetic address, distance and package CSV files in the same formats as the sample
+# files in CSV/, at any size, so the planner can be measured at realistic volumes.
+# Addresses are scattered over a disc around the hub. Road distances are the straight-line distance times a
+# per-pair detour factor, so some pairs are longer than a path through a third address, as in the sample.
+# Deadlines and special notes follow configurable mixes. The same seed always writes the same files.
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+from DeliveryPlanner import HUB_ADDRESS
+
+# Street names used to build synthetic addresses
+STREETS = ("S State St", "W Oakland Ave", "E 3300 S", "S 500 E", "Canyon Rd", "W 2100 S", "S 900 W", "E 800 S",
+           "S West Temple", "W Truman Ave", "S 1300 E", "E South Temple", "W Ridgeland Ave", "S 1100 W",
+           "E 2700 S", "Dalton Ave S", "S 200 W", "W Hardy Rd", "E Woodlawn Ave", "S Main St", "Lake Cir",
+           "W Bryan Ave", "S Highland Dr", "E Wilmington Ave", "W Parkway Blvd", "S Redwood Rd", "E Elm Ave",
+           "S 700 E", "W North Temple", "E Stratford Ave")
+
+# Share of packages with each deadline; the rest are due at end of day
+DEFAULT_DEADLINES = {"9:00 AM": 0.02, "10:30 AM": 0.3}
+
+# Share of packages with each kind of special note
+DEFAULT_NOTES = {"truck": 0.1, "delayed": 0.1, "with": 0.05, "wrong": 0.01}
+
+# Text of each kind of note, as written in the sample package file
+NOTE_TEXT = {
+    "truck": "'Can only be on truck {truck}'",
+    "delayed": "'Delayed on flight---will not arrive to depot until 9:05 am'",
+    "with": "'Must be delivered with {partners}'",
+    "wrong": "'Wrong address listed'",
+}
+
+# Radius in miles of the area the addresses are scattered over
+DEFAULT_RADIUS = 8.0
+
+# Packages in a must-be-delivered-with group
+GROUP_SIZE = 3
+
+# Distance rows formatted and written at a time
+_ROW_BLOCK = 256
+
+
+def address_text(index):
+    """
+    Returns the text of synthetic address number index (0-based); different indices give different addresses.
+    """
+    return "{} {}".format((index // len(STREETS) + 1) * 10 + index % 7, STREETS[index % len(STREETS)])
+
+
+def parse_mix(text):
+    """
+    Parses a mix such as '9:00 AM=0.02,10:30 AM=0.3' into a dictionary of shares.
+
+    Raises:
+    ValueError: If a share is not a number between 0 and 1.
+    """
+    mix = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        name, _, share = part.rpartition("=")
+        share = float(share)
+        if not name or not 0 <= share <= 1:
+            raise ValueError(f"invalid share '{part}'")
+        mix[name.strip()] = share
+    return mix
+
+
+def generate(directory, addresses, packages, seed=0, deadlines=None, notes=None, trucks=3, radius=DEFAULT_RADIUS):
+    """
+    Writes Addresses.csv, Distances.csv and Packages.csv to a directory.
+
+    Parameters:
+    directory (str): Where to write the files (created if missing).
+    addresses (int): Number of addresses, including the hub (address 1).
+    packages (int): Number of packages.
+    seed (int): Seed for every random choice.
+    deadlines (dict): Deadline text -> share of packages (default: DEFAULT_DEADLINES).
+    notes (dict): Note kind ('truck', 'delayed', 'with' or 'wrong') -> share of packages (default: DEFAULT_NOTES).
+    trucks (int): Truck numbers used in 'Can only be on truck' notes are 1 to trucks.
+    radius (float): Radius in miles of the delivery area.
+
+    Returns:
+    list of str: The paths of the address, distance and package files.
+    """
+    if addresses < 2:
+        raise ValueError("at least two addresses are needed (the hub and one delivery address)")
+    deadlines = DEFAULT_DEADLINES if deadlines is None else deadlines
+    notes = DEFAULT_NOTES if notes is None else notes
+    if sum(deadlines.values()) > 1 or sum(notes.values()) > 1:
+        raise ValueError("deadline and note shares must each add up to at most 1")
+    unknown = set(notes) - set(NOTE_TEXT)
+    if unknown:
+        raise ValueError(f"unknown note kinds: {', '.join(sorted(unknown))}")
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, name) for name in ("Addresses.csv", "Distances.csv", "Packages.csv")]
+
+    texts = [HUB_ADDRESS] + [address_text(index) for index in range(addresses - 1)]
+    with open(paths[0], "w", encoding="utf-8", newline="") as address_file:
+        for address_id, text in enumerate(texts, 1):
+            address_file.write(f"{address_id},{text}\n")
+
+    # Uniform over the disc, with the hub at the centre
+    angles = rng.uniform(0, 2 * math.pi, addresses)
+    distances_from_hub = radius * np.sqrt(rng.uniform(0, 1, addresses))
+    distances_from_hub[0] = 0.0
+    points = np.column_stack((distances_from_hub * np.cos(angles), distances_from_hub * np.sin(angles)))
+    _write_distances(paths[1], points, rng)
+
+    _write_packages(paths[2], texts, packages, rng, deadlines, notes, trucks)
+    return paths
+
+
+def _write_distances(filepath, points, rng):
+    """
+    Writes the full square distance matrix, one row per address, rounded to tenths of a mile.
+    """
+    size = len(points)
+    # Symmetric detour factors between 1.1 and 1.6: draw the upper triangle and mirror it
+    factors = np.triu(rng.uniform(1.1, 1.6, (size, size)), 1)
+    factors += factors.T
+    with open(filepath, "w", encoding="utf-8", newline="") as distance_file:
+        for start in range(0, size, _ROW_BLOCK):
+            block = points[start:start + _ROW_BLOCK]
+            straight = np.sqrt(((block[:, np.newaxis, :] - points[np.newaxis, :, :]) ** 2).sum(axis=2))
+            miles = np.round(straight * factors[start:start + _ROW_BLOCK], 1)
+            # Nearby addresses are at least 0.1 miles apart, never 0 as the diagonal is
+            miles = np.maximum(miles, 0.1)
+            miles[np.arange(len(block)), np.arange(start, start + len(block))] = 0.0
+            distance_file.write("".join(",".join(format(value, "g") for value in row.tolist()) + "\n"
+                                        for row in miles))
+
+
+def _write_packages(filepath, texts, packages, rng, deadlines, notes, trucks):
+    """
+    Writes the package file: 'id,address,city,state,zip,deadline,weight,note' rows with the notes unquoted,
+    as in the sample file.
+    """
+    address_rows = rng.integers(1, len(texts), packages)  # Never the hub
+    zip_codes = 84100 + rng.integers(1, 60, len(texts))
+    deadline_names = list(deadlines) + ["EOD"]
+    deadline_choice = rng.choice(len(deadline_names), packages,
+                                 p=list(deadlines.values()) + [1 - sum(deadlines.values())])
+    # Mostly light packages with a few heavy ones, as in the sample
+    weights = np.where(rng.uniform(0, 1, packages) < 0.15, rng.integers(20, 89, packages),
+                       rng.integers(1, 10, packages))
+
+    note_kinds = list(notes) + [""]
+    note_choice = rng.choice(len(note_kinds), packages, p=list(notes.values()) + [1 - sum(notes.values())])
+    note_texts = [""] * packages
+    if "with" in notes:
+        # Group packages that drew 'with' into threes; each note lists the group's other members
+        members = np.flatnonzero(note_choice == note_kinds.index("with")).tolist()
+        for start in range(0, len(members) - GROUP_SIZE + 1, GROUP_SIZE):
+            group = [index + 1 for index in members[start:start + GROUP_SIZE]]
+            for parcel_id in group:
+                partners = ", ".join(str(other) for other in group if other != parcel_id)
+                note_texts[parcel_id - 1] = NOTE_TEXT["with"].format(partners=partners)
+    truck_numbers = rng.integers(1, max(1, trucks) + 1, packages)
+    for kind in ("truck", "delayed", "wrong"):
+        if kind in notes:
+            for index in np.flatnonzero(note_choice == note_kinds.index(kind)).tolist():
+                note_texts[index] = NOTE_TEXT[kind].format(truck=truck_numbers[index])
+
+    with open(filepath, "w", encoding="utf-8", newline="") as package_file:
+        lines = []
+        for index in range(packages):
+            address_row = int(address_rows[index])
+            lines.append("{},{},Salt Lake City,UT,{},{},{} Kilos,{}\n".format(
+                index + 1, texts[address_row], zip_codes[address_row], deadline_names[deadline_choice[index]],
+                weights[index], note_texts[index]))
+            if len(lines) >= 10000:
+                package_file.write("".join(lines))
+                lines = []
+        package_file.write("".join(lines))
+
+
+def main(argv=None):
+    """
+    Command-line entry point: writes a synthetic dataset to a directory.
+
+    Parameters:
+    argv (list of str): Command-line arguments (default: sys.argv[1:]).
+
+    Returns:
+    int: The exit status.
+    """
+    parser = argparse.ArgumentParser(description="Write synthetic address, distance and package CSV files.")
+    parser.add_argument("directory", help="output directory")
+    parser.add_argument("--addresses", type=int, default=100, help="number of addresses, hub included")
+    parser.add_argument("--packages", type=int, default=1000, help="number of packages")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--deadlines", help="deadline mix, e.g. '9:00 AM=0.02,10:30 AM=0.3' (rest are EOD)")
+    parser.add_argument("--notes", help="note mix, e.g. 'truck=0.1,delayed=0.1,with=0.05,wrong=0.01'")
+    parser.add_argument("--trucks", type=int, default=3, help="highest truck number used in truck notes")
+    parser.add_argument("--radius", type=float, default=DEFAULT_RADIUS, help="radius of the area in miles")
+    args = parser.parse_args(argv)
+    try:
+        deadlines = parse_mix(args.deadlines) if args.deadlines is not None else None
+        notes = parse_mix(args.notes) if args.notes is not None else None
+        paths = generate(args.directory, args.addresses, args.packages, args.seed, deadlines, notes, args.trucks,
+                         args.radius)
+    except ValueError as e:
+        parser.error(str(e))
+    for path in paths:
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
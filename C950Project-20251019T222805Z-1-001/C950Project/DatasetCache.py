@@ -0,0 +1,257 @@
+# This module saves a parsed dataset (address table, distance matrix, shortest paths and package columns) to
+# one binary file and memory-maps it back, so a warm start skips CSV parsing and path precomputation entirely.
+#
+# File layout:
+#   8 bytes   magic b"C950DSET"
+#   4 bytes   format version (little-endian uint32)
+#   8 bytes   header length (little-endian uint64)
+#   header    UTF-8 JSON: source files and their content hash, address table, string pools, ingest report
+#             and the dtype/shape/offset of every array
+#   arrays    raw little-endian array data, each starting on a 64-byte boundary
+#
+# The file is keyed by a hash of the source files' contents. Size and modification time are checked first,
+# and the contents are only re-hashed when those differ, so an unchanged dataset is validated without reading it.
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"C950DSET"
+FORMAT_VERSION = 3
+
+_PREFIX = struct.Struct("<8sIQ")  # magic, version, header length
+_ALIGNMENT = 64
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def content_hash(paths):
+    """
+    Returns a hex digest of the contents of the given files, in order.
+
+    Parameters:
+    paths (list of str): The source files.
+
+    Returns:
+    str: The BLAKE2b digest of the files (and the cache format version).
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(struct.pack("<I", FORMAT_VERSION))
+    for path in paths:
+        with open(path, "rb") as source:
+            digest.update(struct.pack("<Q", os.fstat(source.fileno()).st_size))
+            for block in iter(lambda: source.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_stats(paths):
+    """
+    Returns [size, modification time in ns] for each file.
+    """
+    stats = []
+    for path in paths:
+        stat = os.stat(path)
+        stats.append([stat.st_size, stat.st_mtime_ns])
+    return stats
+
+
+class CompiledDataset:
+    def __init__(self, header, arrays, mapping=None):
+        """
+        Holds the contents of a cache file.
+
+        Parameters:
+        header (dict): The decoded JSON header.
+        arrays (dict): Array name -> NumPy array (views onto the mapped file when loaded from disk).
+        mapping (mmap.mmap): The memory map backing the arrays, kept open while they are in use.
+        """
+        self.header = header
+        self.arrays = arrays
+        self.mapping = mapping
+
+    @property
+    def source_hash(self):
+        """
+        The content hash of the source files the cache was built from.
+        """
+        return self.header["source_hash"]
+
+    @property
+    def addresses(self):
+        """
+        List of [address id, address] pairs.
+        """
+        return self.header["addresses"]
+
+    @property
+    def pools(self):
+        """
+        String column name -> list of pooled strings for the package columns.
+        """
+        return self.header["pools"]
+
+    @property
+    def report(self):
+        """
+        The ingest report of the original CSV load, as a dictionary.
+        """
+        return self.header.get("report", {})
+
+    @property
+    def first_id(self):
+        """
+        The address id stored in row 0 of the distance matrix.
+        """
+        return self.header["first_id"]
+
+    def array(self, name, default=None):
+        """
+        Returns a stored array, or default if the cache does not contain it.
+        """
+        return self.arrays.get(name, default)
+
+    def package_columns(self):
+        """
+        Returns the package store columns (every array named 'package.<column>').
+        """
+        return {name[len("package."):]: array for name, array in self.arrays.items() if name.startswith("package.")}
+
+
+def write_cache(cache_path, source_paths, addresses, first_id, arrays, pools, report=None, source_hash=None):
+    """
+    Writes a cache file. The file is written under a temporary name and renamed, so readers never see
+    a partial file.
+
+    Parameters:
+    cache_path (str): Where to write the cache.
+    source_paths (list of str): The CSV files the data came from.
+    addresses (list): [address id, address] pairs.
+    first_id (int): The address id stored in row 0 of the distance matrix.
+    arrays (dict): Array name -> NumPy array (e.g., 'distances', 'package.weight').
+    pools (dict): String column name -> list of pooled strings.
+    report (dict): The ingest report, as returned by IngestReport.to_dict().
+    source_hash (str): The content hash of the sources, if already computed.
+
+    Returns:
+    str: The content hash the cache is keyed by.
+    """
+    source_hash = source_hash or content_hash(source_paths)
+    layout = {}
+    offset = 0
+    contiguous = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        dtype = array.dtype.newbyteorder("<") if array.dtype.byteorder == ">" else array.dtype
+        contiguous[name] = array.astype(dtype, copy=False)
+        offset = -(-offset // _ALIGNMENT) * _ALIGNMENT
+        layout[name] = {"dtype": dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    header = {
+        "source_paths": [os.path.abspath(path) for path in source_paths],
+        "source_stats": _file_stats(source_paths),
+        "source_hash": source_hash,
+        "first_id": first_id,
+        "addresses": addresses,
+        "pools": pools,
+        "report": report or {},
+        "arrays": layout,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    # Array offsets are relative to the first aligned byte after the header
+    data_start = -(-(_PREFIX.size + len(header_bytes)) // _ALIGNMENT) * _ALIGNMENT
+
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            cache_file.write(header_bytes)
+            for name, array in contiguous.items():
+                cache_file.seek(data_start + layout[name]["offset"])
+                cache_file.write(array.tobytes())
+        os.replace(temp_path, cache_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return source_hash
+
+
+def read_header(cache_path):
+    """
+    Reads the header of a cache file.
+
+    Returns:
+    tuple: (header dict, byte offset of the array data), or None if the file is missing, not a cache file
+    or written by another format version.
+    """
+    try:
+        with open(cache_path, "rb") as cache_file:
+            prefix = cache_file.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                return None
+            magic, version, header_length = _PREFIX.unpack(prefix)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                return None
+            header = json.loads(cache_file.read(header_length).decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+    data_start = -(-(_PREFIX.size + header_length) // _ALIGNMENT) * _ALIGNMENT
+    return header, data_start
+
+
+def is_current(header, source_paths):
+    """
+    Returns True if a cache header matches the current contents of the source files.
+    """
+    if [os.path.abspath(path) for path in source_paths] != header.get("source_paths"):
+        return False
+    try:
+        if _file_stats(source_paths) == header.get("source_stats"):
+            return True
+        # Same files touched or copied: compare contents before throwing the cache away
+        return content_hash(source_paths) == header.get("source_hash")
+    except OSError:
+        return False
+
+
+def open_cache(cache_path, source_paths):
+    """
+    Memory-maps a cache file if it is current for the source files.
+
+    The file is mapped copy-on-write: every process mapping it shares the same pages, and a process that
+    writes to an array (e.g., a package's delivery time) only gets a private copy of the pages it changes.
+
+    Parameters:
+    cache_path (str): The cache file.
+    source_paths (list of str): The CSV files the cache must match.
+
+    Returns:
+    CompiledDataset: The mapped data, or None if the cache is missing or stale.
+    """
+    result = read_header(cache_path)
+    if result is None:
+        return None
+    header, data_start = result
+    if not is_current(header, source_paths):
+        return None
+    with open(cache_path, "rb") as cache_file:
+        size = os.fstat(cache_file.fileno()).st_size
+        mapping = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_COPY) if size else None
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        count = int(np.prod(shape, dtype=np.int64))
+        if count == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+            continue
+        if data_start + spec["offset"] + count * dtype.itemsize > size:
+            return None  # Truncated file
+        arrays[name] = np.frombuffer(mapping, dtype=dtype, count=count,
+                                     offset=data_start + spec["offset"]).reshape(shape)
+    return CompiledDataset(header, arrays, mapping)
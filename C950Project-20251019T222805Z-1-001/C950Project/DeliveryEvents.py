@@ -0,0 +1,97 @@
+# This module describes changes to packages that become known during the day: a corrected address, a
+# delay (the package cannot leave the hub before a given time) or a cancellation. FleetSimulator consumes
+# them at their effective time and re-routes only the rest of the affected truck's route.
+# Events can be read from a CSV file with rows 'time,kind,package id,value', e.g.
+#   10:20 AM,address,9,410 S State St
+#   9:30 AM,delay,25,11:00 AM
+#   12:00 PM,cancel,31
+from CsvIngest import iter_rows
+from TimeModel import parse_clock
+
+# Event kinds
+ADDRESS_CHANGE = "address"
+DELAY = "delay"
+CANCEL = "cancel"
+EVENT_KINDS = (ADDRESS_CHANGE, DELAY, CANCEL)
+
+
+class DeliveryEvent:
+    def __init__(self, time, kind, parcel_id, address=None, until=None):
+        """
+        Creates a new DeliveryEvent.
+
+        Parameters:
+        time (int): Seconds since midnight at which the event takes effect.
+        kind (str): ADDRESS_CHANGE, DELAY or CANCEL.
+        parcel_id (int): The package the event is about.
+        address (str): The new delivery address (ADDRESS_CHANGE only).
+        until (int): Seconds since midnight before which the package cannot leave the hub (DELAY only).
+        """
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind '{kind}'")
+        if kind == ADDRESS_CHANGE and not address:
+            raise ValueError("An address change needs the new address")
+        if kind == DELAY and until is None:
+            raise ValueError("A delay needs the time the package becomes available")
+        self.time = time
+        self.kind = kind
+        self.parcel_id = parcel_id
+        self.address = address
+        self.until = until
+
+    def __str__(self):
+        """
+        Returns a string representation of the event.
+        """
+        value = self.address if self.kind == ADDRESS_CHANGE else self.until if self.kind == DELAY else ""
+        return "{}, {}, {}, {}".format(self.time, self.kind, self.parcel_id, value)
+
+
+def parse_event(row):
+    """
+    Parses one 'time,kind,package id,value' row.
+
+    Parameters:
+    row (list of str): The CSV fields. An address containing commas may span several fields.
+
+    Returns:
+    DeliveryEvent: The parsed event.
+
+    Raises:
+    ValueError: If a field is missing or invalid.
+    """
+    if len(row) < 3:
+        raise ValueError(f"expected 'time,kind,package id[,value]', got {len(row)} fields")
+    time = parse_clock(row[0].strip())
+    kind = row[1].strip().lower()
+    parcel_id = int(row[2])
+    value = ",".join(row[3:]).strip()
+    if kind == DELAY:
+        return DeliveryEvent(time, kind, parcel_id, until=parse_clock(value))
+    return DeliveryEvent(time, kind, parcel_id, address=value or None)
+
+
+def read_events(filepath, report=None):
+    """
+    Reads a CSV file of events, sorted by effective time.
+
+    Parameters:
+    filepath (str): The path to the CSV file.
+    report (IngestReport): Collects rows that cannot be parsed (they are skipped).
+
+    Returns:
+    list of DeliveryEvent: The events.
+    """
+    events = []
+    read = 0
+    for line, row in iter_rows(filepath):
+        read += 1
+        try:
+            events.append(parse_event(row))
+        except ValueError as e:
+            if report is not None:
+                report.add_error(filepath, line, "event", str(e), row)
+    if report is not None:
+        report.count(filepath, read, len(events))
+    events.sort(key=lambda event: event.time)
+    return events
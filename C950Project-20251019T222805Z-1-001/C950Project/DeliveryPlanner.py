@@ -0,0 +1,610 @@
+# This module is the importable API of the delivery system.
+# Dataset loads the address, distance and package files lazily (on first use), plan() assigns packages to
+# trucks and simulates the fleet, and the resulting DeliveryPlan answers "status of package X at time T" from its
+# timeline. Nothing runs at import time, so other programs and tests can reuse it.
+# Parsed data is saved to a binary cache file (see DatasetCache) so later starts can memory-map it instead
+# of parsing the CSV files again.
+import bisect
+import os
+
+import numpy as np
+
+from AddressRegistry import AddressRegistry
+from CsvIngest import IngestReport, stream_addresses, stream_distances, stream_packages, DEFAULT_CHUNK_SIZE
+from DatasetCache import CompiledDataset, open_cache, write_cache
+from DeliveryEvents import DeliveryEvent, ADDRESS_CHANGE
+from DistanceMatrix import DistanceMatrix
+from HashTableCreation import HashMapCreation, PackageStoreMap
+from Instrumentation import metrics
+from PackageStore import PackageStore
+from ShortestPaths import ShortestPaths
+from FleetSimulator import FleetSimulator
+from OnlineInsertion import insert_package
+from Partitioner import partition_packages, schedule_clusters
+from Timeline import TimelineBuilder, AT_HUB, STATUS_CANCELLED, STATUS_DELIVERED, STATUS_NAMES
+from TimeModel import EOD, clock, format_duration
+from Truck import DeliveryTruck
+from TruckLoader import assign_packages, parse_special_note
+
+# Folder holding the sample CSV files that ship with the project
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "CSV")
+
+# Name of the compiled dataset file written next to the package file
+CACHE_FILENAME = "dataset.c950cache"
+
+# Address of the hub every truck starts from
+HUB_ADDRESS = "4001 South 700 East"
+
+# Time at which wrong package addresses are corrected (10:20 AM)
+ADDRESS_CORRECTION_TIME = clock(10, 20)
+
+# Changes known in advance for the sample day: package 9's corrected address arrives at 10:20 AM
+DEFAULT_EVENTS = [DeliveryEvent(ADDRESS_CORRECTION_TIME, ADDRESS_CHANGE, 9, address="410 S State St")]
+
+# Departure times of the sample day's trucks
+DEFAULT_DEPARTURES = (clock(8), clock(9, 5), ADDRESS_CORRECTION_TIME)
+
+# Number of drivers available for the trucks
+DRIVER_COUNT = 2
+
+# Days with more packages than this are split into geographic clusters instead of loaded truck by truck
+PARTITION_THRESHOLD = 500
+
+
+class Dataset:
+    def __init__(self, address_path=None, distance_path=None, package_path=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 cache_path=None):
+        """
+        Describes the three input files. Nothing is read until a property below is first used.
+
+        Parameters:
+        address_path (str): Path to the 'id,address' CSV file (default: CSV/Addresses.csv).
+        distance_path (str): Path to the distance CSV file (default: CSV/Distances.csv).
+        package_path (str): Path to the package CSV file (default: CSV/Packages.csv).
+        chunk_size (int): Number of package rows parsed per batch.
+        cache_path (str): Compiled dataset file to load from and save to (None to always parse the CSV files).
+        """
+        self.address_path = address_path or os.path.join(DEFAULT_DATA_DIR, "Addresses.csv")
+        self.distance_path = distance_path or os.path.join(DEFAULT_DATA_DIR, "Distances.csv")
+        self.package_path = package_path or os.path.join(DEFAULT_DATA_DIR, "Packages.csv")
+        self.chunk_size = chunk_size
+        self.cache_path = cache_path
+        self.cache_hit = False  # True if the data was memory-mapped from cache_path
+        self._cache_checked = cache_path is None
+        self.report = IngestReport()  # Rows rejected while reading the files
+        self._address_registry = None
+        self._distance_matrix = None
+        self._package_store = None
+        self._hash_table = None
+        self._constraints = None
+        self._shortest_paths = None
+
+    @property
+    def address_registry(self):
+        """
+        The AddressRegistry read from the address file.
+        """
+        self._use_cache()
+        if self._address_registry is None:
+            with metrics.stage("ingest"):
+                self._address_registry = stream_addresses(self.address_path, self.report)
+        return self._address_registry
+
+    @property
+    def distance_matrix(self):
+        """
+        The DistanceMatrix read from the distance file.
+        """
+        self._use_cache()
+        if self._distance_matrix is None:
+            with metrics.stage("ingest"):
+                self._distance_matrix = stream_distances(self.distance_path, self.report,
+                                                         address_ids=self.find_address_id)
+        return self._distance_matrix
+
+    @property
+    def shortest_paths(self):
+        """
+        ShortestPaths over the distance matrix: metric distances for routing plus the next-hop table.
+        """
+        self._use_cache()
+        if self._shortest_paths is None:
+            distance_matrix = self.distance_matrix
+            with metrics.stage("shortest_paths"):
+                self._shortest_paths = ShortestPaths.compute(distance_matrix)
+        return self._shortest_paths
+
+    @property
+    def package_store(self):
+        """
+        The PackageStore read from the package file.
+        """
+        self._load_packages()
+        return self._package_store
+
+    @property
+    def hash_table(self):
+        """
+        The HashMapCreation mapping each package ID to a view of its row in package_store (a PackageStoreMap
+        over the same rows when the dataset was restored from a compiled cache).
+        """
+        self._load_packages()
+        return self._hash_table
+
+    @property
+    def constraints(self):
+        """
+        Package ID -> PackageConstraints parsed from the special-notes column.
+        """
+        self._load_packages()
+        return self._constraints
+
+    def _load_packages(self):
+        """
+        Reads the package file the first time packages are needed.
+        """
+        self._use_cache()
+        if self._package_store is not None:
+            return
+        store, hash_table, constraints = PackageStore(), HashMapCreation(), {}
+        hash_table.add_package_indexes()  # Built on first query, so loading pays nothing for them
+        address_ids = self.address_registry.get
+        with metrics.stage("ingest"):
+            stream_packages(self.package_path, store, self.report, hash_table=hash_table, constraints=constraints,
+                            address_ids=address_ids, chunk_size=self.chunk_size)
+        self._package_store, self._hash_table, self._constraints = store, hash_table, constraints
+
+    @property
+    def source_paths(self):
+        """
+        The three CSV files, in the order they are hashed for the cache.
+        """
+        return [self.address_path, self.distance_path, self.package_path]
+
+    def _use_cache(self):
+        """
+        On first use, loads everything from the cache file if it is current for the CSV files;
+        otherwise parses the CSV files and writes a new cache file.
+        """
+        if self._cache_checked:
+            return
+        self._cache_checked = True
+        with metrics.stage("cache_load"):
+            compiled = open_cache(self.cache_path, self.source_paths)
+            if compiled is not None:
+                self._restore(compiled)
+        if compiled is not None:
+            self.cache_hit = True
+            return
+        self._load_packages()
+        if self.distance_matrix is not None:
+            self.shortest_paths  # Computed before the first plan so the cache holds the untouched packages
+            try:
+                with metrics.stage("cache_write"):
+                    self.save_cache(self.cache_path)
+            except OSError:
+                pass  # A read-only data folder only costs the next start a CSV parse
+
+    def save_cache(self, cache_path):
+        """
+        Writes the parsed dataset to a compiled cache file.
+
+        Parameters:
+        cache_path (str): Where to write the file.
+
+        Returns:
+        str: The content hash of the source files the cache is keyed by.
+        """
+        compiled = self.compile()
+        return write_cache(cache_path, self.source_paths, compiled.addresses, compiled.first_id, compiled.arrays,
+                           compiled.pools, compiled.report)
+
+    def compile(self):
+        """
+        Returns the parsed dataset as a CompiledDataset: the address table, string pools and ingest report in
+        the header, and the distance matrices and package columns as arrays.
+        """
+        store = self.package_store
+        arrays = {"distances": self.distance_matrix.matrix,
+                  "shortest.distances": self.shortest_paths.distances.matrix,
+                  "shortest.next_hop": self.shortest_paths.next_hop}
+        for name in store.COLUMNS:
+            arrays["package." + name] = store.column(name)
+        header = {"addresses": sorted(self.address_registry.addresses.items()),
+                  "first_id": self.distance_matrix.first_id,
+                  "pools": {name: pool.values for name, pool in store.pools.items()},
+                  "report": self.report.to_dict()}
+        return CompiledDataset(header, arrays)
+
+    @classmethod
+    def from_compiled(cls, compiled):
+        """
+        Creates a Dataset around the arrays of a CompiledDataset (e.g., one held in shared memory).
+        The CSV paths are left at their defaults and are never read.
+        """
+        dataset = cls()
+        dataset._restore(compiled)
+        return dataset
+
+    def _restore(self, compiled):
+        """
+        Rebuilds the dataset's structures around the arrays of a CompiledDataset.
+        """
+        registry = AddressRegistry()
+        for address_id, text_address in compiled.addresses:
+            registry.add(address_id, text_address)
+        store = PackageStore.from_columns(compiled.package_columns(), compiled.pools)
+        # Views are made on lookup instead of one per row up front
+        hash_table = PackageStoreMap(store)
+        hash_table.add_package_indexes()
+        # Only packages with a note have constraints; the loader treats missing entries as unconstrained
+        constraints = {}
+        note_pool = store.pools["note"]
+        for row in (store.column("note") != note_pool.code("")).nonzero()[0]:
+            parcel_id = int(store.columns["parcel_id"][row])
+            constraints[parcel_id] = parse_special_note(parcel_id, note_pool.value(int(store.columns["note"][row])))
+
+        self._address_registry = registry
+        self._distance_matrix = DistanceMatrix(compiled.array("distances"), compiled.first_id)
+        if compiled.array("shortest.distances") is not None:
+            shortest = DistanceMatrix(compiled.array("shortest.distances"), compiled.first_id)
+            self._shortest_paths = ShortestPaths(shortest, compiled.array("shortest.next_hop"), self._distance_matrix)
+        self._package_store, self._hash_table, self._constraints = store, hash_table, constraints
+        self.report.merge(IngestReport.from_dict(compiled.report))
+
+    def find_address_id(self, text_address):
+        """
+        Finds the address ID of an address (case, spacing and St/Street style abbreviations are ignored).
+
+        Raises:
+        ValueError: If the address cannot be located in the address registry.
+        """
+        return self.address_registry.lookup(text_address)
+
+    def distance_between(self, location1, location2):
+        """
+        Returns the shortest distance between two addresses given as text, or inf if either is unknown.
+        """
+        try:
+            return self.shortest_paths.distance(self.find_address_id(location1), self.find_address_id(location2))
+        except (ValueError, IndexError):
+            return float('inf')
+
+
+def load_dataset(address_path=None, distance_path=None, package_path=None, cache_path=None, use_cache=True):
+    """
+    Returns a lazily loaded Dataset for the given files (the sample files in CSV/ by default).
+
+    Parameters:
+    address_path, distance_path, package_path (str): The CSV files (see Dataset).
+    cache_path (str): Compiled dataset file (default: dataset.c950cache next to the package file).
+    use_cache (bool): False to always parse the CSV files.
+    """
+    package_path = package_path or os.path.join(DEFAULT_DATA_DIR, "Packages.csv")
+    if not use_cache:
+        cache_path = None
+    elif cache_path is None:
+        cache_path = os.path.join(os.path.dirname(package_path), CACHE_FILENAME)
+    return Dataset(address_path, distance_path, package_path, cache_path=cache_path)
+
+
+class DeliveryPlan:
+    recovered = False  # See EventLog.RecoveredPlan, which answers the same queries from an event log
+
+    def __init__(self, dataset, trucks, simulation, timeline, unassigned, simulator=None, event_log=None):
+        """
+        Holds the outcome of plan().
+
+        Parameters:
+        dataset (Dataset): The data the plan was made from.
+        trucks (list of DeliveryTruck): The trucks, with their delivery order in package_ids.
+        simulation (SimulationResult): The simulated trips of every truck.
+        timeline (DeliveryTimeline): Every package event of the planned day.
+        unassigned (dict): Package ID -> reason it could not be loaded on any truck.
+        simulator (FleetSimulator): The simulator that ran the day; its settings are reused by insert_package().
+        event_log (EventLogWriter): The log the simulated day was written to, if any.
+        """
+        self.dataset = dataset
+        self.trucks = trucks
+        self.simulation = simulation
+        self.route_results = simulation.route_results  # The route optimizer's result for each trip
+        self.timeline = timeline
+        self.unassigned = unassigned
+        self.simulator = simulator
+        self.event_log = event_log
+        # Package ID -> time a package added by insert_package() reaches the hub; it has no state before that
+        self.arrival_times = {}
+
+    @property
+    def total_mileage(self):
+        """
+        Combined mileage of every truck, including the legs back to the hub.
+        """
+        return sum(truck.total_mileage for truck in self.trucks)
+
+    @property
+    def greedy_mileage(self):
+        """
+        Combined mileage of the nearest-neighbour routes before optimization, including the legs back to the hub.
+        """
+        return sum(result.mileage_before for result in self.route_results) + self.simulation.return_mileage
+
+    @property
+    def return_mileage(self):
+        """
+        Miles driven from last stops back to the hub.
+        """
+        return self.simulation.return_mileage
+
+    @property
+    def finish_time(self):
+        """
+        Seconds since midnight at which the last truck finished.
+        """
+        return self.simulation.finish_time
+
+    def late_packages(self):
+        """
+        Returns the IDs of packages delivered after their deadline or never delivered (cancelled packages
+        are not counted), sorted.
+        """
+        late = []
+        for parcel_id, parcel in self.dataset.hash_table.items():
+            delivered = self.timeline.delivery_time(parcel_id)
+            if delivered is None:
+                if self.timeline.status_code_at(parcel_id, EOD) != STATUS_CANCELLED:
+                    late.append(parcel_id)
+            elif delivered > parcel.deadline_seconds:
+                late.append(parcel_id)
+        return sorted(late)
+
+    def insert_package(self, parcel, available_time=0, constraints=None):
+        """
+        Adds a package that reaches the hub during the day to the cheapest feasible position of a trip that has
+        not left yet, without planning the day again (see OnlineInsertion). The plan is changed in place, so
+        insert before publishing it to a StatusServer. A plan that wrote an event log refuses insertions, since
+        the log could no longer be replayed into it.
+
+        Parameters:
+        parcel (Parcel): The new package.
+        available_time (int): Seconds since midnight at which the package reaches the hub.
+        constraints (PackageConstraints): Its loading constraints, if any.
+
+        Returns:
+        InsertionResult: Where the package was inserted, or why it could not be.
+        """
+        return insert_package(self, parcel, available_time, constraints)
+
+    def driven_path(self, truck_index):
+        """
+        Returns every address a truck drives through during the day, hub to hub, including the addresses
+        passed between stops on the shortest paths.
+
+        Parameters:
+        truck_index (int): Index of the truck in trucks.
+
+        Returns:
+        list of int: Address ids in driving order.
+        """
+        stops = []
+        for trip in self.simulation.trips:
+            if trip.truck_index == truck_index:
+                stops.extend(trip.visited if not stops else trip.visited[1:])
+        return self.dataset.shortest_paths.expand(stops)
+
+    def truck_position(self, truck_index, query_time):
+        """
+        Returns where a truck is at a time as a dictionary.
+
+        Parameters:
+        truck_index (int): Index of the truck in trucks.
+        query_time (int): Seconds since midnight.
+
+        Returns:
+        dict: truck (its number), status ('At Hub', 'En route' or 'Done' after its last trip), trip (number of
+            the current or last trip, None before the first), location (last address reached), next_location
+            (address being driven to, None unless en route) and leg_progress (share of the current leg driven).
+        """
+        position = {"truck": truck_index + 1, "status": "At Hub", "trip": None, "location": HUB_ADDRESS,
+                    "next_location": None, "leg_progress": None}
+        trips = [trip for trip in self.simulation.trips if trip.truck_index == truck_index and trip.visited]
+        address = self.dataset.address_registry.address
+        for number, trip in enumerate(trips, 1):
+            if query_time < trip.visit_times[0]:
+                break  # Loading at the hub for this trip
+            position["trip"] = number
+            times = trip.visit_times
+            if query_time >= times[-1]:
+                position["location"] = address(trip.visited[-1])
+                position["status"] = "At Hub" if trip.return_time is not None else "Done"
+                continue
+            # The last stop reached at or before the query time
+            stop = bisect.bisect_right(times, query_time) - 1
+            leg = times[stop + 1] - times[stop]
+            position.update(status="En route", location=address(trip.visited[stop]),
+                            next_location=address(trip.visited[stop + 1]),
+                            leg_progress=round((query_time - times[stop]) / leg, 3) if leg else 1.0)
+            return position
+        if trips and position["trip"] == len(trips) and position["status"] == "At Hub":
+            position["status"] = "Done"
+        return position
+
+    def all_truck_positions(self, query_time):
+        """
+        Returns truck_position() for every truck at a time.
+        """
+        return [self.truck_position(truck_index, query_time) for truck_index in range(len(self.trucks))]
+
+    def package_status(self, parcel_id, query_time):
+        """
+        Returns the state of one package at a time as a dictionary, or None if the ID is unknown or the package
+        (added by insert_package) has not reached the hub yet.
+
+        Parameters:
+        parcel_id (int): The package to look up.
+        query_time (int): Seconds since midnight.
+
+        Returns:
+        dict: id, address, city, state, zip, deadline, weight, status and delivery_time (None unless delivered).
+        """
+        with metrics.stage("query"):
+            return self._package_status(parcel_id, query_time)
+
+    def _package_status(self, parcel_id, query_time):
+        pkg = self.dataset.hash_table.lookup(parcel_id)
+        if pkg is None or query_time < self.arrival_times.get(parcel_id, 0):
+            return None
+        status = self.timeline.status_at(parcel_id, query_time)
+        delivery_seconds = self.timeline.delivery_time(parcel_id) if status == "Delivered" else None
+        return {
+            "id": parcel_id,
+            "address": self.timeline.address_at(parcel_id, query_time) or pkg.delivery_address,
+            "city": pkg.city,
+            "state": pkg.state,
+            "zip": pkg.zipcode,
+            "deadline": pkg.deadline,
+            "weight": pkg.weight,
+            "status": status,
+            "delivery_time": format_duration(delivery_seconds) if delivery_seconds is not None else None,
+        }
+
+    def all_package_status(self, query_time):
+        """
+        Returns package_status() for every package at a time, sorted by package ID (packages that have not
+        reached the hub yet are left out). Statuses come from one timeline snapshot and the other fields from
+        the package store's columns, so no package is looked up on its own.
+        """
+        with metrics.stage("query"):
+            store, timeline = self.dataset.package_store, self.timeline
+            order = np.argsort(store.column("parcel_id"), kind="stable")
+            not_arrived = [parcel_id for parcel_id, time in self.arrival_times.items() if query_time < time]
+            if not_arrived:
+                order = order[~np.isin(store.column("parcel_id")[order], not_arrived)]
+            parcel_ids = store.column("parcel_id")[order]
+
+            # Packages the timeline has no events for are still at the hub
+            snapshot_ids, codes = timeline.snapshot(query_time)
+            rows = np.searchsorted(snapshot_ids, parcel_ids)
+            known = rows < len(snapshot_ids)
+            known[known] = snapshot_ids[rows[known]] == parcel_ids[known]
+            status = np.full(len(parcel_ids), AT_HUB, dtype=np.int8)
+            status[known] = codes[rows[known]]
+            delivered_at = np.full(len(parcel_ids), -1, dtype=np.int64)
+            delivered = status == STATUS_DELIVERED
+            delivered_at[delivered] = timeline.delivered_at[rows[delivered]]
+
+            columns = {name: [store.pools[name].values[code] for code in store.column(name)[order].tolist()]
+                       for name in ("address", "city", "state", "zipcode", "deadline")}
+            return [{
+                "id": parcel_id,
+                "address": timeline.address_at(parcel_id, query_time) or address,
+                "city": city,
+                "state": state,
+                "zip": zipcode,
+                "deadline": deadline,
+                "weight": weight,
+                "status": STATUS_NAMES[code],
+                "delivery_time": format_duration(delivered) if delivered >= 0 else None,
+            } for parcel_id, address, city, state, zipcode, deadline, weight, code, delivered in zip(
+                parcel_ids.tolist(), columns["address"], columns["city"], columns["state"], columns["zipcode"],
+                columns["deadline"], store.column("weight")[order].tolist(), status.tolist(), delivered_at.tolist())]
+
+    def format_package_at(self, parcel_id, query_time):
+        """
+        Formats a package's details and status at a time in the same layout as Parcel.__str__.
+        """
+        row = self.package_status(parcel_id, query_time)
+        return "{}, {}, {}, {}, {}, {}, {}, {}, {}".format(
+            row["id"], row["address"], row["city"], row["state"], row["zip"], row["deadline"], row["weight"],
+            row["delivery_time"], row["status"])
+
+
+def default_trucks(dataset, departures=None, travel_speed=18, max_capacity=16):
+    """
+    Creates the three trucks of the sample day, all empty at the hub.
+    Truck 2 waits for the delayed flight (9:05 AM) and truck 3 for the address correction (10:20 AM).
+
+    Parameters:
+    dataset (Dataset): The data the trucks will deliver.
+    departures (list of int): Departure time of each truck in seconds since midnight (default: the sample day's).
+    travel_speed (float): Speed of every truck in miles per hour.
+    max_capacity (int): Packages every truck can carry per trip.
+    """
+    hub_address_id = dataset.find_address_id(HUB_ADDRESS)
+    departures = DEFAULT_DEPARTURES if departures is None else departures
+    return [DeliveryTruck(max_capacity=max_capacity, travel_speed=travel_speed, current_load=0.0, package_ids=[],
+                          total_mileage=0.0, current_location=HUB_ADDRESS, departure_time=departure_time,
+                          current_address_id=hub_address_id)
+            for departure_time in departures]
+
+
+def plan(dataset, trucks=None, events=None, drivers=DRIVER_COUNT, load_seconds_per_package=0,
+         return_to_hub=True, partition="auto", time_limit=0.5, seed=0, event_log=None):
+    """
+    Assigns the dataset's packages to trucks and simulates the day with FleetSimulator.
+
+    All trucks run on one clock. A truck leaves at its departure time once its packages have reached the hub
+    and a driver is free, and drives back to the hub after its last stop. Address changes, delays and
+    cancellations are applied at their effective time. Delivery and departure times are written onto the
+    dataset's packages.
+
+    Parameters:
+    dataset (Dataset): The data to plan.
+    trucks (list of DeliveryTruck): The trucks to use (default: default_trucks()).
+    events (list of DeliveryEvent): Changes that become known during the day (default: DEFAULT_EVENTS).
+    drivers (int): Number of drivers (None for one per truck).
+    load_seconds_per_package (int): Seconds spent loading each package at the hub.
+    return_to_hub (bool): False to end each truck's day at its last stop.
+    partition (bool or str): True to split the packages into geographic clusters (one trip each) with
+        Partitioner, False to load trucks with TruckLoader, 'auto' to partition above PARTITION_THRESHOLD packages.
+    time_limit (float): Seconds the route optimizer may spend on each trip.
+    seed (int): Seed for the partitioner's first cluster centres.
+    event_log (EventLogWriter): Receives every state change of the simulated day (the caller closes it).
+
+    Returns:
+    DeliveryPlan: The planned day.
+    """
+    trucks = default_trucks(dataset) if trucks is None else trucks
+    events = DEFAULT_EVENTS if events is None else events
+    hash_table = dataset.hash_table
+    hub_address_id = dataset.find_address_id(HUB_ADDRESS)
+
+    parcels = [parcel for _, parcel in hash_table.items()]
+    # Route on shortest-path distances, so every leg is the shortest way between two stops
+    distances = dataset.shortest_paths.distances
+    deadlines = {parcel.parcel_id: parcel.deadline_seconds for parcel in parcels}
+    if partition == "auto":
+        partition = len(parcels) > PARTITION_THRESHOLD
+    with metrics.stage("assignment"):
+        if partition:
+            partition_result = partition_packages(parcels, dataset.constraints, deadlines, trucks, distances,
+                                                  ADDRESS_CORRECTION_TIME, seed=seed)
+            trips = schedule_clusters(partition_result.clusters, trucks, distances, hub_address_id)
+            unassigned = partition_result.unassigned
+            for truck, truck_trips in zip(trucks, trips):
+                truck.package_ids = [parcel_id for trip in truck_trips for parcel_id in trip]
+        else:
+            assignment = assign_packages(parcels, dataset.constraints, deadlines, trucks, distances, hub_address_id,
+                                         ADDRESS_CORRECTION_TIME)
+            trips = None
+            unassigned = assignment.unassigned
+            for truck, package_ids in zip(trucks, assignment.package_ids):
+                truck.package_ids = package_ids
+
+    # Record each package's address at the start of the day, before any corrections
+    timeline_builder = TimelineBuilder()
+    for parcel in parcels:
+        timeline_builder.set_initial_address(parcel.parcel_id, parcel.delivery_address)
+
+    available_times = {parcel_id: constraint.available_time for parcel_id, constraint in dataset.constraints.items()
+                       if constraint.available_time}
+    simulator = FleetSimulator(distances, hub_address_id, drivers=drivers,
+                               load_seconds_per_package=load_seconds_per_package, return_to_hub=return_to_hub,
+                               time_limit=time_limit, location_name=dataset.address_registry.address,
+                               address_ids=dataset.address_registry.get)
+    with metrics.stage("simulation"):
+        simulation = simulator.run(trucks, hash_table, trips=trips, available_times=available_times, events=events,
+                                   timeline_builder=timeline_builder, event_log=event_log)
+
+    # Freeze the simulator's events; status queries read from this and never modify the parcels
+    return DeliveryPlan(dataset, trucks, simulation, timeline_builder.build(), unassigned, simulator, event_log)
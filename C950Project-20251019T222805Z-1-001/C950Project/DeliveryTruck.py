@@ -11,7 +11,7 @@ class DeliveryTruck:
         packages (list of int): List containing IDs of packages loaded onto the truck.
         total_mileage (float): Total distance covered by the truck (in miles).
         current_location (str): The truck's current location address.
-        departure_time (datetime.timedelta): The time when the truck departs from the base or hub.
+        departure_time (int): The time when the truck departs from the base or hub, in seconds since midnight.
         """
         self.max_capacity = max_capacity  # Maximum weight the truck can hold
         self.travel_speed = travel_speed  # The truck's speed (in miles per hour)
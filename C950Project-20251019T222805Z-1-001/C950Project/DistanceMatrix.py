@@ -0,0 +1,239 @@
+# This class stores the distances between every pair of addresses in one dense NumPy array.
+# Rows and columns are addressed by address id, so a lookup is a single array index
+# instead of two string-keyed dictionary lookups.
+import csv
+
+import numpy as np
+
+from Instrumentation import metrics
+
+# Rows allocated before the first doubling when distances are read row by row
+_INITIAL_ROWS = 64
+
+# Rows of a distance file looked at to tell its layout (see is_triple_layout)
+LAYOUT_SAMPLE_ROWS = 4
+
+
+class DistanceMatrix:
+    def __init__(self, matrix, first_id=1):
+        """
+        Creates a new DistanceMatrix from a square array of distances.
+
+        Parameters:
+        matrix (array-like): Square array where matrix[i][j] is the distance between the i-th and j-th address.
+        first_id (int): The address id stored in row 0 (Addresses.csv numbers its addresses from 1).
+        """
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float64)  # Dense distance table
+        if self.matrix.ndim != 2 or self.matrix.shape[0] != self.matrix.shape[1]:
+            raise ValueError(f"Distance matrix must be square, got shape {self.matrix.shape}")
+        self.first_id = first_id  # Address id that maps to row 0
+
+    def __len__(self):
+        """
+        Returns the number of addresses covered by the matrix.
+        """
+        return self.matrix.shape[0]
+
+    def distance(self, address_id1, address_id2):
+        """
+        Returns the distance between two addresses in O(1).
+
+        Parameters:
+        address_id1 (int): The id of the first address.
+        address_id2 (int): The id of the second address.
+
+        Returns:
+        float: The distance between the two addresses, or inf if it is unknown.
+        """
+        distance = float(self.matrix[address_id1 - self.first_id, address_id2 - self.first_id])
+        if metrics.enabled:
+            metrics.count("distance.lookups")
+            if distance == np.inf:
+                metrics.count("distance.inf")
+        return distance
+
+    def distances_from(self, address_id, candidates):
+        """
+        Returns the distances from one address to many addresses in a single vectorized lookup.
+
+        Parameters:
+        address_id (int): The id of the address to measure from.
+        candidates (array-like of int): The ids of the addresses to measure to.
+
+        Returns:
+        numpy.ndarray: The distances, in the same order as candidates.
+        """
+        columns = np.asarray(candidates, dtype=np.intp) - self.first_id
+        distances = self.matrix[address_id - self.first_id, columns]
+        if metrics.enabled:
+            metrics.count("distance.lookups", len(distances))
+            metrics.count("distance.inf", int(np.isinf(distances).sum()))
+        return distances
+
+    @classmethod
+    def from_rows(cls, rows, address_ids=None, first_id=1):
+        """
+        Builds a DistanceMatrix from parsed CSV rows.
+
+        Two layouts are accepted (see is_triple_layout):
+        - a square or lower-triangular matrix of numbers, one row per address (blank cells are filled
+          from the mirrored cell, so a lower triangle is enough);
+        - 'location1,location2,distance' triples, where the locations are address ids or address names.
+
+        Parameters:
+        rows (iterable of list of str): The rows of the distance file.
+        address_ids (callable): Optional function mapping an address name to its id (triple layout only).
+        first_id (int): The address id stored in row 0.
+
+        Returns:
+        DistanceMatrix: The parsed distance matrix.
+        """
+        rows = [[cell.strip() for cell in row] for row in rows if any(cell.strip() for cell in row)]
+        if is_triple_layout(rows):
+            to_id = location_ids(address_ids, first_id)
+            triples = ((to_id(loc1), to_id(loc2), float(dist)) for loc1, loc2, dist in rows)
+            return cls.from_triples(triples, first_id)
+        return cls._from_square(rows, first_id)
+
+    @classmethod
+    def from_csv(cls, filepath, address_ids=None, first_id=1):
+        """
+        Loads a DistanceMatrix from a CSV file (see from_rows for the accepted layouts).
+
+        Parameters:
+        filepath (str): The path to the CSV file containing distance data.
+        address_ids (callable): Optional function mapping an address name to its id (triple layout only).
+        first_id (int): The address id stored in row 0.
+
+        Returns:
+        DistanceMatrix: The parsed distance matrix.
+        """
+        with open(filepath, newline='', encoding='utf-8-sig') as csvfile:
+            return cls.from_rows(csv.reader(csvfile), address_ids, first_id)
+
+    @classmethod
+    def from_float_rows(cls, rows, first_id=1):
+        """
+        Builds a DistanceMatrix from rows that were already converted to numbers.
+
+        Parameters:
+        rows (iterable of numpy.ndarray): One row per address (square or lower-triangular), NaN for blank cells.
+        first_id (int): The address id stored in row 0.
+
+        Returns:
+        DistanceMatrix: The parsed distance matrix.
+        """
+        # Rows are copied into the matrix as they arrive; it doubles when a row does not fit, so the table is
+        # never held twice
+        matrix = np.full((_INITIAL_ROWS, _INITIAL_ROWS), np.nan)
+        count = width = 0
+        for row in rows:
+            matrix = _fit(matrix, max(count + 1, len(row)))
+            matrix[count, :len(row)] = row
+            count += 1
+            width = max(width, len(row))
+        size = max(count, width)
+        return cls(_symmetrize(matrix[:size, :size].copy()), first_id)
+
+    @classmethod
+    def from_triples(cls, triples, first_id=1):
+        """
+        Builds a DistanceMatrix from (address id, address id, distance) triples, filling the matrix as they
+        arrive (a pair given once is used in both directions).
+
+        Parameters:
+        triples (iterable of tuple): (int, int, float) triples.
+        first_id (int): The address id stored in row 0.
+
+        Returns:
+        DistanceMatrix: The parsed distance matrix.
+
+        Raises:
+        ValueError: If an address id is below first_id.
+        """
+        matrix = np.full((_INITIAL_ROWS, _INITIAL_ROWS), np.nan)
+        size = 0
+        for address_id1, address_id2, distance in triples:
+            if min(address_id1, address_id2) < first_id:
+                raise ValueError(f"Address id {min(address_id1, address_id2)} is below the first id {first_id}")
+            needed = max(address_id1, address_id2) - first_id + 1
+            matrix = _fit(matrix, needed)
+            matrix[address_id1 - first_id, address_id2 - first_id] = distance
+            size = max(size, needed)
+        return cls(_symmetrize(matrix[:size, :size].copy()), first_id)
+
+    @classmethod
+    def _from_square(cls, rows, first_id):
+        """
+        Parses a square or lower-triangular matrix of distances.
+        """
+        return cls.from_float_rows(
+            (np.array([float(cell) if cell else np.nan for cell in row]) for row in rows), first_id)
+
+
+def _symmetrize(matrix):
+    """
+    Fills blank (NaN) cells from their mirrored cell, zeroes the diagonal and marks pairs that are still
+    unknown as inf.
+    """
+    matrix = np.where(np.isnan(matrix), matrix.T, matrix)
+    np.fill_diagonal(matrix, 0.0)
+    matrix[np.isnan(matrix)] = np.inf
+    return matrix
+
+
+def _fit(matrix, needed):
+    """
+    Returns the matrix, or a copy at least twice as large if it has fewer than needed rows.
+    """
+    if needed <= len(matrix):
+        return matrix
+    grown = np.full((max(needed, 2 * len(matrix)),) * 2, np.nan)
+    grown[:len(matrix), :len(matrix)] = matrix
+    return grown
+
+
+def is_triple_layout(rows):
+    """
+    Tells a file of 'location1,location2,distance' triples from a distance matrix by its first rows: every
+    sampled row has three cells, and they are not the three rows of a 3x3 numeric matrix.
+
+    Parameters:
+    rows (list of list of str): The first non-blank rows of the file with stripped cells (at least
+        LAYOUT_SAMPLE_ROWS of them, or all of them for a shorter file).
+
+    Returns:
+    bool: True for the triple layout.
+    """
+    rows = rows[:LAYOUT_SAMPLE_ROWS]
+    return bool(rows) and all(len(row) == 3 for row in rows) and (len(rows) != 3 or not is_number(rows[0][0]))
+
+
+def location_ids(address_ids=None, first_id=1):
+    """
+    Returns a function mapping a triple's location to an address id: numbers are ids, names go through
+    address_ids, or are numbered from first_id in order of first appearance if there is no address_ids.
+    """
+    labels = {}
+
+    def to_id(location):
+        try:
+            return int(location)
+        except ValueError:
+            pass
+        if address_ids is not None:
+            return address_ids(location)
+        return labels.setdefault(location, first_id + len(labels))
+
+    return to_id
+
+
+def is_number(text):
+    """
+    Returns True if the text parses as a float.
+    """
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
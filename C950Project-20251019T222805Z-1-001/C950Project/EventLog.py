@@ -0,0 +1,616 @@
+# This module keeps an append-only binary log of every state change of the simulated day (package loaded,
+# truck departed, leg driven, package departed, delivered, returned or cancelled, address changed), so the
+# package table and truck state can be rebuilt without planning the day again.
+# Records are buffered and written in batches. Every CHECKPOINT_EVERY records the state reached so far
+# (package table and truck arrays) is saved next to the log, so recovery loads the latest checkpoint and
+# replays only the records after it. The log is ordered by time, which also allows "replay up to time T"
+# from the latest checkpoint taken before T. RecoveredPlan answers the status queries of a planned day from
+# the log, so Main.py --recover can query or serve a logged day without planning it again.
+#
+# Log layout:
+#   8 bytes   magic b"C950ELOG"
+#   4 bytes   format version (little-endian uint32)
+#   4 bytes   record size (little-endian uint32)
+#   records   fixed-size little-endian records (see RECORD_DTYPE); a torn last record is ignored
+# Checkpoint '<log>.<records>.ckpt' is a NumPy .npz file holding the state after the first <records> records.
+import argparse
+import glob
+import json
+import os
+import re
+import struct
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+from DeliveryPlanner import HUB_ADDRESS
+from FleetState import FleetState
+from PackageStore import NO_ADDRESS
+from TimeModel import format_clock, format_duration, parse_clock
+from Timeline import (LOADED, DEPARTED, DELIVERED, ADDRESS_CHANGED, RETURNED, CANCELLED, AT_HUB, EN_ROUTE,
+                      STATUS_DELIVERED, STATUS_CANCELLED, STATUS_NAMES, NEVER)
+
+MAGIC = b"C950ELOG"
+FORMAT_VERSION = 1
+
+# Record kinds: the package event kinds of Timeline, plus these truck events
+LEG = 6  # A truck reached address_id, having driven miles since its last stop
+TRUCK_DEPARTED = 7  # A truck left address_id on a trip
+
+# One record: kind, time (seconds since midnight), package ID, truck index (-1 for none), address id, miles
+RECORD_DTYPE = np.dtype([("kind", "u1"), ("time", "<i4"), ("parcel_id", "<i4"), ("truck", "<i4"),
+                         ("address_id", "<i4"), ("miles", "<f8")])
+_RECORD = struct.Struct("<Biiiid")
+_PREFIX = struct.Struct("<8sII")  # magic, version, record size
+
+# Records buffered before they are written
+BATCH_RECORDS = 4096
+
+# Records between checkpoints
+CHECKPOINT_EVERY = 65536
+
+# Checkpoints kept besides the first one (which is always kept, so any time can be replayed)
+KEEP_CHECKPOINTS = 8
+
+# States for earlier times kept by RecoveredPlan
+RECOVERED_STATES_KEPT = 16
+
+_NO_TRUCK = -1
+
+
+class LoggedState:
+    def __init__(self, parcel_ids, address_ids, trucks):
+        """
+        Creates the state at the start of the day: every package at the hub, every truck where it starts.
+
+        Parameters:
+        parcel_ids (array-like of int): The package IDs.
+        address_ids (array-like of int): Each package's address id (NO_ADDRESS if not resolved).
+        trucks (list of DeliveryTruck): The trucks, in simulator order.
+        """
+        self.parcel_ids = np.asarray(parcel_ids, dtype=np.int64)
+        self.address_ids = np.asarray(address_ids, dtype=np.int32).copy()
+        self.trucks = np.full(len(self.parcel_ids), _NO_TRUCK, dtype=np.int32)  # Truck each package was loaded on
+        self.status = np.full(len(self.parcel_ids), AT_HUB, dtype=np.uint8)  # Timeline status codes
+        self.departure_times = np.full(len(self.parcel_ids), NEVER, dtype=np.int64)
+        self.delivery_times = np.full(len(self.parcel_ids), NEVER, dtype=np.int64)
+        # Truck state; load is the number of packages on board. The fleet is never stepped, so it needs no distances.
+        self.fleet = FleetState.from_trucks(trucks, None)
+        self.fleet.load[:] = 0
+        self.records = 0  # Records applied
+        self.time = 0  # Time of the last record applied
+        self._rows = None
+
+    @property
+    def rows(self):
+        """
+        Package ID -> row of the package arrays.
+        """
+        if self._rows is None:
+            self._rows = {int(parcel_id): row for row, parcel_id in enumerate(self.parcel_ids.tolist())}
+        return self._rows
+
+    def apply(self, kind, time, parcel_id, truck, address_id, miles):
+        """
+        Applies one record.
+        """
+        self.records += 1
+        self.time = time
+        fleet = self.fleet
+        if kind == LEG:
+            fleet.mileage[truck] += miles
+            fleet.clock[truck] = time
+            fleet.address_ids[truck] = address_id
+            return
+        if kind == TRUCK_DEPARTED:
+            fleet.clock[truck] = fleet.departure_time[truck] = time
+            fleet.address_ids[truck] = address_id
+            return
+        row = self.rows[parcel_id]
+        if kind == ADDRESS_CHANGED:
+            self.address_ids[row] = address_id
+            return
+        status = self.status[row]
+        if status == STATUS_DELIVERED or status == STATUS_CANCELLED:
+            return  # Final, as in DeliveryTimeline
+        on_board = self.trucks[row] != _NO_TRUCK
+        if kind == LOADED:
+            if not on_board:
+                fleet.load[truck] += 1
+            self.trucks[row] = truck
+            self.status[row] = AT_HUB
+        elif kind == DEPARTED:
+            self.status[row] = EN_ROUTE
+            self.departure_times[row] = time
+        elif kind in (DELIVERED, RETURNED, CANCELLED):
+            if on_board:
+                fleet.load[self.trucks[row]] -= 1
+                self.trucks[row] = _NO_TRUCK
+            if kind == DELIVERED:
+                self.status[row] = STATUS_DELIVERED
+                self.delivery_times[row] = time
+            else:
+                self.status[row] = STATUS_CANCELLED if kind == CANCELLED else AT_HUB
+
+    def apply_records(self, records):
+        """
+        Applies records read with read_records().
+        """
+        for kind, time, parcel_id, truck, address_id, miles in records.tolist():
+            self.apply(kind, time, parcel_id, truck, address_id, miles)
+
+    def package_status(self, parcel_id):
+        """
+        Returns one package's state (None if the ID is unknown).
+
+        Returns:
+        dict: id, address_id, status, truck (its number, None if on none), departure_time and delivery_time.
+        """
+        row = self.rows.get(parcel_id)
+        if row is None:
+            return None
+        truck = int(self.trucks[row])
+        return {"id": parcel_id, "address_id": _address(self.address_ids[row]),
+                "status": STATUS_NAMES[self.status[row]], "truck": truck + 1 if truck != _NO_TRUCK else None,
+                "departure_time": _clock(self.departure_times[row]), "delivery_time": _clock(self.delivery_times[row])}
+
+    def truck_state(self, index):
+        """
+        Returns one truck's state.
+
+        Returns:
+        dict: truck (its number), address_id, time, mileage and load (packages on board).
+        """
+        fleet = self.fleet
+        return {"truck": index + 1, "address_id": _address(fleet.address_ids[index]),
+                "time": format_clock(int(fleet.clock[index])), "mileage": round(float(fleet.mileage[index]), 2),
+                "load": int(fleet.load[index])}
+
+    def apply_to(self, packages, address_name=None):
+        """
+        Writes the state onto the packages of a hash table (address, status, departure and delivery times).
+
+        Parameters:
+        packages (HashMapCreation): Package ID -> Parcel (or ParcelView).
+        address_name (callable): Maps an address id to its text, to update delivery_address after a change.
+        """
+        for row, parcel_id in enumerate(self.parcel_ids.tolist()):
+            parcel = packages.lookup(parcel_id)
+            if parcel is None:
+                continue
+            address_id = _address(self.address_ids[row])
+            if address_id != parcel.address_id:
+                parcel.address_id = address_id
+                if address_name is not None and address_id is not None:
+                    parcel.delivery_address = address_name(address_id)
+            parcel.status = STATUS_NAMES[self.status[row]]
+            parcel.departure_time = _clock_seconds(self.departure_times[row])
+            parcel.delivery_time = _clock_seconds(self.delivery_times[row])
+            packages.update(parcel)
+
+    def save(self, path):
+        """
+        Writes the state to a checkpoint file, replacing it atomically.
+        """
+        fleet = self.fleet
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as checkpoint_file:
+            np.savez(checkpoint_file, meta=np.array([FORMAT_VERSION, self.records, self.time], dtype=np.int64),
+                     parcel_ids=self.parcel_ids, address_ids=self.address_ids, trucks=self.trucks, status=self.status,
+                     departure_times=self.departure_times, delivery_times=self.delivery_times,
+                     truck_address_ids=fleet.address_ids, clock=fleet.clock, mileage=fleet.mileage, load=fleet.load,
+                     truck_departure_times=fleet.departure_time)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a checkpoint file written by save().
+        """
+        with np.load(path) as arrays:
+            version, records, time = arrays["meta"].tolist()
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path}: checkpoint format {version}, expected {FORMAT_VERSION}")
+            state = cls.__new__(cls)
+            state.parcel_ids = arrays["parcel_ids"]
+            state.address_ids = arrays["address_ids"]
+            state.trucks = arrays["trucks"]
+            state.status = arrays["status"]
+            state.departure_times = arrays["departure_times"]
+            state.delivery_times = arrays["delivery_times"]
+            fleet = FleetState(len(arrays["clock"]), None)
+            fleet.address_ids = arrays["truck_address_ids"]
+            fleet.clock = arrays["clock"]
+            fleet.mileage = arrays["mileage"]
+            fleet.load = arrays["load"]
+            fleet.departure_time = arrays["truck_departure_times"]
+            state.fleet = fleet
+            state.records, state.time = records, time
+            state._rows = None
+        return state
+
+
+class EventLogWriter:
+    def __init__(self, path, batch_records=BATCH_RECORDS, checkpoint_every=CHECKPOINT_EVERY, sync=False,
+                 overwrite=False):
+        """
+        Creates a log writer. The log file is created by start(), which FleetSimulator.run calls.
+
+        Parameters:
+        path (str): The log file; checkpoints are written next to it.
+        batch_records (int): Records buffered before they are written.
+        checkpoint_every (int): Records between checkpoints (None for only the first and last).
+        sync (bool): If True, every batch is forced to disk with os.fsync before the writer goes on.
+        overwrite (bool): If True, start() replaces a log that already holds records.
+        """
+        self.path = path
+        self.batch_records = batch_records
+        self.checkpoint_every = checkpoint_every
+        self.sync = sync
+        self.overwrite = overwrite
+        self.state = None  # LoggedState after every record written
+        self._file = None
+        self._buffer = bytearray()
+        self._pending = 0  # Records in the buffer
+        self._last_checkpoint = 0  # Records covered by the latest checkpoint
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self, packages, trucks):
+        """
+        Creates the log, replacing any earlier log and checkpoints at the path, and checkpoints the start state.
+
+        Parameters:
+        packages (HashMapCreation): Package ID -> Parcel (or ParcelView).
+        trucks (list of DeliveryTruck): The trucks, in simulator order.
+
+        Raises:
+        FileExistsError: If the path holds a log with records (or any other file) and overwrite is False.
+        """
+        if not self.overwrite and os.path.exists(self.path) and os.path.getsize(self.path) > _PREFIX.size:
+            raise FileExistsError(f"{self.path} already holds an event log")
+        for old_checkpoint in checkpoints(self.path):
+            os.remove(old_checkpoint[1])
+        parcel_ids = sorted(packages)
+        address_ids = [_address_code(packages.lookup(parcel_id).address_id) for parcel_id in parcel_ids]
+        self.state = LoggedState(parcel_ids, address_ids, trucks)
+        self._file = open(self.path, "wb")
+        self._file.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, RECORD_DTYPE.itemsize))
+        self._last_checkpoint = 0
+        self.state.save(checkpoint_path(self.path, 0))
+
+    def package_event(self, kind, time, parcel_id, truck=_NO_TRUCK, address_id=NO_ADDRESS):
+        """
+        Logs a package event (a Timeline kind: LOADED, DEPARTED, DELIVERED, ADDRESS_CHANGED, RETURNED or
+        CANCELLED). address_id is the new address for ADDRESS_CHANGED.
+        """
+        self._append(kind, time, parcel_id, _NO_TRUCK if truck is None else truck, _address_code(address_id), 0.0)
+
+    def truck_departed(self, truck, time, address_id):
+        """
+        Logs a truck leaving an address on a trip.
+        """
+        self._append(TRUCK_DEPARTED, time, 0, truck, address_id, 0.0)
+
+    def leg(self, truck, time, address_id, miles):
+        """
+        Logs a truck reaching an address at a time, having driven miles since its last stop.
+        """
+        self._append(LEG, time, 0, truck, address_id, miles)
+
+    def _append(self, kind, time, parcel_id, truck, address_id, miles):
+        self._buffer += _RECORD.pack(kind, time, parcel_id, truck, address_id, miles)
+        self.state.apply(kind, time, parcel_id, truck, address_id, miles)
+        self._pending += 1
+        if self._pending >= self.batch_records:
+            self.flush()
+        if self.checkpoint_every and self.state.records - self._last_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def flush(self):
+        """
+        Writes the buffered records to the log.
+        """
+        if self._file is None:
+            return
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+            self._pending = 0
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+    def checkpoint(self):
+        """
+        Flushes the log and saves the current state, then drops the oldest checkpoints beyond KEEP_CHECKPOINTS
+        (the first one is kept).
+        """
+        if self._file is None:
+            return
+        self.flush()
+        if not self.sync:
+            os.fsync(self._file.fileno())  # The log must hold every record the checkpoint covers
+        self.state.save(checkpoint_path(self.path, self.state.records))
+        self._last_checkpoint = self.state.records
+        saved = checkpoints(self.path)
+        for _, old_path in saved[1:-KEEP_CHECKPOINTS]:
+            os.remove(old_path)
+
+    def close(self):
+        """
+        Writes the last records and a final checkpoint, then closes the log.
+        """
+        if self._file is None:
+            return
+        if self.state.records != self._last_checkpoint:
+            self.checkpoint()
+        self.flush()
+        self._file.close()
+        self._file = None
+
+
+def checkpoint_path(log_path, records):
+    """
+    Returns the path of the checkpoint taken after a number of records.
+    """
+    return f"{log_path}.{records:012d}.ckpt"
+
+
+def checkpoints(log_path):
+    """
+    Returns the checkpoints of a log as (records, path) pairs, oldest first.
+    """
+    pattern = re.compile(re.escape(os.path.basename(log_path)) + r"\.(\d{12})\.ckpt$")
+    found = []
+    for path in glob.glob(glob.escape(log_path) + ".*.ckpt"):
+        match = pattern.match(os.path.basename(path))
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def read_records(log_path, start=0):
+    """
+    Reads the complete records of a log from record number start on.
+
+    Returns:
+    numpy.ndarray: Records with the fields of RECORD_DTYPE.
+
+    Raises:
+    ValueError: If the file is not an event log.
+    """
+    with open(log_path, "rb") as log_file:
+        prefix = log_file.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size:
+        raise ValueError(f"{log_path}: not an event log")
+    magic, version, record_size = _PREFIX.unpack(prefix)
+    if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{log_path}: not an event log")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{log_path}: log format {version}, expected {FORMAT_VERSION}")
+    offset = _PREFIX.size + start * RECORD_DTYPE.itemsize
+    count = max(0, (os.path.getsize(log_path) - offset) // RECORD_DTYPE.itemsize)  # A torn last record is left out
+    return np.fromfile(log_path, dtype=RECORD_DTYPE, count=count, offset=offset)
+
+
+def recover(log_path, until=None):
+    """
+    Rebuilds the state from the latest checkpoint (taken at or before until) and the records after it.
+
+    Parameters:
+    log_path (str): The log file.
+    until (int): Replay only the records up to this time, in seconds since midnight (default: all of them).
+
+    Returns:
+    tuple: (LoggedState, number of records replayed after the checkpoint)
+
+    Raises:
+    ValueError: If the log has no checkpoint.
+    """
+    for records, path in reversed(checkpoints(log_path)):
+        if until is not None and records and _checkpoint_time(path) > until:
+            continue  # Taken after the time asked for
+        state = LoggedState.load(path)
+        tail = read_records(log_path, records)
+        if until is not None:
+            tail = tail[:np.searchsorted(tail["time"], until, side="right")]
+        state.apply_records(tail)
+        return state, len(tail)
+    raise ValueError(f"{log_path}: no checkpoint to recover from")
+
+
+class RecoveredPlan:
+    """
+    Answers the status queries of a DeliveryPlan (package_status, truck_position, ...) from an event log instead
+    of a simulation, so a logged day can be queried or served again without planning it. The state at the end
+    of the log (or at until) is written onto the dataset's packages; a query for an earlier time replays the
+    log up to that time from the latest checkpoint before it.
+    """
+    recovered = True  # The log holds no routes, so there is no greedy or return mileage to report
+
+    def __init__(self, dataset, log_path, until=None):
+        """
+        Recovers the state from a log.
+
+        Parameters:
+        dataset (Dataset): The data the logged day was planned from; its packages receive the recovered state.
+        log_path (str): The log file.
+        until (int): Recover the state at this time, in seconds since midnight (default: the end of the log).
+            Queries for later times are answered with this state.
+
+        Raises:
+        OSError: If the log or a checkpoint cannot be read.
+        ValueError: If the file is not an event log or has no checkpoint.
+        """
+        self.dataset = dataset
+        self.log_path = log_path
+        self.state, self.replayed = recover(log_path, until)
+        self.state.apply_to(dataset.hash_table, dataset.address_registry.address)
+        self.trucks = self.state.fleet.trucks()
+        self.hub_address_id = dataset.find_address_id(HUB_ADDRESS)
+        self._earlier = OrderedDict()  # Query time -> LoggedState recovered for it, most recent last
+
+    @property
+    def total_mileage(self):
+        """
+        Combined mileage of every truck at the recovered time.
+        """
+        return self.state.fleet.total_mileage
+
+    @property
+    def finish_time(self):
+        """
+        Seconds since midnight of the last truck event recovered.
+        """
+        return self.state.fleet.finish_time
+
+    def state_at(self, query_time):
+        """
+        Returns the LoggedState at a time (the recovered state for its time and any later one).
+        """
+        if query_time >= self.state.time:
+            return self.state
+        state = self._earlier.get(query_time)
+        if state is None:
+            state, _ = recover(self.log_path, query_time)
+            self._earlier[query_time] = state
+            if len(self._earlier) > RECOVERED_STATES_KEPT:
+                self._earlier.popitem(last=False)
+        else:
+            self._earlier.move_to_end(query_time)
+        return state
+
+    def package_status(self, parcel_id, query_time):
+        """
+        Returns the state of one package at a time as a dictionary, or None if the ID is unknown.
+
+        Returns:
+        dict: id, address, city, state, zip, deadline, weight, status and delivery_time (None unless delivered),
+            as DeliveryPlan.package_status.
+        """
+        parcel = self.dataset.hash_table.lookup(parcel_id)
+        state = self.state_at(query_time)
+        row = state.rows.get(parcel_id)
+        if parcel is None or row is None:
+            return None
+        address_id = _address(state.address_ids[row])
+        delivery_seconds = _clock_seconds(state.delivery_times[row])
+        return {
+            "id": parcel_id,
+            "address": self.dataset.address_registry.address(address_id) if address_id is not None
+            else parcel.delivery_address,
+            "city": parcel.city,
+            "state": parcel.state,
+            "zip": parcel.zipcode,
+            "deadline": parcel.deadline,
+            "weight": parcel.weight,
+            "status": STATUS_NAMES[state.status[row]],
+            "delivery_time": format_duration(delivery_seconds) if delivery_seconds is not None else None,
+        }
+
+    def all_package_status(self, query_time):
+        """
+        Returns package_status() for every package at a time, sorted by package ID.
+        """
+        rows = (self.package_status(parcel_id, query_time) for parcel_id in sorted(self.dataset.hash_table))
+        return [row for row in rows if row is not None]
+
+    def format_package_at(self, parcel_id, query_time):
+        """
+        Formats a package's details and status at a time in the same layout as Parcel.__str__.
+        """
+        row = self.package_status(parcel_id, query_time)
+        return "{}, {}, {}, {}, {}, {}, {}, {}, {}".format(
+            row["id"], row["address"], row["city"], row["state"], row["zip"], row["deadline"], row["weight"],
+            row["delivery_time"], row["status"])
+
+    def truck_position(self, truck_index, query_time):
+        """
+        Returns where a truck is at a time, with the keys of DeliveryPlan.truck_position. The log records
+        arrivals only, so location is the last address reached, status is 'At Hub' there and 'En route'
+        anywhere else, and trip, next_location and leg_progress are None.
+        """
+        address_id = _address(self.state_at(query_time).fleet.address_ids[truck_index])
+        at_hub = address_id is None or address_id == self.hub_address_id
+        return {"truck": truck_index + 1, "status": "At Hub" if at_hub else "En route", "trip": None,
+                "location": HUB_ADDRESS if address_id is None else self.dataset.address_registry.address(address_id),
+                "next_location": None, "leg_progress": None}
+
+    def all_truck_positions(self, query_time):
+        """
+        Returns truck_position() for every truck at a time.
+        """
+        return [self.truck_position(truck_index, query_time) for truck_index in range(len(self.trucks))]
+
+
+def _checkpoint_time(path):
+    with np.load(path) as arrays:
+        return int(arrays["meta"][2])
+
+
+def _address(address_id):
+    return None if address_id == NO_ADDRESS else int(address_id)
+
+
+def _address_code(address_id):
+    return NO_ADDRESS if address_id is None else address_id
+
+
+def _clock_seconds(seconds):
+    return None if seconds == NEVER else int(seconds)
+
+
+def _clock(seconds):
+    return None if seconds == NEVER else format_clock(int(seconds))
+
+
+def main(argv=None):
+    """
+    Command-line entry point: recovers the state from an event log and prints it as JSON.
+
+    Parameters:
+    argv (list of str): Command-line arguments (default: sys.argv[1:]).
+
+    Returns:
+    int: The exit status.
+    """
+    parser = argparse.ArgumentParser(description="Rebuild package and truck state from an event log.")
+    parser.add_argument("log", help="event log written with Main.py --event-log")
+    parser.add_argument("--until", help="replay only the events up to this time, e.g. '10:30 AM'")
+    parser.add_argument("--packages", action="store_true", help="include every package's state")
+    args = parser.parse_args(argv)
+    try:
+        until = parse_clock(args.until) if args.until is not None else None
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        state, replayed = recover(args.log, until)
+    except (OSError, ValueError) as e:
+        print(f"Cannot recover: {e}", file=sys.stderr)
+        return 1
+
+    counts = np.bincount(state.status, minlength=len(STATUS_NAMES))
+    result = {
+        "records": state.records,
+        "replayed": replayed,
+        "time": format_clock(state.time),
+        "status": {name: int(count) for name, count in zip(STATUS_NAMES, counts)},
+        "total_mileage": round(state.fleet.total_mileage, 2),
+        "trucks": [state.truck_state(index) for index in range(len(state.fleet))],
+    }
+    if args.packages:
+        result["packages"] = [state.package_status(parcel_id) for parcel_id in state.parcel_ids.tolist()]
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
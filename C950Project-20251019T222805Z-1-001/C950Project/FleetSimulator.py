@@ -0,0 +1,531 @@
+# This module drives every truck of the fleet on one shared clock.
+# Events (truck ready to load, departure, arrival at a stop, return to the hub) are kept in a heap ordered by
+# time, so trucks move concurrently and the simulation costs O(events log trucks) however many trucks there
+# are. Drivers are a limited resource: a truck only leaves the hub when a driver is free, and a driver is
+# freed when their truck is back at the hub with no more trips. Trucks drive back to the hub after their
+# last stop, can make several trips (reloading at the hub in between) and wait for late-arriving packages.
+# Address changes, delays and cancellations (see DeliveryEvents) are applied at their effective time: a
+# truck already on the road only has the rest of its route re-optimized, and the rest of the fleet is untouched.
+# Every state change can also be written to an EventLog, from which the day's state is recovered or replayed.
+# Each package event also updates the package itself (status, corrected address) through the hash table, so
+# its secondary indexes agree with the timeline.
+import heapq
+from collections import deque
+
+from DeliveryEvents import ADDRESS_CHANGE, DELAY, CANCEL
+from Instrumentation import metrics
+from RouteOptimizer import RouteOptimizer, RouteResult, greedy_seed
+from Timeline import (LOADED, DEPARTED, DELIVERED, ADDRESS_CHANGED, RETURNED, CANCELLED, AT_HUB, EN_ROUTE,
+                      STATUS_DELIVERED, STATUS_CANCELLED, STATUS_NAMES)
+
+# Event kinds, in the order they are handled when they happen at the same second
+_FEED = 0
+_RETURN = 1
+_ARRIVE = 2
+_READY = 3
+_DEPART = 4
+
+# Package event kind -> status written onto the package when it happens
+_PACKAGE_STATUS = {DEPARTED: STATUS_NAMES[EN_ROUTE], DELIVERED: STATUS_NAMES[STATUS_DELIVERED],
+                   RETURNED: STATUS_NAMES[AT_HUB], CANCELLED: STATUS_NAMES[STATUS_CANCELLED]}
+
+
+class TripRecord:
+    def __init__(self, truck_index, load_time, departure_time, package_ids, route_result):
+        """
+        Describes one trip of one truck, from loading at the hub to returning to it.
+
+        Parameters:
+        truck_index (int): Index of the truck in the list given to the simulator.
+        load_time (int): Seconds since midnight at which loading started.
+        departure_time (int): Seconds since midnight at which the truck left the hub.
+        package_ids (list of int): The packages, in the planned delivery order.
+        route_result (RouteResult): The route optimizer's result for the trip.
+        """
+        self.truck_index = truck_index
+        self.load_time = load_time
+        self.departure_time = departure_time
+        self.package_ids = package_ids
+        self.route_result = route_result
+        self.last_delivery_time = departure_time  # Time of the last delivery
+        self.return_time = None  # Arrival back at the hub (None if the truck stayed out)
+        self.return_mileage = 0.0  # Miles driven from the last stop back to the hub
+        self.undelivered = []  # Packages that could not be reached
+        self.returned = []  # Packages taken off the route by a delay; they go back to the hub
+        self.reroutes = 0  # Times the rest of the route was re-optimized after an event
+        self.visited = []  # Address ids the truck drove to, starting with the hub
+        self.visit_times = []  # Arrival time at each visited address (departure time for the hub)
+        self.deliveries = []  # (index into visited, package ID, deadline) for each package delivered
+
+    def __str__(self):
+        """
+        Returns a one-line summary of the trip.
+        """
+        return "truck {}: {} packages, {}".format(self.truck_index + 1, len(self.package_ids), self.route_result)
+
+
+class FeedOutcome:
+    def __init__(self, event, outcome, truck_index=None):
+        """
+        Records what the simulator did with one DeliveryEvent.
+
+        Parameters:
+        event (DeliveryEvent): The event.
+        outcome (str): 'rerouted', 'updated', 'ignored: <reason>', ...
+        truck_index (int): The truck carrying the package (None if it is on no truck).
+        """
+        self.event = event
+        self.outcome = outcome
+        self.truck_index = truck_index
+
+    def __str__(self):
+        return "{} -> {}".format(self.event, self.outcome)
+
+
+class SimulationResult:
+    def __init__(self, trucks, trips, driver_wait, undelivered, feed_log):
+        """
+        Holds the outcome of FleetSimulator.run.
+
+        Parameters:
+        trucks (list of DeliveryTruck): The simulated trucks, with their final mileage and time.
+        trips (list of TripRecord): Every trip, in the order they started.
+        driver_wait (list of int): Seconds each truck spent ready at the hub waiting for a driver.
+        undelivered (list of int): Packages that could not be delivered (cancelled packages excluded).
+        feed_log (list of FeedOutcome): What happened to each event of the feed.
+        """
+        self.trucks = trucks
+        self.trips = trips
+        self.driver_wait = driver_wait
+        self.undelivered = undelivered
+        self.feed_log = feed_log
+
+    @property
+    def total_mileage(self):
+        """
+        Combined mileage of every truck, including the legs back to the hub.
+        """
+        return sum(truck.total_mileage for truck in self.trucks)
+
+    @property
+    def return_mileage(self):
+        """
+        Miles driven from last stops back to the hub.
+        """
+        return sum(trip.return_mileage for trip in self.trips)
+
+    @property
+    def route_results(self):
+        """
+        The route optimizer's result for every trip.
+        """
+        return [trip.route_result for trip in self.trips]
+
+    @property
+    def finish_time(self):
+        """
+        Seconds since midnight at which the last truck finished.
+        """
+        return max((truck.current_time for truck in self.trucks), default=0)
+
+
+class _TruckRun:
+    """
+    Simulation state of one truck.
+    """
+    def __init__(self, trips):
+        self.trips = trips  # Package ids per trip
+        self.trip_index = 0  # Trip being loaded or driven
+        self.deferred_trip = None  # Index of the trip collecting delayed packages (always a later trip)
+        self.has_driver = False
+        self.departed = False  # True while the current trip is on the road
+        self.ready_since = None  # Time the truck started waiting for a driver
+        self.record = None  # TripRecord of the current trip
+        self.stops = []  # [parcel, address id, active] in delivery order for the current trip
+        self.position = 0  # Index of the stop the truck is driving to
+        self.leg_miles = 0.0  # Length of the leg being driven
+
+
+def split_trips(package_ids, capacity):
+    """
+    Splits a truck's packages into trips of at most capacity packages, keeping their order.
+    """
+    if capacity is None or capacity <= 0:
+        return [list(package_ids)] if package_ids else []
+    return [list(package_ids[start:start + capacity]) for start in range(0, len(package_ids), capacity)]
+
+
+class FleetSimulator:
+    def __init__(self, distances, hub_address_id, drivers=None, load_seconds_per_package=0, return_to_hub=True,
+                 time_limit=0.5, location_name=None, address_ids=None):
+        """
+        Creates a simulator for trucks that start and reload at one hub.
+
+        Parameters:
+        distances (DistanceMatrix): The distances between addresses.
+        hub_address_id (int): The address id of the hub.
+        drivers (int): Number of drivers (default: one per truck).
+        load_seconds_per_package (int): Seconds spent loading each package before a trip.
+        return_to_hub (bool): If False, a truck's final trip ends at its last stop (it still returns between trips).
+        time_limit (float): Seconds the route optimizer may spend on each trip.
+        location_name (callable): Maps an address id to its text, used for DeliveryTruck.current_location.
+        address_ids (callable): Maps an address to its id (None if unknown), used for address changes.
+        """
+        self.distances = distances
+        self.hub_address_id = hub_address_id
+        self.drivers = drivers
+        self.load_seconds_per_package = load_seconds_per_package
+        self.return_to_hub = return_to_hub
+        self.time_limit = time_limit
+        self.location_name = location_name
+        self.address_ids = address_ids
+
+    def run(self, trucks, packages, trips=None, available_times=None, events=None, timeline_builder=None,
+            event_log=None):
+        """
+        Simulates the day.
+
+        Each trip is routed when it departs, with the nearest-neighbour seed improved by RouteOptimizer,
+        using the addresses known at that time. Delivery and departure times are written onto the packages
+        and each truck's package_ids becomes its delivery order.
+
+        Parameters:
+        trucks (list of DeliveryTruck): The trucks; departure_time is the earliest time each may leave.
+        packages (HashMapCreation): Package ID -> Parcel (or ParcelView).
+        trips (list of list of list of int): Package IDs per trip per truck (default: each truck's
+            package_ids split into trips of max_capacity packages).
+        available_times (dict): Package ID -> seconds since midnight at which it reaches the hub.
+        events (list of DeliveryEvent): Address changes, delays and cancellations to apply during the day.
+        timeline_builder (TimelineBuilder): Receives the package events.
+        event_log (EventLogWriter): Receives every state change (package events, departures and legs);
+            it is started here and flushed at the end, but left open.
+
+        Returns:
+        SimulationResult: The trips, driver waiting times, undelivered packages and feed outcomes.
+        """
+        if trips is None:
+            trips = [split_trips(truck.package_ids, truck.max_capacity) for truck in trucks]
+        simulation = _Simulation(self, trucks, packages, trips, available_times, timeline_builder, event_log)
+        for index, event in enumerate(events or ()):
+            simulation.push(event.time, _FEED, index)
+        return simulation.run(list(events or ()))
+
+    def route(self, start_address_id, address_ids, deadlines, start_time, travel_speed):
+        """
+        Orders stops with the nearest-neighbour seed improved by RouteOptimizer.
+
+        Returns:
+        RouteResult: The route; stops that cannot be reached are left out of result.route.
+        """
+        with metrics.stage("routing"):
+            seed_order = greedy_seed(self.distances, start_address_id, address_ids, deadlines)
+            if not seed_order:
+                return RouteResult([], 0.0, 0.0, 0, 0)
+            optimizer = RouteOptimizer(self.distances, travel_speed=travel_speed, time_limit=self.time_limit)
+            return optimizer.optimize(start_address_id, address_ids, seed_order, deadlines, start_time)
+
+
+class _Simulation:
+    """
+    State of one FleetSimulator.run call.
+    """
+    def __init__(self, simulator, trucks, packages, trips, available_times, timeline_builder, event_log):
+        self.simulator = simulator
+        self.trucks = trucks
+        self.packages = packages
+        self.runs = [_TruckRun([trip for trip in truck_trips if trip]) for truck_trips in trips]
+        self.available_times = dict(available_times or {})
+        self.timeline_builder = timeline_builder
+        self.event_log = event_log
+        self.free_drivers = len(trucks) if simulator.drivers is None else simulator.drivers
+        self.waiting = deque()  # Trucks ready to leave but without a driver, in the order they became ready
+        self.driver_wait = [0] * len(trucks)
+        self.records = []
+        self.feed_log = []
+        self.addresses = {}  # Package ID -> (address id, address) after an address change
+        self.cancelled = set()
+        self.delivered = set()
+        self.holder = {}  # Package ID -> index of the truck carrying it
+        self.events = []
+        self.sequence = 0
+
+        for index, truck in enumerate(trucks):
+            truck.package_ids = []
+            if truck.current_address_id is None:
+                truck.current_address_id = simulator.hub_address_id
+            for trip in self.runs[index].trips:
+                for parcel_id in trip:
+                    self.holder[parcel_id] = index
+            if self.runs[index].trips:
+                self.push(truck.departure_time, _READY, index)
+        if event_log is not None:
+            event_log.start(packages, trucks)
+
+    def push(self, time, kind, index):
+        heapq.heappush(self.events, (time, kind, self.sequence, index))
+        self.sequence += 1
+
+    def record(self, parcel_id, time, kind, detail=None):
+        if self.timeline_builder is not None:
+            self.timeline_builder.add(parcel_id, time, kind, detail)
+        if self.event_log is not None:
+            address_id = self.addresses[parcel_id][0] if kind == ADDRESS_CHANGED else None
+            self.event_log.package_event(kind, time, parcel_id, self.holder.get(parcel_id), address_id)
+        # Keep the package and its secondary indexes in step with the timeline
+        status = _PACKAGE_STATUS.get(kind)
+        if status is not None:
+            self.packages.set_status(parcel_id, status)
+        elif kind == ADDRESS_CHANGED:
+            parcel = self.packages.lookup(parcel_id)
+            parcel.address_id, parcel.delivery_address = self.addresses[parcel_id]
+            self.packages.update(parcel)
+
+    def run(self, feed):
+        handlers = {_FEED: None, _READY: self.ready, _DEPART: self.depart, _ARRIVE: self.arrive,
+                    _RETURN: self.arrive_at_hub}
+        while self.events:
+            now, kind, _, index = heapq.heappop(self.events)
+            if kind == _FEED:
+                self.apply(now, feed[index])
+            else:
+                handlers[kind](now, index)
+        if self.event_log is not None:
+            self.event_log.flush()
+        undelivered = [parcel_id for record in self.records for parcel_id in record.undelivered]
+        return SimulationResult(self.trucks, self.records, self.driver_wait, undelivered, self.feed_log)
+
+    def ready(self, now, index):
+        run = self.runs[index]
+        trip = run.trips[run.trip_index]
+        if not trip:
+            # Every package of the trip was cancelled or delayed before loading
+            self.next_trip(now, index)
+            return
+        available = max((self.available_times.get(parcel_id, 0) for parcel_id in trip), default=0)
+        if available > now:
+            # Wait at the hub for late packages; the driver can take another truck meanwhile
+            if run.has_driver:
+                self.release_driver(now, run)
+            self.push(available, _READY, index)
+            return
+        if not run.has_driver:
+            if self.free_drivers == 0:
+                run.ready_since = now
+                self.waiting.append(index)
+                return
+            self.free_drivers -= 1
+            run.has_driver = True
+        departure = now + self.simulator.load_seconds_per_package * len(trip)
+        run.record = TripRecord(index, now, departure, [], None)
+        self.records.append(run.record)
+        for parcel_id in trip:
+            self.record(parcel_id, now, LOADED)
+        self.push(departure, _DEPART, index)
+
+    def depart(self, now, index):
+        truck, run = self.trucks[index], self.runs[index]
+        truck.departure_time = now
+        truck.current_time = now
+        run.record.departure_time = now
+        run.record.visited.append(truck.current_address_id)
+        run.record.visit_times.append(now)
+        if self.event_log is not None:
+            self.event_log.truck_departed(index, now, truck.current_address_id)
+        stops = []
+        for parcel_id in run.trips[run.trip_index]:
+            parcel = self.packages.lookup(parcel_id)
+            if parcel is None or parcel_id in self.cancelled:
+                continue
+            address_id = self.addresses.get(parcel_id, (parcel.address_id,))[0]
+            if address_id is None:
+                run.record.undelivered.append(parcel_id)
+                continue
+            stops.append([parcel, address_id, True])
+            self.record(parcel_id, now, DEPARTED)
+
+        result = self.route_stops(truck, truck.current_address_id, now, stops, run.record)
+        run.record.route_result = result
+        run.stops = [stops[k] for k in result.route]
+        run.record.package_ids = [stop[0].parcel_id for stop in run.stops]
+        run.position = 0
+        run.departed = True
+        self.drive_to_next_stop(now, index)
+
+    def arrive(self, now, index):
+        truck, run = self.trucks[index], self.runs[index]
+        parcel, address_id, active = run.stops[run.position]
+        if self.event_log is not None:
+            self.event_log.leg(index, now, run.record.visited[-1], run.leg_miles)
+        if active:
+            parcel.delivery_time = now
+            parcel.departure_time = run.record.departure_time
+            truck.package_ids.append(parcel.parcel_id)
+            run.record.last_delivery_time = now
+            run.record.deliveries.append((len(run.record.visited) - 1, parcel.parcel_id, parcel.deadline_seconds))
+            self.delivered.add(parcel.parcel_id)
+            self.record(parcel.parcel_id, now, DELIVERED)  # Also moves it in the delivery time index
+        run.position += 1
+        self.drive_to_next_stop(now, index)
+
+    def drive_to_next_stop(self, now, index):
+        truck, run = self.trucks[index], self.runs[index]
+        if run.position < len(run.stops):
+            run.leg_miles = self.drive(truck, run.stops[run.position][1], run.record)
+            self.push(truck.current_time, _ARRIVE, index)
+        elif self.simulator.return_to_hub or run.trip_index + 1 < len(run.trips) or run.record.returned:
+            mileage = truck.total_mileage
+            run.leg_miles = self.drive(truck, self.simulator.hub_address_id, run.record)
+            run.record.return_mileage = truck.total_mileage - mileage
+            self.push(truck.current_time, _RETURN, index)
+        else:
+            run.departed = False
+            self.next_trip(now, index)
+
+    def arrive_at_hub(self, now, index):
+        run = self.runs[index]
+        if self.event_log is not None:
+            self.event_log.leg(index, now, self.simulator.hub_address_id, run.leg_miles)
+        run.record.return_time = now
+        run.departed = False
+        for parcel_id in run.record.returned:
+            self.record(parcel_id, now, RETURNED)
+        self.next_trip(now, index)
+
+    def next_trip(self, now, index):
+        """
+        Starts the truck's next trip with the same driver, or frees the driver if there is none.
+        """
+        run = self.runs[index]
+        run.trip_index += 1
+        if run.trip_index < len(run.trips):
+            self.push(now, _READY, index)  # Reload and go out again
+        elif run.has_driver:
+            self.release_driver(now, run)
+
+    def release_driver(self, now, run):
+        """
+        Hands a finished truck's driver to the truck that has waited longest.
+        """
+        run.has_driver = False
+        if not self.waiting:
+            self.free_drivers += 1
+            return
+        index = self.waiting.popleft()
+        self.runs[index].has_driver = True
+        self.driver_wait[index] += now - self.runs[index].ready_since
+        self.push(now, _READY, index)
+
+    def drive(self, truck, address_id, record):
+        """
+        Moves a truck to an address, adding the leg's mileage and travel time.
+
+        Returns:
+        float: The leg's miles.
+        """
+        record.visited.append(address_id)
+        miles = self.simulator.distances.distance(truck.current_address_id, address_id)
+        truck.update_travel(miles)
+        record.visit_times.append(truck.current_time)
+        truck.current_address_id = address_id
+        if self.simulator.location_name is not None:
+            truck.current_location = self.simulator.location_name(address_id)
+        return miles
+
+    def route_stops(self, truck, start_address_id, start_time, stops, record):
+        """
+        Routes stops from an address and records the stops that cannot be reached.
+        """
+        deadlines = [stop[0].deadline_seconds for stop in stops]
+        result = self.simulator.route(start_address_id, [stop[1] for stop in stops], deadlines, start_time,
+                                      truck.travel_speed)
+        if len(result.route) < len(stops):
+            reached = set(result.route)
+            record.undelivered.extend(stops[k][0].parcel_id for k in range(len(stops)) if k not in reached)
+        return result
+
+    def apply(self, now, event):
+        """
+        Applies one DeliveryEvent and re-routes the affected truck if it is on the road.
+        """
+        parcel_id = event.parcel_id
+        if self.packages.lookup(parcel_id) is None:
+            self.feed_log.append(FeedOutcome(event, "ignored: unknown package"))
+            return
+        if parcel_id in self.delivered or parcel_id in self.cancelled:
+            self.feed_log.append(FeedOutcome(event, "ignored: already delivered or cancelled"))
+            return
+
+        if event.kind == ADDRESS_CHANGE:
+            address_id = self.simulator.address_ids(event.address) if self.simulator.address_ids else None
+            if address_id is None:
+                self.feed_log.append(FeedOutcome(event, "ignored: unknown address"))
+                return
+            self.addresses[parcel_id] = (address_id, event.address)
+            self.record(parcel_id, now, ADDRESS_CHANGED, event.address)
+        elif event.kind == DELAY:
+            self.available_times[parcel_id] = max(self.available_times.get(parcel_id, 0), event.until)
+        elif event.kind == CANCEL:
+            self.cancelled.add(parcel_id)
+            self.record(parcel_id, now, CANCELLED)
+
+        index = self.holder.get(parcel_id)
+        if index is None:
+            self.feed_log.append(FeedOutcome(event, "updated"))
+            return
+        run = self.runs[index]
+        position = None
+        if run.departed:
+            position = next((k for k in range(run.position, len(run.stops))
+                             if run.stops[k][0].parcel_id == parcel_id and run.stops[k][2]), None)
+        if position is None:
+            # Still at the hub: the trip picks up the change when it departs
+            if event.kind != ADDRESS_CHANGE:
+                self.remove_from_pending_trips(run, parcel_id)
+                if event.kind == DELAY:
+                    self.defer(run, parcel_id)
+            self.feed_log.append(FeedOutcome(event, "updated", index))
+            return
+        self.reroute(index, position, event)
+        self.feed_log.append(FeedOutcome(event, "rerouted", index))
+
+    def remove_from_pending_trips(self, run, parcel_id):
+        first = run.trip_index + 1 if run.departed else run.trip_index
+        for trip in run.trips[first:]:
+            if parcel_id in trip:
+                trip.remove(parcel_id)
+
+    def defer(self, run, parcel_id):
+        """
+        Moves a delayed package to a later trip of the same truck.
+        """
+        # Once a trip is being loaded it is closed, so delays after that start a new trip
+        if run.deferred_trip is None or run.deferred_trip <= run.trip_index:
+            run.trips.append([])
+            run.deferred_trip = len(run.trips) - 1
+        run.trips[run.deferred_trip].append(parcel_id)
+
+    def reroute(self, index, position, event):
+        """
+        Changes the stop at position and re-optimizes only the stops after the one the truck is driving to.
+        The leg in progress is finished; if it was headed to the changed package, the stop delivers nothing.
+        """
+        truck, run = self.trucks[index], self.runs[index]
+        stop = run.stops[position]
+        if position == run.position:
+            stop[2] = False
+            if event.kind == ADDRESS_CHANGE:
+                run.stops.append([stop[0], self.addresses[event.parcel_id][0], True])
+        elif event.kind == ADDRESS_CHANGE:
+            stop[1] = self.addresses[event.parcel_id][0]
+        else:
+            del run.stops[position]
+        if event.kind == DELAY:
+            run.record.returned.append(event.parcel_id)
+            self.defer(run, event.parcel_id)
+
+        # The truck reaches its current target at truck.current_time; everything after it is re-ordered
+        suffix = run.stops[run.position + 1:]
+        if suffix:
+            result = self.route_stops(truck, run.stops[run.position][1], truck.current_time, suffix, run.record)
+            run.stops[run.position + 1:] = [suffix[k] for k in result.route]
+        run.record.reroutes += 1
@@ -0,0 +1,340 @@
+# This module keeps the state of a whole fleet in parallel NumPy arrays: one entry per truck for its location,
+# clock, mileage, load and position along its route. step() moves every truck that has stops left to its next
+# stop at once (one distance gather, one add per array), and fleet totals are array reductions, so a fleet of
+# thousands of trucks costs a few array operations per step instead of a Python call per truck.
+# FleetState.truck(k) returns a TruckView, which reads and writes truck k's entries through the same
+# attributes as Truck.DeliveryTruck, so code written for DeliveryTruck objects also works on a FleetState.
+import numpy as np
+
+from PackageStore import NO_ADDRESS
+from TimeModel import SECONDS_PER_HOUR, format_duration, travel_seconds
+
+
+class FleetState:
+    def __init__(self, size, distances, travel_speed=18, max_capacity=16, departure_time=0, address_id=NO_ADDRESS,
+                 location_name=None):
+        """
+        Creates a fleet of identical empty trucks, all at one address.
+
+        Parameters:
+        size (int): Number of trucks.
+        distances (DistanceMatrix or ShortestPaths): The distances between addresses.
+        travel_speed (float): Speed of every truck in miles per hour.
+        max_capacity (int): Packages every truck can carry per trip.
+        departure_time (int): Time every truck may leave, in seconds since midnight.
+        address_id (int): Address id where every truck starts (NO_ADDRESS if not resolved).
+        location_name (callable): Maps an address id to its text, used for TruckView.current_location.
+        """
+        self.distances = distances
+        self.location_name = location_name
+        self.max_capacity = np.full(size, max_capacity, dtype=np.int32)
+        self.travel_speed = np.full(size, travel_speed, dtype=np.float64)
+        self.load = np.zeros(size, dtype=np.float64)  # Weight carried by each truck
+        self.mileage = np.zeros(size, dtype=np.float64)  # Miles driven by each truck
+        self.address_ids = np.full(size, address_id, dtype=np.int32)  # Address id each truck is at
+        self.departure_time = np.full(size, departure_time, dtype=np.int64)
+        self.clock = np.full(size, departure_time, dtype=np.int64)  # Each truck's time, seconds since midnight
+        self.cursor = np.zeros(size, dtype=np.int32)  # Index into its route of the stop each truck drives to next
+        self.package_ids = [[] for _ in range(size)]  # Package IDs per truck (lists, like DeliveryTruck's)
+        self.locations = [None] * size  # Address text per truck, used when there is no location_name
+        # Routes of every truck, concatenated: truck k's stops are route_stops[route_starts[k]:route_starts[k + 1]]
+        self.route_stops = np.zeros(0, dtype=np.int32)
+        self.route_starts = np.zeros(size + 1, dtype=np.int64)
+        self.route_leave_times = None  # Earliest time to leave for each stop (None: leave at once)
+
+    def __len__(self):
+        """
+        Returns the number of trucks.
+        """
+        return len(self.clock)
+
+    @classmethod
+    def from_trucks(cls, trucks, distances, location_name=None):
+        """
+        Creates a fleet holding the state of DeliveryTruck objects (the objects themselves are not changed).
+
+        Parameters:
+        trucks (list of DeliveryTruck): The trucks, in fleet order.
+        distances (DistanceMatrix or ShortestPaths): The distances between addresses.
+        location_name (callable): Maps an address id to its text.
+        """
+        fleet = cls(len(trucks), distances, location_name=location_name)
+        for index, truck in enumerate(trucks):
+            fleet.truck(index).copy_from(truck)
+        return fleet
+
+    @classmethod
+    def from_trips(cls, trucks, trips, distances, location_name=None):
+        """
+        Creates a fleet ready to drive simulated trips again: every truck is back where its first trip started,
+        with no mileage, and its route is every trip's stops in order, each trip leaving at its departure time.
+        run() then reproduces the trips' mileage and arrival times.
+
+        Parameters:
+        trucks (list of DeliveryTruck): The trucks that drove the trips.
+        trips (list of TripRecord): The trips (e.g. SimulationResult.trips), in the order they started.
+        distances (DistanceMatrix or ShortestPaths): The distances the trips were driven on.
+        location_name (callable): Maps an address id to its text.
+        """
+        fleet = cls.from_trucks(trucks, distances, location_name)
+        routes, leave_times = [[] for _ in trucks], [[] for _ in trucks]
+        started = set()
+        for trip in trips:
+            index = trip.truck_index
+            if index not in started:
+                started.add(index)
+                fleet.address_ids[index] = trip.visited[0]
+                fleet.clock[index] = fleet.departure_time[index] = trip.departure_time
+            if len(trip.visited) > 1:
+                routes[index].extend(trip.visited[1:])
+                leave_times[index].extend([trip.departure_time] + [0] * (len(trip.visited) - 2))
+        fleet.mileage[:] = 0.0
+        fleet.set_routes(routes, leave_times)
+        return fleet
+
+    def truck(self, index):
+        """
+        Returns a view of one truck that reads and writes the fleet's arrays.
+        """
+        if not -len(self) <= index < len(self):
+            raise IndexError(f"Truck index {index} out of range for a fleet of {len(self)}")
+        return TruckView(self, index % len(self))
+
+    def trucks(self):
+        """
+        Returns a view of every truck, in fleet order.
+        """
+        return [TruckView(self, index) for index in range(len(self))]
+
+    def set_routes(self, routes, leave_times=None):
+        """
+        Gives every truck the stops it drives to next and moves its route cursor to the first of them.
+
+        Parameters:
+        routes (list of list of int): Address ids per truck, in driving order (not including where it is).
+        leave_times (list of list of int): For each stop, the earliest time the truck may leave for it, in
+            seconds since midnight (default: every leg starts as soon as the previous one ends). Used to make
+            a truck wait at the hub between trips.
+        """
+        if len(routes) != len(self):
+            raise ValueError(f"Expected {len(self)} routes, got {len(routes)}")
+        lengths = np.fromiter((len(route) for route in routes), dtype=np.int64, count=len(routes))
+        self.route_starts = np.concatenate(([0], np.cumsum(lengths)))
+        self.route_stops = np.fromiter((stop for route in routes for stop in route), dtype=np.int32,
+                                       count=int(self.route_starts[-1]))
+        self.route_leave_times = None
+        if leave_times is not None:
+            if [len(times) for times in leave_times] != lengths.tolist():
+                raise ValueError("leave_times must have one time per stop")
+            self.route_leave_times = np.fromiter((time for times in leave_times for time in times), dtype=np.int64,
+                                                 count=len(self.route_stops))
+        self.cursor[:] = 0
+
+    def remaining_stops(self):
+        """
+        Returns the number of stops each truck has left on its route.
+        """
+        return np.diff(self.route_starts) - self.cursor
+
+    def step(self):
+        """
+        Moves every truck with stops left to its next stop, adding the leg's miles and driving time.
+
+        Returns:
+        numpy.ndarray: Indices of the trucks that moved (empty once every route is finished).
+
+        Raises:
+        ValueError: If a truck has no known distance to its next stop.
+        """
+        moving = (self.remaining_stops() > 0).nonzero()[0]
+        if not len(moving):
+            return moving
+        positions = self.route_starts[moving] + self.cursor[moving]
+        stops = self.route_stops[positions]
+        first_id = self.distances.first_id
+        legs = self.distances.matrix[self.address_ids[moving] - first_id, stops - first_id]
+        unknown = ~np.isfinite(legs)
+        if unknown.any():
+            stuck = unknown.nonzero()[0][0]
+            raise ValueError(f"Truck {moving[stuck] + 1} has no known distance to address {stops[stuck]}")
+        if self.route_leave_times is not None:
+            self.clock[moving] = np.maximum(self.clock[moving], self.route_leave_times[positions])
+        self.mileage[moving] += legs
+        # Same rounding as TimeModel.travel_seconds (both round halves to even)
+        self.clock[moving] += np.rint(legs * SECONDS_PER_HOUR / self.travel_speed[moving]).astype(np.int64)
+        self.address_ids[moving] = stops
+        self.cursor[moving] += 1
+        return moving
+
+    def run(self):
+        """
+        Steps until every truck has finished its route.
+
+        Returns:
+        int: The number of legs driven.
+        """
+        legs = 0
+        while True:
+            moved = len(self.step())
+            if not moved:
+                return legs
+            legs += moved
+
+    @property
+    def total_mileage(self):
+        """
+        Combined mileage of every truck.
+        """
+        return float(self.mileage.sum())
+
+    @property
+    def total_load(self):
+        """
+        Combined weight carried by every truck.
+        """
+        return float(self.load.sum())
+
+    @property
+    def finish_time(self):
+        """
+        Seconds since midnight at which the last truck's clock stands (0 for an empty fleet).
+        """
+        return int(self.clock.max()) if len(self) else 0
+
+    @property
+    def active(self):
+        """
+        Number of trucks with stops left on their route.
+        """
+        return int(np.count_nonzero(self.remaining_stops() > 0))
+
+
+class TruckView:
+    """
+    One truck of a FleetState, with the attributes and methods of Truck.DeliveryTruck. Reading or assigning an
+    attribute reads or writes the fleet's arrays, so a view never goes stale.
+    """
+    def __init__(self, fleet, index):
+        self.fleet = fleet
+        self.index = index
+
+    def copy_from(self, truck):
+        """
+        Copies every attribute of a DeliveryTruck (or another view) into this truck.
+        """
+        self.max_capacity = truck.max_capacity
+        self.travel_speed = truck.travel_speed
+        self.current_load = truck.current_load
+        self.package_ids = list(truck.package_ids)
+        self.total_mileage = truck.total_mileage
+        self.current_location = truck.current_location
+        self.current_address_id = truck.current_address_id
+        self.departure_time = truck.departure_time
+        self.current_time = truck.current_time
+
+    @property
+    def max_capacity(self):
+        return int(self.fleet.max_capacity[self.index])
+
+    @max_capacity.setter
+    def max_capacity(self, value):
+        self.fleet.max_capacity[self.index] = value
+
+    @property
+    def travel_speed(self):
+        return float(self.fleet.travel_speed[self.index])
+
+    @travel_speed.setter
+    def travel_speed(self, value):
+        self.fleet.travel_speed[self.index] = value
+
+    @property
+    def current_load(self):
+        return float(self.fleet.load[self.index])
+
+    @current_load.setter
+    def current_load(self, value):
+        self.fleet.load[self.index] = value
+
+    @property
+    def package_ids(self):
+        return self.fleet.package_ids[self.index]
+
+    @package_ids.setter
+    def package_ids(self, value):
+        self.fleet.package_ids[self.index] = value
+
+    @property
+    def total_mileage(self):
+        return float(self.fleet.mileage[self.index])
+
+    @total_mileage.setter
+    def total_mileage(self, value):
+        self.fleet.mileage[self.index] = value
+
+    @property
+    def current_address_id(self):
+        address_id = int(self.fleet.address_ids[self.index])
+        return None if address_id == NO_ADDRESS else address_id
+
+    @current_address_id.setter
+    def current_address_id(self, value):
+        self.fleet.address_ids[self.index] = NO_ADDRESS if value is None else value
+
+    @property
+    def current_location(self):
+        """
+        The truck's present address: looked up from its address id when the fleet has a location_name,
+        otherwise the text last assigned.
+        """
+        address_id = self.current_address_id
+        if self.fleet.location_name is not None and address_id is not None:
+            return self.fleet.location_name(address_id)
+        return self.fleet.locations[self.index]
+
+    @current_location.setter
+    def current_location(self, value):
+        self.fleet.locations[self.index] = value
+
+    @property
+    def departure_time(self):
+        return int(self.fleet.departure_time[self.index])
+
+    @departure_time.setter
+    def departure_time(self, value):
+        self.fleet.departure_time[self.index] = value
+
+    @property
+    def current_time(self):
+        return int(self.fleet.clock[self.index])
+
+    @current_time.setter
+    def current_time(self, value):
+        self.fleet.clock[self.index] = value
+
+    @property
+    def route_position(self):
+        """
+        Index into the truck's route of the stop it drives to next.
+        """
+        return int(self.fleet.cursor[self.index])
+
+    def __str__(self):
+        """
+        Returns the same summary as DeliveryTruck.__str__.
+        """
+        return "%d, %.2f, %.2f, %s, %.2f, %s, %s" % (
+            self.max_capacity, self.travel_speed, self.current_load,
+            self.package_ids, self.total_mileage, self.current_location,
+            format_duration(self.current_time)
+        )
+
+    def update_travel(self, distance):
+        """
+        Updates the truck's mileage and current time based on the distance traveled.
+
+        Parameters:
+        distance (float): Distance traveled (in miles).
+        """
+        self.fleet.mileage[self.index] += distance
+        self.fleet.clock[self.index] += travel_seconds(distance, self.travel_speed)
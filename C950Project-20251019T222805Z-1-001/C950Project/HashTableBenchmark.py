@@ -0,0 +1,74 @@
+# This script times insert and lookup for the hash map implementations against Python's dict.
+# Usage: python HashTableBenchmark.py [number_of_keys ...]
+import random
+import sys
+import time
+
+from HashTableCreation import HashMapCreation, OpenAddressingHashMap
+
+
+class _DictMap:
+    """
+    Wraps a dict in the HashMapCreation API so it can be timed the same way.
+    """
+    def __init__(self):
+        self.data = {}
+
+    def insert(self, key, item):
+        self.data[key] = item
+
+    def lookup(self, key):
+        return self.data.get(key)
+
+
+# Name and factory of each implementation being compared
+IMPLEMENTATIONS = [
+    ("fixed 30 buckets", lambda: HashMapCreation(max_load=None)),
+    ("resizing chaining", lambda: HashMapCreation()),
+    ("open addressing", lambda: OpenAddressingHashMap()),
+    ("dict", lambda: _DictMap()),
+]
+
+
+def time_implementation(factory, keys):
+    """
+    Times inserting every key and then looking every key up.
+
+    Parameters:
+    factory (callable): Creates an empty map.
+    keys (list of int): The keys to insert and look up.
+
+    Returns:
+    tuple: (insert seconds, lookup seconds)
+    """
+    table = factory()
+    start = time.perf_counter()
+    for key in keys:
+        table.insert(key, key)
+    inserted = time.perf_counter()
+    for key in keys:
+        table.lookup(key)
+    return inserted - start, time.perf_counter() - inserted
+
+
+def run_benchmark(sizes):
+    """
+    Prints insert and lookup times for each implementation and key count.
+
+    Parameters:
+    sizes (list of int): The key counts to benchmark.
+    """
+    print(f"{'keys':>10}  {'implementation':<18} {'insert (s)':>11} {'lookup (s)':>11}")
+    for size in sizes:
+        keys = list(range(1, size + 1))
+        random.Random(size).shuffle(keys)
+        for name, factory in IMPLEMENTATIONS:
+            if name == "fixed 30 buckets" and size > 20000:
+                print(f"{size:>10}  {name:<18} {'skipped':>11} {'skipped':>11}")  # Quadratic, too slow to time
+                continue
+            insert_time, lookup_time = time_implementation(factory, keys)
+            print(f"{size:>10}  {name:<18} {insert_time:>11.4f} {lookup_time:>11.4f}")
+
+
+if __name__ == "__main__":
+    run_benchmark([int(arg) for arg in sys.argv[1:]] or [40, 1000, 10000, 100000])
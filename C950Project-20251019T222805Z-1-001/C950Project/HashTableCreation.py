@@ -1,17 +1,143 @@
 # This class implements a basic hash map (hash table) data structure
 # The hash map allows efficient storage and retrieval of key-value pairs
 # Note: Code adapted from WGU Code Repository
+# Both maps can keep secondary indexes (see SecondaryIndex) so packages can be found by address, zip, status,
+# deadline or delivery time without scanning every key.
+from Instrumentation import metrics
+from SecondaryIndex import HashIndex, SortedIndex, PACKAGE_INDEXES
 
+# Marks a slot in OpenAddressingHashMap whose entry was removed
+_DELETED = object()
 
-class HashMapCreation:
-    def __init__(self, initial_cap=30):
+
+def _count_chain_probes(list_in_bucket, key):
+    """
+    Records a lookup and the number of bucket entries it compares (the whole bucket if the key is missing).
+    """
+    probes = len(list_in_bucket)
+    for position, pair in enumerate(list_in_bucket):
+        if pair[0] == key:
+            probes = position + 1
+            break
+    metrics.count("hash.lookups")
+    metrics.count("hash.probes", probes)
+
+
+class _SecondaryIndexes:
+    """
+    Secondary indexes shared by both hash maps. An index is built from the stored items the first time it is
+    queried; from then on insert, update, remove_item and set_status keep it up to date. An item changed in
+    place (parcel.status = ...) must be passed to update() afterwards so its index entries move.
+    """
+    def add_index(self, name, attribute, ordered=False):
+        """
+        Adds a secondary index on an attribute of the stored items.
+
+        Parameters:
+        name (str): Name used by find() and find_range().
+        attribute (str): The attribute indexed, e.g. 'zipcode'.
+        ordered (bool): True for a sorted index that answers range queries, False for a hash index.
+        """
+        self.remove_index(name)
+        self.indexes[name] = SortedIndex(attribute) if ordered else HashIndex(attribute)
+
+    def add_package_indexes(self):
+        """
+        Adds the package indexes: hash indexes on address id, zip and status, sorted indexes on deadline and
+        delivery time.
+        """
+        for name, attribute, ordered in PACKAGE_INDEXES:
+            self.add_index(name, attribute, ordered)
+
+    def remove_index(self, name):
+        """
+        Drops a secondary index (nothing happens if there is none with that name).
+        """
+        index = self.indexes.pop(name, None)
+        if index in self._maintained:
+            self._maintained.remove(index)
+
+    def _index(self, name):
+        """
+        Returns an index, building it on first use.
+        """
+        index = self.indexes.get(name)
+        if index is None:
+            raise ValueError(f"No index named '{name}'")
+        if index not in self._maintained:
+            index.build(self.items())
+            self._maintained.append(index)
+        return index
+
+    def find(self, name, value):
+        """
+        Returns the keys of the items whose indexed attribute equals value, sorted.
+
+        Parameters:
+        name (str): The index to use, e.g. 'zip'.
+        value: The value to look for, e.g. '84115'.
+        """
+        index = self._index(name)
+        if isinstance(index, SortedIndex):
+            return sorted(index.find_range(value, value))
+        return index.find(value)
+
+    def find_range(self, name, low=None, high=None):
+        """
+        Returns the keys of the items with low <= indexed attribute <= high, ordered by that attribute.
+        Items whose attribute is None are never returned.
+
+        Parameters:
+        name (str): A sorted index, e.g. 'deadline'.
+        low: Smallest value included (None for no lower bound).
+        high: Largest value included (None for no upper bound).
+
+        Raises:
+        ValueError: If the index is not a sorted index.
+        """
+        index = self._index(name)
+        if not isinstance(index, SortedIndex):
+            raise ValueError(f"Index '{name}' does not support range queries")
+        return index.find_range(low, high)
+
+    def set_status(self, key, status):
+        """
+        Sets the status of a stored package and moves it in the indexes.
+
+        Returns:
+        bool: False if the key is not in the map.
+        """
+        item = self.lookup(key)
+        if item is None:
+            return False
+        item.status = status
+        self._index_item(key, item)
+        return True
+
+    def _index_item(self, key, item):
+        for index in self._maintained:
+            index.add(key, item)
+
+    def _unindex_key(self, key):
+        for index in self._maintained:
+            index.remove(key)
+
+
+class HashMapCreation(_SecondaryIndexes):
+    def __init__(self, initial_cap=30, max_load=0.75):
         """
         Initializes the hash map with a given initial capacity.
         The hash map is implemented as a list of lists (buckets).
+        The bucket list doubles whenever the number of items per bucket exceeds max_load
+        (pass max_load=None to keep a fixed number of buckets).
         """
         self.list = []  # List to hold the buckets
-        for i in range(initial_cap):
+        for i in range(max(1, initial_cap)):
             self.list.append([])  # Initialize each bucket as an empty list
+        self.max_load = max_load  # Items per bucket that triggers a resize
+        self.count = 0  # Number of key-value pairs stored
+        self.indexes = {}  # Index name -> HashIndex or SortedIndex
+        self._maintained = []  # The indexes built so far, updated on every change
 
     def insert(self, key, item):
         """
@@ -25,12 +151,49 @@ class HashMapCreation:
         for i, kv in enumerate(list_in_bucket):
             if kv[0] == key:  # Key found in the bucket
                 list_in_bucket[i] = (key, item)  # Update the value associated with the key
+                if self._maintained:
+                    self._index_item(key, item)
                 return True  # Return True indicating successful update
 
         # Key does not exist, so add a new key-value pair to the bucket
+        if metrics.enabled and list_in_bucket:
+            metrics.count("hash.collisions")  # The bucket already holds other keys
         list_in_bucket.append((key, item))  # Append the pair to the bucket
+        self.count += 1
+        if self._maintained:
+            self._index_item(key, item)
+        if self.max_load is not None and self.count > self.max_load * len(self.list):
+            self.resize(len(self.list) * 2)  # Keep the chains short
         return True  # Return True indicating successful insertion
 
+    def bulk_insert(self, pairs):
+        """
+        Inserts many key-value pairs, sizing the table once up front instead of resizing repeatedly.
+
+        Parameters:
+        pairs (iterable of tuple): The (key, item) pairs to insert.
+        """
+        pairs = list(pairs)
+        if self.max_load is not None:
+            needed = int((self.count + len(pairs)) / self.max_load) + 1
+            if needed > len(self.list):
+                # At least double, so loading in chunks does not rehash the whole table for every chunk
+                self.resize(max(needed, len(self.list) * 2))
+        for key, item in pairs:
+            self.insert(key, item)
+
+    def resize(self, new_cap):
+        """
+        Rehashes every key-value pair into a new list of new_cap buckets.
+        """
+        if metrics.enabled:
+            metrics.count("hash.resizes")
+        old_buckets = self.list
+        self.list = [[] for _ in range(max(1, new_cap))]
+        for list_in_bucket in old_buckets:
+            for kv in list_in_bucket:
+                self.list[hash(kv[0]) % len(self.list)].append(kv)
+
     def lookup(self, key):
         """
         Retrieves the item associated with a given key.
@@ -38,26 +201,22 @@ class HashMapCreation:
         """
         bucket_index = hash(key) % len(self.list)  # Determine the appropriate bucket index
         list_in_bucket = self.list[bucket_index]    # Get the list (bucket) for the calculated index
+        if metrics.enabled:
+            _count_chain_probes(list_in_bucket, key)
 
         # Search for the key in the bucket
         for pair in list_in_bucket:
             if key == pair[0]:  # Key found
                 return pair[1]  # Return the value associated with the key
-        
+
         return None  # Return None if the key is not found
-    
+
     def update(self, package):
         """
         Updates an existing package in the hash table.
+        The package is added if it is not in the table yet.
         """
-        bucket_index = hash(package.parcel_id) % len(self.list)
-        list_in_bucket = self.list[bucket_index]
-        for i, kv in enumerate(list_in_bucket):
-            if kv[0] == package.parcel_id:
-                list_in_bucket[i] = [package.parcel_id, package]
-                return
-        # If package not found, you might want to consider adding it (optional)
-        list_in_bucket.append([package.parcel_id, package])
+        self.insert(package.parcel_id, package)
 
     def remove_item(self, key):
         """
@@ -68,7 +227,295 @@ class HashMapCreation:
         final_dest = self.list[slot]        # Get the list (bucket) for the calculated index
 
         # Search and remove the key-value pair from the bucket if found
-        for kv in final_dest:
+        for i, kv in enumerate(final_dest):
             if kv[0] == key:  # Key found in the bucket
-                final_dest.remove(kv)  # Remove the key-value pair from the bucket
+                del final_dest[i]  # Remove the key-value pair from the bucket
+                self.count -= 1
+                if self._maintained:
+                    self._unindex_key(key)
                 return  # Exit after removal
+
+    def __len__(self):
+        """
+        Returns the number of key-value pairs in the hash map.
+        """
+        return self.count
+
+    def __contains__(self, key):
+        """
+        Returns True if the key is in the hash map.
+        """
+        list_in_bucket = self.list[hash(key) % len(self.list)]
+        return any(kv[0] == key for kv in list_in_bucket)
+
+    def __iter__(self):
+        """
+        Iterates over the keys in the hash map.
+        """
+        for list_in_bucket in self.list:
+            for kv in list_in_bucket:
+                yield kv[0]
+
+    def items(self):
+        """
+        Iterates over the (key, item) pairs in the hash map.
+        """
+        for list_in_bucket in self.list:
+            for kv in list_in_bucket:
+                yield kv[0], kv[1]
+
+
+class OpenAddressingHashMap(_SecondaryIndexes):
+    def __init__(self, initial_cap=32, max_load=0.6):
+        """
+        Initializes an open-addressing hash map with a given initial capacity.
+        Keys and items live in two parallel lists and collisions are resolved by linear probing,
+        so a lookup touches consecutive slots instead of a separate bucket list.
+        The table doubles whenever the share of used slots exceeds max_load.
+        """
+        self.keys = [None] * max(2, initial_cap)  # Key stored in each slot (None if empty)
+        self.values = [None] * len(self.keys)  # Item stored in each slot
+        self.max_load = max_load  # Share of used slots that triggers a resize
+        self.count = 0  # Number of key-value pairs stored
+        self.used = 0  # Number of slots holding a key or a deleted marker
+        self.indexes = {}  # Index name -> HashIndex or SortedIndex
+        self._maintained = []  # The indexes built so far, updated on every change
+
+    def _find_slot(self, key):
+        """
+        Returns the slot holding the key, or the slot where it should be inserted.
+        """
+        capacity = len(self.keys)
+        start = slot = hash(key) % capacity
+        first_deleted = None
+        while True:
+            slot_key = self.keys[slot]
+            if slot_key is None:
+                found = slot if first_deleted is None else first_deleted
+                break
+            if slot_key is _DELETED:
+                if first_deleted is None:
+                    first_deleted = slot
+            elif slot_key == key:
+                found = slot
+                break
+            slot = (slot + 1) % capacity
+        if metrics.enabled:
+            probes = (slot - start) % capacity + 1
+            metrics.count("hash.lookups")
+            metrics.count("hash.probes", probes)
+            if probes > 1:
+                metrics.count("hash.collisions")
+        return found
+
+    def insert(self, key, item):
+        """
+        Inserts a key-value pair into the hash map.
+        If the key already exists, updates the existing entry with the new item.
+        """
+        slot = self._find_slot(key)
+        slot_key = self.keys[slot]
+        if slot_key is None or slot_key is _DELETED:
+            if slot_key is None:
+                self.used += 1
+            self.keys[slot] = key
+            self.count += 1
+        self.values[slot] = item
+        if self._maintained:
+            self._index_item(key, item)
+        if self.used > self.max_load * len(self.keys):
+            self.resize(len(self.keys) * 2)
+        return True
+
+    def bulk_insert(self, pairs):
+        """
+        Inserts many key-value pairs, sizing the table once up front instead of resizing repeatedly.
+
+        Parameters:
+        pairs (iterable of tuple): The (key, item) pairs to insert.
+        """
+        pairs = list(pairs)
+        needed = int((self.count + len(pairs)) / self.max_load) + 1
+        if needed > len(self.keys):
+            self.resize(max(needed, len(self.keys) * 2))
+        for key, item in pairs:
+            self.insert(key, item)
+
+    def resize(self, new_cap):
+        """
+        Rehashes every key-value pair into new_cap slots, dropping deleted markers.
+        """
+        if metrics.enabled:
+            metrics.count("hash.resizes")
+        old_pairs = list(self.items())
+        self.keys = [None] * max(2, new_cap)
+        self.values = [None] * len(self.keys)
+        self.count = 0
+        self.used = 0
+        for key, item in old_pairs:
+            slot = self._find_slot(key)
+            self.keys[slot] = key
+            self.values[slot] = item
+            self.count += 1
+            self.used += 1
+
+    def lookup(self, key):
+        """
+        Retrieves the item associated with a given key.
+        Returns None if the key is not found.
+        """
+        slot = self._find_slot(key)
+        if self.keys[slot] is None or self.keys[slot] is _DELETED:
+            return None
+        return self.values[slot]
+
+    def update(self, package):
+        """
+        Updates an existing package in the hash table.
+        The package is added if it is not in the table yet.
+        """
+        self.insert(package.parcel_id, package)
+
+    def remove_item(self, key):
+        """
+        Removes the key-value pair associated with the given key from the hash map.
+        If the key is not found, no action is taken.
+        """
+        slot = self._find_slot(key)
+        if self.keys[slot] is None or self.keys[slot] is _DELETED:
+            return
+        self.keys[slot] = _DELETED  # Keep the probe chain intact for later keys
+        self.values[slot] = None
+        self.count -= 1
+        if self._maintained:
+            self._unindex_key(key)
+
+    def __len__(self):
+        """
+        Returns the number of key-value pairs in the hash map.
+        """
+        return self.count
+
+    def __contains__(self, key):
+        """
+        Returns True if the key is in the hash map.
+        """
+        slot_key = self.keys[self._find_slot(key)]
+        return slot_key is not None and slot_key is not _DELETED
+
+    def __iter__(self):
+        """
+        Iterates over the keys in the hash map.
+        """
+        for key in self.keys:
+            if key is not None and key is not _DELETED:
+                yield key
+
+    def items(self):
+        """
+        Iterates over the (key, item) pairs in the hash map.
+        """
+        for key, item in zip(self.keys, self.values):
+            if key is not None and key is not _DELETED:
+                yield key, item
+
+
+class PackageStoreMap(_SecondaryIndexes):
+    def __init__(self, store):
+        """
+        Maps package IDs to views of a PackageStore's rows without holding an entry per package: the store's
+        own id lookup (a binary search on its id column, or its id -> row dict) finds the row, and a ParcelView
+        is created only when a package is looked up. It offers the same methods as the hash maps, so a Dataset
+        restored from a compiled cache uses it instead of copying every row into a HashMapCreation.
+
+        Parameters:
+        store (PackageStore): The packages; inserting a package that is not in it appends a row.
+        """
+        self.store = store
+        self.removed = set()  # Package IDs removed from the map; their rows stay in the store
+        self.indexes = {}  # Index name -> HashIndex or SortedIndex
+        self._maintained = []  # The indexes built so far, updated on every change
+
+    def _row(self, key):
+        if key in self.removed:
+            return None
+        if metrics.enabled:
+            metrics.count("hash.lookups")
+        return self.store.row_of(key)
+
+    def insert(self, key, item):
+        """
+        Stores an item under a key. A view of the key's own row only refreshes the indexes (the row already
+        holds its fields); any other item is copied into the key's row, which is appended if there is none.
+        """
+        self.removed.discard(key)
+        row = self.store.row_of(key)
+        if row is None:
+            row = self.store.add_parcel(item)
+        elif getattr(item, "store", None) is not self.store or item.row != row:
+            view = self.store.view(row)
+            for attribute in ("delivery_address", "city", "state", "zipcode", "deadline", "status", "address_id",
+                              "departure_time", "delivery_time"):
+                setattr(view, attribute, getattr(item, attribute))
+        if self._maintained:
+            self._index_item(key, self.store.view(row))
+        return True
+
+    def bulk_insert(self, pairs):
+        """
+        Inserts many key-value pairs.
+        """
+        for key, item in pairs:
+            self.insert(key, item)
+
+    def lookup(self, key):
+        """
+        Returns a view of the package with the given ID, or None if it is not in the map.
+        """
+        row = self._row(key)
+        return None if row is None else self.store.view(row)
+
+    def update(self, package):
+        """
+        Updates an existing package in the map.
+        The package is added if it is not in the map yet.
+        """
+        self.insert(package.parcel_id, package)
+
+    def remove_item(self, key):
+        """
+        Removes a package from the map (its row stays in the store). If the key is not found, no action is taken.
+        """
+        if self._row(key) is None:
+            return
+        self.removed.add(key)
+        if self._maintained:
+            self._unindex_key(key)
+
+    def __len__(self):
+        """
+        Returns the number of packages in the map.
+        """
+        return len(self.store) - len(self.removed)
+
+    def __contains__(self, key):
+        """
+        Returns True if the key is in the map.
+        """
+        return self._row(key) is not None
+
+    def __iter__(self):
+        """
+        Iterates over the package IDs, in store order.
+        """
+        for key in self.store.column("parcel_id").tolist():
+            if key not in self.removed:
+                yield key
+
+    def items(self):
+        """
+        Iterates over the (package ID, ParcelView) pairs, in store order.
+        """
+        for row, key in enumerate(self.store.column("parcel_id").tolist()):
+            if key not in self.removed:
+                yield key, self.store.view(row)
@@ -0,0 +1,243 @@
+# This module collects timings and counters from the planner: time spent in each stage (ingest, shortest
+# paths, assignment, simulation, routing, query, insertion) and counts of distance lookups, unknown (inf)
+# distances, hash table probes and collisions, and route improvement moves.
+# Optionally, it also records a cProfile profile and tracemalloc memory statistics.
+#
+# Everything goes through the shared `metrics` object. It is off by default. Hot paths only test
+# `metrics.enabled` before counting, and stage() hands back a shared no-op context manager, so when
+# instrumentation is off it costs one attribute check per call.
+#
+# Turn it on with Main.py's --instrument flag or with the C950_INSTRUMENT environment variable: a
+# comma-separated list holding 'json' or 'log' (the report format), plus 'cprofile' and/or 'tracemalloc'.
+# For example, C950_INSTRUMENT=json,cprofile. The report goes to C950_INSTRUMENT_OUTPUT when set,
+# otherwise to stderr.
+#
+# Counters:
+#   distance.lookups       distances read (one per cell of a block copied by RouteOptimizer)
+#   distance.inf           of those, pairs with no known distance
+#   hash.lookups           hash table lookups (open addressing counts every slot search)
+#   hash.probes            entries compared during those lookups; probes / lookups is the mean chain length
+#   hash.collisions        chaining: inserts into a non-empty bucket; open addressing: searches needing >1 probe
+#   hash.resizes           table rehashes
+#   route.optimizations    routes improved by RouteOptimizer
+#   route.moves_accepted   2-opt and Or-opt moves applied
+#   route.passes           passes made over routes
+import atexit
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+# Environment variables read by configure_from_environment
+ENVIRONMENT_VARIABLE = "C950_INSTRUMENT"
+OUTPUT_VARIABLE = "C950_INSTRUMENT_OUTPUT"
+
+# Report formats: one JSON document, or one 'key=value' line per timer, counter and profile entry
+FORMATS = ("json", "log")
+
+# Functions and allocation sites listed in the report
+PROFILE_ENTRIES = 25
+MEMORY_ENTRIES = 10
+
+# Returned by stage() while instrumentation is off
+_NO_STAGE = contextlib.nullcontext()
+
+
+class _StageTimer:
+    """
+    Adds the time spent inside a with-block to one stage.
+    """
+    __slots__ = ("timers", "name", "start")
+
+    def __init__(self, timers, name):
+        self.timers = timers
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        timer = self.timers.get(self.name)
+        if timer is None:
+            timer = self.timers[self.name] = [0.0, 0]
+        timer[0] += time.perf_counter() - self.start
+        timer[1] += 1
+        return False
+
+
+class Instrumentation:
+    def __init__(self):
+        """
+        Creates a disabled collector; see configure().
+        """
+        self.enabled = False
+        self.output_format = "json"
+        self.output_path = None
+        self.timers = {}  # Stage name -> [seconds, calls]
+        self.counters = {}  # Counter name -> count
+        self.profiler = None  # cProfile.Profile while profiling
+        self.trace_memory = False
+        self.reported = False  # True once the report has been written
+
+    def configure(self, enabled=True, output_format="json", output_path=None, profile=False, trace_memory=False):
+        """
+        Turns instrumentation on or off and clears everything collected so far.
+
+        Parameters:
+        enabled (bool): Collect timers and counters.
+        output_format (str): 'json' or 'log', used by write_report().
+        output_path (str): File the report is written to (None for stderr).
+        profile (bool): Run cProfile until the report is written.
+        trace_memory (bool): Run tracemalloc until the report is written.
+        """
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown instrumentation format '{output_format}'")
+        self.stop()
+        self.profiler = None
+        self.enabled = enabled
+        self.output_format = output_format
+        self.output_path = output_path
+        self.timers = {}
+        self.counters = {}
+        self.reported = False
+        if enabled and profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.trace_memory = enabled and trace_memory
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def configure_from_environment(self, environ=None):
+        """
+        Configures instrumentation from C950_INSTRUMENT and C950_INSTRUMENT_OUTPUT, and writes the report
+        when the program exits. Does nothing if C950_INSTRUMENT is unset or empty; unknown options are
+        reported on stderr and ignored.
+        """
+        environ = os.environ if environ is None else environ
+        options = [option.strip().lower() for option in environ.get(ENVIRONMENT_VARIABLE, "").split(",")]
+        options = [option for option in options if option and option not in ("0", "off")]
+        if not options:
+            return
+        unknown = set(options) - set(FORMATS) - {"1", "on", "cprofile", "tracemalloc"}
+        if unknown:
+            print(f"{ENVIRONMENT_VARIABLE}: ignoring unknown options {', '.join(sorted(unknown))}", file=sys.stderr)
+        output_format = "log" if "log" in options else "json"
+        self.configure(True, output_format, environ.get(OUTPUT_VARIABLE) or None,
+                       profile="cprofile" in options, trace_memory="tracemalloc" in options)
+        atexit.register(self._report_at_exit)
+
+    def _report_at_exit(self):
+        if self.enabled and not self.reported:
+            self.write_report()
+
+    def stage(self, name):
+        """
+        Returns a context manager that adds the time spent inside it to a stage.
+        Stages may nest; each keeps its own total.
+        """
+        if not self.enabled:
+            return _NO_STAGE
+        return _StageTimer(self.timers, name)
+
+    def count(self, name, amount=1):
+        """
+        Adds to a counter. Callers on hot paths test `enabled` first.
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def stop(self):
+        """
+        Stops the profiler and memory tracing, if running.
+        """
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def report(self):
+        """
+        Returns everything collected as a dictionary: timers, counters and, if enabled, profile and memory.
+        Profiling and memory tracing stop here so the report does not measure itself.
+        """
+        result = {
+            "timers": {name: {"seconds": round(seconds, 6), "calls": calls}
+                       for name, (seconds, calls) in sorted(self.timers.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+        if self.profiler is not None:
+            self.profiler.disable()
+            result["profile"] = _profile_entries(self.profiler)
+        if self.trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["memory"] = {
+                "current_mb": round(current / (1 << 20), 3),
+                "peak_mb": round(peak / (1 << 20), 3),
+                "top": [{"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                         "mb": round(stat.size / (1 << 20), 3), "blocks": stat.count}
+                        for stat in snapshot.statistics("lineno")[:MEMORY_ENTRIES]],
+            }
+        return result
+
+    def write_report(self, output=None):
+        """
+        Writes the report in the configured format to output, the configured file or stderr.
+        """
+        self.reported = True
+        text = format_report(self.report(), self.output_format)
+        if output is not None:
+            output.write(text)
+        elif self.output_path:
+            with open(self.output_path, "w", encoding="utf-8") as report_file:
+                report_file.write(text)
+        else:
+            sys.stderr.write(text)
+
+
+def _profile_entries(profiler):
+    """
+    Returns the functions with the most cumulative time as dictionaries.
+    """
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    entries = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+        entries.append({"function": f"{os.path.basename(filename)}:{line}({function})", "calls": calls,
+                        "total_seconds": round(total, 6), "cumulative_seconds": round(cumulative, 6)})
+    entries.sort(key=lambda entry: entry["cumulative_seconds"], reverse=True)
+    return entries[:PROFILE_ENTRIES]
+
+
+def format_report(report, output_format="json"):
+    """
+    Formats a report as a JSON document or as structured log lines such as
+    'kind=timer name=routing seconds=0.412 calls=3'.
+    """
+    if output_format == "json":
+        return json.dumps(report, indent=2) + "\n"
+    lines = []
+    for name, timer in report["timers"].items():
+        lines.append(f"kind=timer name={name} seconds={timer['seconds']} calls={timer['calls']}")
+    for name, value in report["counters"].items():
+        lines.append(f"kind=counter name={name} value={value}")
+    for entry in report.get("profile", ()):
+        lines.append("kind=profile function={} calls={} total_seconds={} cumulative_seconds={}".format(
+            json.dumps(entry["function"]), entry["calls"], entry["total_seconds"], entry["cumulative_seconds"]))
+    memory = report.get("memory")
+    if memory is not None:
+        lines.append(f"kind=memory current_mb={memory['current_mb']} peak_mb={memory['peak_mb']}")
+        for entry in memory["top"]:
+            lines.append("kind=allocation location={} mb={} blocks={}".format(
+                json.dumps(entry["location"]), entry["mb"], entry["blocks"]))
+    return "".join(line + "\n" for line in lines)
+
+
+# The collector shared by every module
+metrics = Instrumentation()
+metrics.configure_from_environment()
@@ -1,250 +1,150 @@
+import argparse
 import csv
-import datetime
-from datetime import timedelta
-import Truck  # Import the Truck module
-from Truck import DeliveryTruck  # Import the DeliveryTruck class from the Truck module
-from HashTableCreation import HashMapCreation  # Import the HashMapCreation class for hash table operations
-from Package import Parcel  # Import the Parcel class for package data
-import re  # Import the regex module for parsing weights
-
-# Initialize the distance matrix
-distance_matrix = {}
-
-def load_distance_data(filepath):
-    """
-    Loads distance data from a CSV file into the distance matrix.
-
-    Args:
-        filepath (str): The path to the CSV file containing distance data.
-    """
-    global distance_matrix
-    with open(filepath, newline='', encoding='utf-8-sig') as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            if len(row) != 3:
-                print(f"Skipping invalid row: {row}")
-                continue
-            try:
-                location1, location2, distance = row
-                if location1 not in distance_matrix:
-                    distance_matrix[location1] = {}
-                distance_matrix[location1][location2] = float(distance)
-            except ValueError as e:
-                print(f"Error processing row {row}: {e}")
-
-def read_csv_data(filepath):
-    """
-    Reads data from a CSV file and returns it as a list of rows.
+import json
+import sys
 
-    Args:
-        filepath (str): The path to the CSV file to be read.
+from DeliveryPlanner import load_dataset, plan, DEFAULT_EVENTS  # Import the importable planning API
+from DeliveryEvents import read_events  # Import the address change / delay / cancellation feed
+from Instrumentation import metrics  # Import the stage timers and counters
+from TimeModel import parse_clock, format_clock  # Import the integer-second time model
 
-    Returns:
-        list: A list of rows from the CSV file.
-    """
-    with open(filepath, newline='', encoding='utf-8-sig') as csv_file:
-        return list(csv.reader(csv_file))
+# Fields written for every package in batch mode
+OUTPUT_FIELDS = ["query", "time", "id", "address", "city", "state", "zip", "deadline", "weight", "status",
+                 "delivery_time"]
 
-def load_address_data(filepath):
-    """
-    Loads address data from a CSV file and returns it as a list.
-
-    Args:
-        filepath (str): The path to the CSV file containing address data.
-
-    Returns:
-        list: A list of address data where each entry is a row from the CSV.
-    """
-    address_list = []
-    with open(filepath, newline='', encoding='utf-8-sig') as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            address_list.append(row)
-    return address_list
-
-def parse_weight(weight_str):
+def get_user_time():
     """
-    Parses a weight string and converts it to a float.
-
-    Args:
-        weight_str (str): The weight string to be parsed (e.g., '88 Kilos').
+    Prompts the user to enter the current time and returns it in seconds since midnight.
 
     Returns:
-        float: The weight value as a float.
+        int: The current time entered by the user, in seconds since midnight.
     """
-    weight_str = weight_str.strip().replace('Kilos', '').replace(' ', '')
+    user_input = input("Please enter the time (HH:MM:SS): ").strip()
     try:
-        return float(weight_str)
+        return parse_clock(user_input)
     except ValueError:
-        print(f"Error converting weight '{weight_str}' to float.")
-        return 0.0
+        print("Invalid time format. Please enter time in HH:MM:SS format.")
+        return None
 
-def populate_package_data(csv_file, hash_table):
+def parse_query(line):
     """
-    Populates a hash table with package data from a CSV file.
+    Parses one batch query line: '[time] <HH:MM[:SS]> all' or '[time] <HH:MM[:SS]> solo <package id>'.
 
     Args:
-        csv_file (str): The path to the CSV file containing package data.
-        hash_table (HashMapCreation): The hash table object to populate with package data.
-    """
-    with open(csv_file, newline='', encoding='utf-8-sig') as file:
-        reader = csv.reader(file)
-        for entry in reader:
-            try:
-                pkg_id = int(entry[0])
-                pkg_address = entry[1]
-                pkg_city = entry[2]
-                pkg_state = entry[3]
-                pkg_zip = entry[4]
-                pkg_deadline = entry[5]
-                pkg_weight = parse_weight(entry[6])
-                pkg_status = "At Hub"
-
-                parcel = Parcel(pkg_id, pkg_address, pkg_city, pkg_state, pkg_zip, pkg_deadline, pkg_weight, pkg_status)
-                hash_table.insert(pkg_id, parcel)
-            except ValueError as e:
-                print(f"Error processing row {entry}: {e}")
-
-def get_distance_between(location1, location2):
-    """
-    Calculates the distance between two locations using a distance matrix.
-
-    Args:
-        location1 (str): The name of the first location.
-        location2 (str): The name of the second location.
+        line (str): The query text.
 
     Returns:
-        float: The distance between the two locations, or inf if not found.
-    """
-    try:
-        return distance_matrix.get(location1, {}).get(location2, float('inf'))
-    except Exception as e:
-        print(f"Error finding distance between {location1} and {location2}: {e}")
-        return float('inf')
+        tuple: (time in seconds since midnight, package ID or None for all packages).
 
-def find_address_id(text_address):
+    Raises:
+        ValueError: If the line is not a valid query.
     """
-    Finds the address ID from the address list based on a given address.
+    words = line.replace(",", " ").split()
+    if words and words[0].lower() == "time":
+        words = words[1:]
+    if len(words) < 2:
+        raise ValueError(f"expected '<time> all' or '<time> solo <id>', got '{line.strip()}'")
+    # Allow '10:20 AM' as well as '10:20'
+    if len(words) > 2 and words[1].upper() in ("AM", "PM"):
+        words = [words[0] + " " + words[1]] + words[2:]
+    query_time = parse_clock(words[0])
+    command = words[1].lower()
+    if command == "all" and len(words) == 2:
+        return query_time, None
+    if command == "solo" and len(words) == 3:
+        return query_time, int(words[2])
+    raise ValueError(f"expected '<time> all' or '<time> solo <id>', got '{line.strip()}'")
+
+def run_batch(delivery_plan, lines, output, output_format="json"):
+    """
+    Answers a batch of status queries and writes one record per package.
+
+    Blank lines and lines starting with '#' are skipped. Invalid queries and unknown package IDs
+    produce an error record instead of stopping the batch.
 
     Args:
-        text_address (str): The address to search for.
+        delivery_plan (DeliveryPlan): The planned day to query.
+        lines (iterable of str): The query lines.
+        output (file): Where the records are written.
+        output_format (str): 'json' for JSON Lines or 'csv' for CSV with a header row.
 
     Returns:
-        int: The ID of the address if found.
-
-    Raises:
-        ValueError: If the address cannot be located in the address list.
+        int: The number of queries that failed.
     """
-    for entry in address_list:
-        if text_address in entry[1]:
-            return int(entry[0])
-    raise ValueError(f"Address '{text_address}' could not be located")
+    writer = None
+    if output_format == "csv":
+        writer = csv.DictWriter(output, fieldnames=OUTPUT_FIELDS + ["error"], extrasaction="ignore")
+        writer.writeheader()
+
+    def emit(record):
+        if writer is not None:
+            writer.writerow(record)
+        else:
+            output.write(json.dumps(record) + "\n")
+
+    failures = 0
+    query_number = 0
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        query_number += 1
+        try:
+            query_time, pkg_id = parse_query(line)
+        except ValueError as e:
+            failures += 1
+            emit({"query": query_number, "error": str(e)})
+            continue
+        if pkg_id is None:
+            rows = delivery_plan.all_package_status(query_time)
+        else:
+            rows = [delivery_plan.package_status(pkg_id, query_time)]
+        for row in rows:
+            if row is None:
+                failures += 1
+                emit({"query": query_number, "time": format_clock(query_time), "id": pkg_id,
+                      "error": f"Package ID {pkg_id} not found"})
+                continue
+            emit(dict({"query": query_number, "time": format_clock(query_time)}, **row))
+    return failures
 
-def update_package_address_if_needed(current_time, hash_table):
+def write_paths(delivery_plan, output):
     """
-    Updates the delivery address of a package if the current time is past a defined update time.
+    Writes one JSON line per truck with the addresses it drives through, including those passed between stops.
 
     Args:
-        current_time (timedelta): The current time to check against the update time.
-        hash_table (HashMapCreation): The hash table containing package data.
+        delivery_plan (DeliveryPlan): The planned day.
+        output (file): Where the lines are written.
     """
-    update_time = timedelta(hours=10, minutes=20)
-    if current_time >= update_time:
-        package = hash_table.lookup(9)
-        if package:
-            new_address = "410 S State St, Salt Lake City, UT, 84103"
-            package.delivery_address = new_address
-            hash_table.insert(package.get_id(), package)
+    registry = delivery_plan.dataset.address_registry
+    for index, truck in enumerate(delivery_plan.trucks):
+        path = delivery_plan.driven_path(index)
+        output.write(json.dumps({"truck": index + 1, "mileage": round(truck.total_mileage, 2),
+                                 "path": [registry.address(address_id) for address_id in path]}) + "\n")
 
-def get_user_time():
+def write_results(results, output, output_format=None):
     """
-    Prompts the user to enter the current time and returns it as a timedelta object.
-
-    Returns:
-        timedelta: The current time entered by the user as a timedelta object.
-    """
-    user_input = input("Please enter the time (HH:MM:SS): ").strip()
-    try:
-        parsed_time = datetime.datetime.strptime(user_input, "%H:%M:%S").time()
-        return timedelta(hours=parsed_time.hour, minutes=parsed_time.minute, seconds=parsed_time.second)
-    except ValueError:
-        print("Invalid time format. Please enter time in HH:MM:SS format.")
-        return None
-
-def schedule_deliveries(truck):
-    """
-    Schedules deliveries for a truck based on the packages it carries and their delivery addresses.
+    Writes ranked scenario results.
 
     Args:
-        truck (DeliveryTruck): The truck object that needs to schedule deliveries.
+        results (list of ScenarioResult): The results, best first.
+        output (file): Where to write.
+        output_format (str): 'json' for JSON Lines, 'csv' for CSV with a header row, None for a text table.
     """
-    update_time = timedelta(hours=10, minutes=20)
-    package_id = 9
-    package = hash_table.lookup(package_id)
-    if truck.current_time >= update_time and package:
-        new_address = "410 S State St"
-        package.delivery_address = new_address
-        hash_table.insert(package.get_id(), package)
-
-    pending_deliveries = [hash_table.lookup(parcel_id) for parcel_id in truck.package_ids]
-    truck.package_ids.clear()
-
-    while pending_deliveries:
-        min_distance = float('inf')
-        nearest_parcel = None
-        for parcel in pending_deliveries:
-            if parcel is None:
-                continue
-            try:
-                dist = get_distance_between(truck.current_location, parcel.delivery_address)
-                if dist < min_distance:
-                    min_distance = dist
-                    nearest_parcel = parcel
-            except ValueError as e:
-                print(e)
-
-        if nearest_parcel:
-            truck.package_ids.append(nearest_parcel.parcel_id)
-            pending_deliveries.remove(nearest_parcel)
-            truck.total_mileage += min_distance
-            truck.current_location = nearest_parcel.delivery_address
-            travel_time = timedelta(hours=min_distance / truck.travel_speed)
-            truck.current_time += travel_time
-            nearest_parcel.delivery_time = truck.current_time
-            nearest_parcel.departure_time = truck.departure_time
-
-# Load address data from a CSV file
-address_list = load_address_data('CSV/Addresses.csv')
-
-# Load distance data from a CSV file
-load_distance_data('CSV/Distances.csv')
-
-# Create instances of DeliveryTruck with example data
-truck1 = Truck.DeliveryTruck(max_capacity=16, travel_speed=18, current_load=0.0,
-                             package_ids=[1, 13, 14, 15, 16, 20, 29, 30, 31, 34, 37, 40], total_mileage=0.0,
-                             current_location="4001 South 700 East", departure_time=timedelta(hours=8))
-truck2 = Truck.DeliveryTruck(max_capacity=16, travel_speed=18, current_load=0.0,
-                             package_ids=[3, 6, 12, 17, 18, 19, 21, 22, 23, 24, 25, 27, 28, 33, 35, 36, 38, 39],
-                             total_mileage=0.0, current_location="4001 South 700 East", departure_time=timedelta(hours=8))
-truck3 = Truck.DeliveryTruck(max_capacity=16, travel_speed=18, current_load=0.0,
-                             package_ids=[4, 7, 8, 9, 10, 11, 26, 32], total_mileage=0.0,
-                             current_location="4001 South 700 East", departure_time=timedelta(hours=9))
-
-# Create a hash table to store package information
-hash_table = HashMapCreation()
-
-# Populate package data into the hash table
-populate_package_data("CSV/Packages.csv", hash_table)
-
-# Schedule deliveries for each truck
-schedule_deliveries(truck1)
-schedule_deliveries(truck2)
-truck3.departure_time = min(truck1.current_time, truck2.current_time)
-schedule_deliveries(truck3)
+    from ScenarioRunner import RESULT_FIELDS, format_table
+    if output_format is None:
+        output.write(format_table(results) + "\n")
+    elif output_format == "csv":
+        writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(result.to_dict(rank) for rank, result in enumerate(results, 1))
+    else:
+        for rank, result in enumerate(results, 1):
+            output.write(json.dumps(result.to_dict(rank)) + "\n")
 
 # User interface for interacting with the delivery system
 class UserInterface:
-    def __init__(self):
+    def __init__(self, delivery_plan):
+        self.delivery_plan = delivery_plan
         print("Welcome to the Parcel Delivery System")
         self.display_combined_mileage()
         self.user_command()
@@ -253,8 +153,12 @@ class UserInterface:
         """
         Displays the combined mileage for all trucks.
         """
-        combined_mileage = truck1.total_mileage + truck2.total_mileage + truck3.total_mileage
-        print(f"Combined mileage for all trucks: {combined_mileage:.2f} miles")
+        if self.delivery_plan.recovered:  # Recovered from an event log: no routes to compare
+            print(f"Combined mileage for all trucks: {self.delivery_plan.total_mileage:.2f} miles")
+            return
+        print(f"Combined mileage for all trucks: {self.delivery_plan.total_mileage:.2f} miles "
+              f"(including {self.delivery_plan.return_mileage:.2f} miles back to the hub; "
+              f"greedy route: {self.delivery_plan.greedy_mileage:.2f} miles)")
 
     def user_command(self):
         """
@@ -292,11 +196,8 @@ class UserInterface:
         """
         try:
             pkg_id = int(input("Enter the package ID: "))
-            pkg = hash_table.lookup(pkg_id)
-            if pkg:
-                pkg.update_status(current_time)
-                hash_table.insert(pkg.get_id(), pkg)
-                print(pkg)
+            if self.delivery_plan.package_status(pkg_id, current_time) is not None:
+                print(self.delivery_plan.format_package_at(pkg_id, current_time))
             else:
                 print(f"Package ID {pkg_id} not found.")
         except ValueError:
@@ -306,13 +207,164 @@ class UserInterface:
         """
         Handles the 'all' query, displaying the status of all packages.
         """
-        for id in range(1, 41):
-            pkg = hash_table.lookup(id)
-            if pkg:
-                pkg.update_status(current_time)
-                print(pkg)
-            else:
-                print(f"Package ID {id} not found.")
+        for pkg_id in sorted(self.delivery_plan.dataset.hash_table):
+            if self.delivery_plan.package_status(pkg_id, current_time) is not None:  # Skip packages not in yet
+                print(self.delivery_plan.format_package_at(pkg_id, current_time))
+
+def main(argv=None):
+    """
+    Command-line entry point. Without --queries the interactive prompt is started; with --queries the
+    queries are answered from the file (or stdin for '-') and written to stdout as JSON Lines or CSV.
+    With --scenarios the what-if scenarios in the file are planned in parallel and ranked instead. With
+    --recover the day is not planned: queries are answered from the state recovered from an event log.
+
+    Args:
+        argv (list of str): Command-line arguments (default: sys.argv[1:]).
+
+    Returns:
+        int: The exit status (1 if any batch query failed).
+    """
+    parser = argparse.ArgumentParser(description="Plan the day's deliveries and answer package status queries.")
+    parser.add_argument("--addresses", help="address CSV file (default: CSV/Addresses.csv)")
+    parser.add_argument("--distances", help="distance CSV file (default: CSV/Distances.csv)")
+    parser.add_argument("--packages", help="package CSV file (default: CSV/Packages.csv)")
+    parser.add_argument("--cache", help="compiled dataset file (default: dataset.c950cache next to the packages)")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the CSV files")
+    parser.add_argument("--events", help="CSV file of 'time,kind,package id,value' changes (address, delay, cancel)")
+    parser.add_argument("--event-log", metavar="LOG",
+                        help="log every state change of the day to LOG, with checkpoints for EventLog.py recovery")
+    parser.add_argument("--overwrite-log", action="store_true",
+                        help="let --event-log replace a log that already holds records")
+    parser.add_argument("--recover", metavar="LOG",
+                        help="answer --queries, --serve or the prompt from an event log instead of planning the day")
+    parser.add_argument("--until", help="with --recover, the state at this time, e.g. '10:30 AM' (default: log end)")
+    parser.add_argument("--queries", help="file of queries such as '10:20 all' or '9:00 solo 9'; '-' for stdin")
+    parser.add_argument("--paths", action="store_true",
+                        help="write the addresses each truck drives through, hub to hub, then exit")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="serve package status and truck positions over HTTP (SIGHUP re-plans)")
+    parser.add_argument("--scenarios", help="JSON file of what-if scenarios to evaluate and rank, then exit")
+    parser.add_argument("--workers", type=int, help="worker processes for --scenarios (default: one per CPU)")
+    parser.add_argument("--format", choices=("json", "csv"),
+                        help="batch output format (default: json; --scenarios prints a table by default)")
+    parser.add_argument("--instrument", choices=("json", "log"),
+                        help="report stage timers and counters on exit as JSON or as 'key=value' log lines "
+                             "(also enabled by the C950_INSTRUMENT environment variable)")
+    parser.add_argument("--cprofile", action="store_true", help="add a cProfile summary to the report")
+    parser.add_argument("--tracemalloc", action="store_true", help="add tracemalloc memory statistics to the report")
+    parser.add_argument("--instrument-output", help="file for the instrumentation report (default: stderr)")
+    args = parser.parse_args(argv)
+    if args.recover is not None:
+        planned = [option for option, value in (("--event-log", args.event_log), ("--events", args.events),
+                                                ("--paths", args.paths), ("--scenarios", args.scenarios)) if value]
+        if planned:
+            parser.error(f"--recover cannot be combined with {', '.join(planned)}")
+        try:
+            args.until = parse_clock(args.until) if args.until is not None else None
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.until is not None:
+        parser.error("--until needs --recover")
+
+    if args.instrument or args.cprofile or args.tracemalloc:
+        metrics.configure(True, args.instrument or "json", args.instrument_output, args.cprofile, args.tracemalloc)
+    try:
+        return run(args)
+    finally:
+        if metrics.enabled and not metrics.reported:
+            metrics.write_report()
+
+def run(args):
+    """
+    Plans the day and answers queries as requested by the parsed command-line arguments (see main).
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        int: The exit status.
+    """
+    dataset = load_dataset(args.addresses, args.distances, args.packages, args.cache, not args.no_cache)
+    # The what-if runner, the status server and the event log are imported only when used, so plain queries
+    # start without multiprocessing, asyncio or the log machinery
+    if args.scenarios is not None:
+        from ScenarioRunner import read_scenarios, run_scenarios
+        try:
+            scenarios = read_scenarios(args.scenarios, dataset.report)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read scenarios: {e}", file=sys.stderr)
+            return 1
+        results = run_scenarios(dataset, scenarios, args.workers)
+        if dataset.report:
+            print(f"Data load: {dataset.report.summary()}", file=sys.stderr)
+        write_results(results, sys.stdout, args.format)
+        return 0
+    if args.recover is not None:
+        from EventLog import RecoveredPlan
+        try:
+            delivery_plan = RecoveredPlan(dataset, args.recover, args.until)
+        except (OSError, ValueError) as e:
+            print(f"Cannot recover: {e}", file=sys.stderr)
+            return 1
+        return answer(delivery_plan, args, lambda: RecoveredPlan(
+            load_dataset(args.addresses, args.distances, args.packages, args.cache, not args.no_cache),
+            args.recover, args.until))
+    events = DEFAULT_EVENTS
+    if args.events is not None:
+        events = DEFAULT_EVENTS + read_events(args.events, dataset.report)
+    if args.event_log is not None:
+        from EventLog import EventLogWriter
+        try:
+            with EventLogWriter(args.event_log, overwrite=args.overwrite_log) as event_log:
+                delivery_plan = plan(dataset, events=events, event_log=event_log)
+        except FileExistsError as e:
+            print(f"Cannot write the event log: {e}; use --overwrite-log to replace it", file=sys.stderr)
+            return 1
+    else:
+        delivery_plan = plan(dataset, events=events)
+    # Diagnostics go to stderr so batch output stays machine-readable
+    if dataset.report:
+        print(f"Data load: {dataset.report.summary()}", file=sys.stderr)
+    for pkg_id, reason in sorted(delivery_plan.unassigned.items()):
+        print(f"Package ID {pkg_id} could not be loaded: {reason}", file=sys.stderr)
+
+    if args.paths:
+        write_paths(delivery_plan, sys.stdout)
+        return 0
+
+    def build_plan():
+        # A fresh dataset, so the re-plan never touches the plan being served
+        fresh = load_dataset(args.addresses, args.distances, args.packages, args.cache, not args.no_cache)
+        return plan(fresh, events=DEFAULT_EVENTS + read_events(args.events, fresh.report)
+                    if args.events is not None else DEFAULT_EVENTS)
+
+    return answer(delivery_plan, args, build_plan)
+
+def answer(delivery_plan, args, build_plan):
+    """
+    Serves the plan, answers the batch queries or starts the interactive prompt, as requested by the parsed
+    command-line arguments (see main).
 
-# Instantiate the user interface
-ui = UserInterface()
+    Args:
+        delivery_plan (DeliveryPlan or RecoveredPlan): The day to query.
+        args (argparse.Namespace): The parsed arguments.
+        build_plan (callable): Builds a new plan when the status server is asked to re-plan.
+
+    Returns:
+        int: The exit status.
+    """
+    if args.serve is not None:
+        from StatusServer import run_server
+        host, _, port = args.serve.rpartition(":")
+        run_server(delivery_plan, host or "127.0.0.1", int(port), build_plan)
+        return 0
+    if args.queries is None:
+        UserInterface(delivery_plan)
+        return 0
+    if args.queries == "-":
+        return 1 if run_batch(delivery_plan, sys.stdin, sys.stdout, args.format or "json") else 0
+    with open(args.queries, encoding="utf-8") as query_file:
+        return 1 if run_batch(delivery_plan, query_file, sys.stdout, args.format or "json") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
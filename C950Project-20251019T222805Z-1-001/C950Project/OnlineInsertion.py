@@ -0,0 +1,409 @@
+# This module adds a package to a plan that has already been simulated, without planning the day again.
+# A package that reaches the hub at time T can ride on any trip that has not left the hub by T. Every gap
+# between two consecutive stops of those trips is a candidate position. The added mileage and new arrival time
+# of every candidate are computed at once with NumPy from the shortest-path distance matrix.
+# A candidate is feasible when:
+# - the trip has room;
+# - the package arrives by its deadline;
+# - no stop that was on time becomes late, on this trip or on the truck's later trips (the delay carries over
+#   to them unless the truck would have waited at the hub anyway);
+# - a driver is free for any extra time the truck spends away from the hub.
+# The cheapest feasible candidate is then written into the trips, trucks, packages and timeline.
+# Trips that were re-routed by an address change or delay are not candidates, because their stops depend on
+# when the change arrived.
+# A plan that wrote an event log takes no insertions: the log is append-only and ordered by time, so it cannot
+# take the new package's events or the later times of the stops the insertion delays, and recovering from it
+# would no longer give the plan.
+import math
+from itertools import chain
+
+import numpy as np
+
+from Instrumentation import metrics
+from Timeline import LOADED, DEPARTED, DELIVERED, RETURNED, STATUS_DELIVERED, STATUS_NAMES
+from TimeModel import SECONDS_PER_HOUR, format_clock
+
+# Finite stand-in for unlimited slack, above any real slack in seconds, and the offset that separates trips in
+# running minimums (larger than any value they hold)
+_NO_SLACK_LIMIT = float(2 ** 32)
+_SPAN = float(2 ** 33)
+
+
+class InsertionResult:
+    def __init__(self, parcel_id, truck_index=None, trip=None, position=None, added_mileage=0.0,
+                 delivery_time=None, reason=None):
+        """
+        Describes what insert_package did with one package.
+
+        Parameters:
+        parcel_id (int): The package.
+        truck_index (int): Index of the truck carrying it (None if it was not inserted).
+        trip (TripRecord): The trip it was added to.
+        position (int): Index of its stop in trip.visited.
+        added_mileage (float): Miles the detour adds to the truck's day.
+        delivery_time (int): Planned delivery time in seconds since midnight.
+        reason (str): Why it was not inserted (None if it was).
+        """
+        self.parcel_id = parcel_id
+        self.truck_index = truck_index
+        self.trip = trip
+        self.position = position
+        self.added_mileage = added_mileage
+        self.delivery_time = delivery_time
+        self.reason = reason
+
+    @property
+    def inserted(self):
+        """
+        True if the package was added to a trip.
+        """
+        return self.truck_index is not None
+
+    def __str__(self):
+        """
+        Returns a one-line summary of the insertion.
+        """
+        if not self.inserted:
+            return "package {}: not inserted ({})".format(self.parcel_id, self.reason)
+        return "package {}: truck {}, stop {}, +{:.2f} miles, delivered at {}".format(
+            self.parcel_id, self.truck_index + 1, self.position, self.added_mileage, format_clock(self.delivery_time))
+
+
+def insert_package(delivery_plan, parcel, available_time=0, constraints=None):
+    """
+    Adds a new package to the cheapest feasible position of a trip that has not yet left the hub, and updates
+    the trips, trucks, packages, dataset and timeline of the plan. Nothing changes if no position is feasible
+    or if the plan wrote an event log.
+
+    Parameters:
+    delivery_plan (DeliveryPlan): The simulated plan; it is modified in place.
+    parcel (Parcel): The new package. Its address_id is resolved from its address if it is None.
+    available_time (int): Seconds since midnight at which the package reaches the hub.
+    constraints (PackageConstraints): Loading constraints (truck pin, availability, delivered-with partners).
+
+    Returns:
+    InsertionResult: Where the package was inserted, or why it could not be.
+    """
+    with metrics.stage("insertion"):
+        return _insert(delivery_plan, parcel, available_time, constraints)
+
+
+def _insert(delivery_plan, parcel, available_time, constraints):
+    dataset, simulator = delivery_plan.dataset, delivery_plan.simulator
+    parcel_id = parcel.parcel_id
+    if delivery_plan.event_log is not None:
+        return InsertionResult(parcel_id, reason="the plan's day was written to an event log")
+    if dataset.hash_table.lookup(parcel_id) is not None:
+        return InsertionResult(parcel_id, reason="package ID already in the plan")
+    address_id = parcel.address_id
+    if address_id is None:
+        address_id = dataset.address_registry.get(parcel.delivery_address)
+        if address_id is None:
+            return InsertionResult(parcel_id, reason="unknown address")
+    if constraints is not None:
+        available_time = max(available_time, constraints.available_time)
+
+    trips_by_truck = [[] for _ in delivery_plan.trucks]
+    for trip in delivery_plan.simulation.trips:
+        if trip.visited:
+            trips_by_truck[trip.truck_index].append(trip)
+    allowed = _allowed_trucks(delivery_plan, constraints)
+    candidates = []  # (truck index, index of the trip among the truck's trips)
+    for truck_index, trips in enumerate(trips_by_truck):
+        capacity = delivery_plan.trucks[truck_index].max_capacity
+        if allowed is not None and truck_index not in allowed:
+            continue
+        for number, trip in enumerate(trips):
+            if (trip.departure_time >= available_time and not trip.reroutes
+                    and (not capacity or len(trip.package_ids) < capacity)):
+                candidates.append((truck_index, number))
+    if not candidates:
+        return InsertionResult(parcel_id, reason="no trip with room leaves the hub after the package arrives")
+
+    gaps = _Gaps(delivery_plan, trips_by_truck, candidates)
+    load_seconds = simulator.load_seconds_per_package
+    matrix, first_id = simulator.distances.matrix, simulator.distances.first_id
+    x = address_id - first_id
+    open_end = gaps.ends < 0  # Gap after the last stop of a trip that does not return to the hub
+    ends = np.where(open_end, gaps.starts, gaps.ends) - first_id
+    starts = gaps.starts - first_id
+    to_new = matrix[starts, x]
+    from_new = np.where(open_end, 0.0, matrix[x, ends])
+    direct = np.where(open_end, 0.0, matrix[starts, ends])
+    if metrics.enabled:
+        metrics.count("distance.lookups", 3 * len(starts))
+
+    def seconds(miles):
+        return np.rint(miles * SECONDS_PER_HOUR / gaps.speeds)
+
+    added = to_new + from_new - direct
+    arrival = gaps.times + load_seconds + seconds(to_new)
+    # Delay of every stop after the new one; for an open end, the later finish
+    shift = np.where(open_end, load_seconds + seconds(to_new),
+                     load_seconds + seconds(to_new) + seconds(from_new) - seconds(direct))
+    with np.errstate(invalid="ignore"):
+        feasible = (np.isfinite(added) & (arrival <= parcel.deadline_seconds) & (load_seconds <= gaps.before_slack)
+                    & (shift <= gaps.after_slack) & (shift <= gaps.end_allowance))
+    if not feasible.any():
+        return InsertionResult(parcel_id, reason="no position keeps every deadline, the capacity and the drivers")
+    cost = np.where(feasible, added, np.inf)
+    best = int(np.lexsort((arrival, cost))[0])
+
+    truck_index, number = candidates[gaps.candidate[best]]
+    position = int(gaps.positions[best]) + 1
+    _commit(delivery_plan, trips_by_truck[truck_index], number, parcel, address_id, available_time, position,
+            float(to_new[best]), float(from_new[best]), float(added[best]), int(arrival[best]), int(shift[best]),
+            bool(open_end[best]))
+    if constraints is not None:
+        dataset.constraints[parcel_id] = constraints
+    trip = trips_by_truck[truck_index][number]
+    return InsertionResult(parcel_id, truck_index, trip, position, float(added[best]), int(arrival[best]))
+
+
+def _allowed_trucks(delivery_plan, constraints):
+    """
+    Returns the indices of the trucks a package may ride on (None if any truck may).
+    A pinned truck number wins; otherwise the package rides with the trucks carrying its partners.
+    """
+    if constraints is None:
+        return None
+    if constraints.truck is not None:
+        return {constraints.truck - 1}
+    partners = set(constraints.delivered_with)
+    if not partners:
+        return None
+    holders = {trip.truck_index for trip in delivery_plan.simulation.trips if partners & set(trip.package_ids)}
+    return holders or None
+
+
+def _trip_end(trip):
+    """
+    Returns the time a trip ends: back at the hub, or at its last stop if the truck stays out.
+    """
+    return trip.visit_times[-1] if trip.visit_times else trip.departure_time
+
+
+def _driver_allowance(all_trips, truck_index, drivers):
+    """
+    Returns a function giving, for a time, how many seconds after it a truck could keep its driver before
+    some other truck's trip would have had no driver (inf if never, or if there is a driver per truck).
+    """
+    if drivers is None:
+        return lambda start: math.inf
+    others = [trip for trip in all_trips if trip.truck_index != truck_index]
+    # Each trip holds a driver from the start of loading to its end
+    loads = np.sort(np.array([trip.load_time for trip in others], dtype=np.int64))
+    ends = np.sort(np.array([_trip_end(trip) for trip in others], dtype=np.int64))
+
+    def allowance(start):
+        # Drivers in use only grow when a trip starts loading, so those are the times to check
+        times = np.concatenate(([start], loads[loads > start]))
+        # A trip ending at a second frees its driver for a trip loading at the same second
+        active = np.searchsorted(loads, times, side="right") - np.searchsorted(ends, times, side="right")
+        busy = np.flatnonzero(active >= drivers)
+        return int(times[busy[0]]) - start if len(busy) else math.inf
+    return allowance
+
+
+class _Gaps:
+    """
+    Every candidate gap of every candidate trip, as parallel arrays. The visits of all trips that an insertion
+    can move (each candidate truck's trips from its first candidate on) are laid end to end in flat arrays,
+    so slacks and their running minimums are computed without a loop over trips.
+    """
+    def __init__(self, delivery_plan, trips_by_truck, candidates):
+        first_candidate = {}
+        for truck_index, number in candidates:
+            first_candidate.setdefault(truck_index, number)
+        trips = []  # The trips an insertion can move
+        rows = {}  # (truck index, trip number) -> index in trips
+        for truck_index, first in first_candidate.items():
+            for number in range(first, len(trips_by_truck[truck_index])):
+                rows[truck_index, number] = len(trips)
+                trips.append(trips_by_truck[truck_index][number])
+        candidate_rows = np.array([rows[candidate] for candidate in candidates])
+
+        lengths = np.array([len(trip.visited) for trip in trips])
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        last = offsets + lengths - 1
+        segment = np.repeat(np.arange(len(trips)), lengths)
+        visited = np.fromiter(chain.from_iterable(trip.visited for trip in trips), np.int64, lengths.sum())
+        times = np.fromiter(chain.from_iterable(trip.visit_times for trip in trips), np.float64, lengths.sum())
+
+        # Seconds each visit could be delayed before its package is late (inf if it delivers nothing or was late)
+        delivered = np.fromiter((offsets[row] + visit for row, trip in enumerate(trips)
+                                 for visit, _, _ in trip.deliveries), np.int64)
+        deadlines = np.fromiter((deadline for trip in trips for _, _, deadline in trip.deliveries), np.float64)
+        margins = deadlines - times[delivered]
+        slack = np.full(len(visited), _NO_SLACK_LIMIT)
+        slack[delivered] = np.where(margins >= 0, margins, _NO_SLACK_LIMIT)
+        # Running minimums that restart with every trip: offsetting each trip's values by a multiple of _SPAN
+        # puts every trip below the one before it (for prefixes) or after it (for suffixes)
+        prefix = np.minimum.accumulate(slack - segment * _SPAN) + segment * _SPAN
+        suffix = (np.minimum.accumulate((slack + segment * _SPAN)[::-1]) - segment[::-1] * _SPAN)[::-1]
+        after = np.append(suffix[1:], _NO_SLACK_LIMIT)
+        after[last] = _NO_SLACK_LIMIT
+        trip_slack = _unlimited(np.minimum.reduceat(slack, offsets))
+
+        allowances = np.empty(len(trips))
+        for truck_index, first in first_candidate.items():
+            truck_trips = trips_by_truck[truck_index]
+            truck_rows = [rows[truck_index, number] for number in range(first, len(truck_trips))]
+            allowances[truck_rows] = self._end_allowances(delivery_plan, truck_trips, trip_slack[truck_rows], first)
+
+        # Gap i runs from visit i to visit i + 1; a trip that ends at its last stop also has a gap after it
+        ends = np.append(visited[1:], -1)
+        ends[last] = -1
+        is_gap = np.isin(segment, candidate_rows)
+        is_gap[last[np.array([trip.return_time is not None for trip in trips])]] = False
+        row_of = np.full(len(trips), -1)
+        row_of[candidate_rows] = np.arange(len(candidates))
+        gap_segment = segment[is_gap]
+        speeds = np.array([delivery_plan.trucks[trip.truck_index].travel_speed for trip in trips], dtype=np.float64)
+        self.starts = visited[is_gap]
+        self.ends = ends[is_gap]
+        self.times = times[is_gap]
+        self.speeds = speeds[gap_segment]
+        self.before_slack = _unlimited(prefix[is_gap])
+        self.after_slack = _unlimited(after[is_gap])
+        self.end_allowance = allowances[gap_segment]
+        self.positions = (np.arange(len(visited)) - offsets[segment])[is_gap]
+        self.candidate = row_of[gap_segment]
+
+    @staticmethod
+    def _end_allowances(delivery_plan, trips, slacks, first):
+        """
+        Returns, for each of a truck's trips from first on, how many seconds its end may be delayed. The delay
+        carries over to the next trip unless the truck waited at the hub in between; a delayed end also keeps
+        the driver longer, which is only possible while another driver is free.
+
+        Parameters:
+        trips (list of TripRecord): All of the truck's trips.
+        slacks (list of float): Delay each trip from first on can take before one of its packages is late.
+        first (int): Index of the first trip to compute.
+        """
+        driver_allowance = _driver_allowance(delivery_plan.simulation.trips, trips[0].truck_index,
+                                             delivery_plan.simulator.drivers)
+        allowances = [math.inf] * (len(trips) - first)
+        for number in range(len(trips) - 1, first - 1, -1):
+            end = _trip_end(trips[number])
+            drivers_free = driver_allowance(end)
+            if number == len(trips) - 1:
+                allowances[number - first] = drivers_free
+                continue
+            gap = trips[number + 1].load_time - end
+            if 0 < gap and drivers_free < gap:
+                allowances[number - first] = drivers_free
+            else:
+                allowances[number - first] = gap + min(slacks[number + 1 - first], allowances[number + 1 - first])
+        return allowances
+
+
+def _unlimited(values):
+    """
+    Turns the finite stand-in for 'no limit' used in the running minimums back into inf.
+    """
+    return np.where(values >= _NO_SLACK_LIMIT, np.inf, values)
+
+
+def _commit(delivery_plan, trips, number, parcel, address_id, available_time, position, to_new, from_new, added,
+            arrival, shift, open_end):
+    """
+    Writes an insertion into the trips, truck, packages, dataset and timeline.
+    """
+    simulator, hash_table = delivery_plan.simulator, delivery_plan.dataset.hash_table
+    trip = trips[number]
+    truck = delivery_plan.trucks[trip.truck_index]
+    load_seconds = simulator.load_seconds_per_package
+    # Old times of every trip that moves, to find their events in the timeline
+    moved = [(later, later.load_time, later.departure_time, later.return_time) for later in trips[number:]]
+
+    # The trip: the new stop goes in at position; earlier stops wait for the extra loading, later ones also
+    # for the detour
+    last_visit = len(trip.visited) - 1
+    times = [time + (load_seconds if visit < position else shift) for visit, time in enumerate(trip.visit_times)]
+    trip.visit_times = times[:position] + [arrival] + times[position:]
+    trip.visited.insert(position, address_id)
+    deliveries = [(visit + (visit >= position), parcel_id, deadline) for visit, parcel_id, deadline in trip.deliveries]
+    earlier = [parcel_id for visit, parcel_id, _ in deliveries if visit < position]
+    trip.package_ids.insert(trip.package_ids.index(earlier[-1]) + 1 if earlier else 0, parcel.parcel_id)
+    deliveries.append((position, parcel.parcel_id, parcel.deadline_seconds))
+    trip.deliveries = sorted(deliveries)
+    trip.departure_time += load_seconds
+    trip.last_delivery_time = trip.visit_times[trip.deliveries[-1][0]]
+    if trip.return_time is not None:
+        trip.return_time = trip.visit_times[-1]
+    if open_end or (position == last_visit and trip.return_time is not None):
+        # The new stop ends the route (or precedes the return leg): the route gains the leg to it
+        trip.route_result.mileage_after += to_new
+        trip.return_mileage = from_new if not open_end else 0.0
+    else:
+        trip.route_result.mileage_after += added
+    truck.total_mileage += added
+
+    # Later trips start late only by as much as the delay exceeds the time the truck spent waiting at the hub
+    end = _trip_end(trip)
+    previous_end = moved[0][3] if moved[0][3] is not None else end - shift
+    for later, old_load_time, _, old_return_time in moved[1:]:
+        shift = max(0, shift - (old_load_time - previous_end))
+        previous_end = old_return_time if old_return_time is not None else _trip_end(later)
+        if not shift:
+            break
+        later.load_time += shift
+        later.departure_time += shift
+        later.last_delivery_time += shift
+        later.visit_times = [time + shift for time in later.visit_times]
+        if later.return_time is not None:
+            later.return_time += shift
+    truck.current_time = _trip_end(trips[-1])
+    truck.departure_time = trips[-1].departure_time
+    truck.package_ids = [parcel_id for day_trip in trips for _, parcel_id, _ in day_trip.deliveries]
+
+    if available_time:
+        delivery_plan.arrival_times[parcel.parcel_id] = available_time
+    # The package gets a row in the store like every other package, and the hash table maps it to its view
+    parcel.address_id = address_id
+    parcel.departure_time = trip.departure_time
+    parcel.delivery_time = arrival
+    store = delivery_plan.dataset.package_store
+    hash_table.insert(parcel.parcel_id, store.view(store.add_parcel(parcel)))
+    hash_table.set_status(parcel.parcel_id, STATUS_NAMES[STATUS_DELIVERED])
+    for later, *_ in moved:
+        for visit, parcel_id, _ in later.deliveries:
+            if parcel_id != parcel.parcel_id:
+                carried = hash_table.lookup(parcel_id)
+                carried.delivery_time = later.visit_times[visit]
+                carried.departure_time = later.departure_time
+                hash_table.update(carried)
+
+    timeline = delivery_plan.timeline
+    revisions = {parcel.parcel_id: [(max(trip.load_time, available_time), LOADED, None),
+                                    (trip.departure_time, DEPARTED, None), (arrival, DELIVERED, None)]}
+    carried = {}  # Package ID -> the moved trips that carried it
+    for entry in moved:
+        for parcel_id in set(entry[0].package_ids) | set(entry[0].returned):
+            if parcel_id != parcel.parcel_id:
+                carried.setdefault(parcel_id, []).append(entry)
+    for parcel_id, entries in carried.items():
+        revisions[parcel_id] = [(_moved_time(parcel_id, time, kind, entries), kind, detail)
+                                for time, kind, detail in timeline.package_events(parcel_id)]
+    delivery_plan.timeline = timeline.revised(revisions, {parcel.parcel_id: parcel.delivery_address})
+
+
+def _moved_time(parcel_id, time, kind, entries):
+    """
+    Returns the new time of one of a package's events, given the trips that carried it with their old
+    load, departure and return times. Events of other kinds (address changes, cancellations) keep their time.
+    """
+    for trip, old_load_time, old_departure_time, old_return_time in entries:
+        if kind == LOADED and time == old_load_time:
+            return trip.load_time
+        if kind == DEPARTED and time == old_departure_time:
+            return trip.departure_time
+        if kind == RETURNED and time == old_return_time and parcel_id in trip.returned:
+            return trip.return_time
+        if kind == DELIVERED:
+            for visit, delivered_id, _ in trip.deliveries:
+                if delivered_id == parcel_id:
+                    return trip.visit_times[visit]
+    return time
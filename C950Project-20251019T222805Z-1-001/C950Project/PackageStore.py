@@ -0,0 +1,370 @@
+# This module stores packages column by column instead of one Parcel object per package.
+# Each field lives in its own NumPy array, and repeated strings (city, state, zip, status, ...) are stored
+# once in a StringPool and referenced by an integer code. ParcelView is a two-slot handle onto one row that
+# offers the same attributes and methods as Parcel, so existing code can use either.
+import numpy as np
+
+from CsvIngest import parse_weight
+from Package import Parcel
+from TimeModel import parse_deadline
+
+# Stored in the departure/delivery columns when the time is not known yet
+NO_TIME = -1
+
+# Stored in the address id column when the address has not been resolved
+NO_ADDRESS = -1
+
+
+class StringPool:
+    def __init__(self):
+        """
+        Creates an empty pool of interned strings.
+        """
+        self.values = []  # Code -> string
+        self.codes = {}  # String -> code
+
+    def __len__(self):
+        """
+        Returns the number of distinct strings in the pool.
+        """
+        return len(self.values)
+
+    def intern(self, value):
+        """
+        Returns the code of a string, adding it to the pool if it is new.
+        """
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def code(self, value):
+        """
+        Returns the code of a string, or -1 if it is not in the pool.
+        """
+        return self.codes.get(value, -1)
+
+    def value(self, code):
+        """
+        Returns the string stored under a code.
+        """
+        return self.values[code]
+
+
+class PackageStore:
+    # Column name -> NumPy dtype
+    COLUMNS = {
+        "parcel_id": np.int64,
+        "address_id": np.int32,
+        "address": np.int32,
+        "city": np.int32,
+        "state": np.int32,
+        "zipcode": np.int32,
+        "deadline": np.int32,
+        "deadline_seconds": np.int32,
+        "weight": np.float64,
+        "status": np.int32,
+        "departure_time": np.int32,
+        "delivery_time": np.int32,
+        "note": np.int32,
+    }
+
+    # Columns holding codes into a StringPool
+    STRING_COLUMNS = ("address", "city", "state", "zipcode", "deadline", "status", "note")
+
+    def __init__(self, initial_cap=1024):
+        """
+        Creates an empty package store.
+
+        Parameters:
+        initial_cap (int): Number of rows to allocate up front; the columns double in size when full.
+        """
+        self.size = 0  # Number of rows in use
+        self.columns = {name: np.empty(max(1, initial_cap), dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self.pools = {name: StringPool() for name in self.STRING_COLUMNS}
+        self._rows = None  # Parcel id -> row, built only if ids are not appended in increasing order
+        self._last_id = None  # Largest parcel id appended so far
+
+    def __len__(self):
+        """
+        Returns the number of packages in the store.
+        """
+        return self.size
+
+    def __iter__(self):
+        """
+        Iterates over a view of every package, in insertion order.
+        """
+        for row in range(self.size):
+            yield ParcelView(self, row)
+
+    def __contains__(self, parcel_id):
+        """
+        Returns True if a package with the id is in the store.
+        """
+        return self.row_of(parcel_id) is not None
+
+    @property
+    def nbytes(self):
+        """
+        Returns the number of bytes used by the columns (allocated capacity, not counting string pools).
+        """
+        return sum(column.nbytes for column in self.columns.values())
+
+    def column(self, name):
+        """
+        Returns the filled part of a column as a NumPy array (a view, not a copy).
+        """
+        return self.columns[name][:self.size]
+
+    def _grow(self, needed):
+        """
+        Makes room for at least needed rows.
+        """
+        capacity = len(self.columns["parcel_id"])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def append(self, parcel_id, delivery_address, city, state, zipcode, deadline, weight, status="At Hub",
+               address_id=None, note=""):
+        """
+        Adds a package and returns its row.
+
+        Parameters are the same as for Parcel, plus the package's special note.
+
+        Returns:
+        int: The row of the new package.
+        """
+        self._grow(self.size + 1)
+        row = self.size
+        columns = self.columns
+        columns["parcel_id"][row] = parcel_id
+        columns["address_id"][row] = NO_ADDRESS if address_id is None else address_id
+        columns["address"][row] = self.pools["address"].intern(delivery_address)
+        columns["city"][row] = self.pools["city"].intern(city)
+        columns["state"][row] = self.pools["state"].intern(state)
+        columns["zipcode"][row] = self.pools["zipcode"].intern(zipcode)
+        columns["deadline"][row] = self.pools["deadline"].intern(deadline)
+        columns["deadline_seconds"][row] = parse_deadline(deadline)
+        columns["weight"][row] = weight
+        columns["status"][row] = self.pools["status"].intern(status)
+        columns["departure_time"][row] = NO_TIME
+        columns["delivery_time"][row] = NO_TIME
+        columns["note"][row] = self.pools["note"].intern(note)
+        self.size += 1
+
+        if self._rows is not None:
+            self._rows[parcel_id] = row
+        elif self._last_id is not None and parcel_id <= self._last_id:
+            # Ids are no longer increasing, so binary search on the id column stops working
+            self._rows = {int(existing): index for index, existing in enumerate(self.column("parcel_id"))}
+        self._last_id = parcel_id if self._last_id is None else max(self._last_id, parcel_id)
+        return row
+
+    def extend(self, parcel_ids, delivery_addresses, cities, states, zipcodes, deadlines, weights,
+               address_ids=None, status="At Hub", notes=None):
+        """
+        Adds many packages at once, filling each column with one slice assignment.
+
+        Parameters:
+        parcel_ids, delivery_addresses, cities, states, zipcodes, deadlines, weights (sequences): One value per
+            package for each Parcel field, all of the same length.
+        address_ids (sequence of int): Resolved address ids (None entries, or None for all, if unresolved).
+        status (str): The status every new package starts with.
+        notes (sequence of str): The special note of each package (None if there are none).
+
+        Returns:
+        range: The rows of the new packages.
+        """
+        count = len(parcel_ids)
+        self._grow(self.size + count)
+        start, end = self.size, self.size + count
+        columns = self.columns
+        ids = np.asarray(parcel_ids, dtype=np.int64)
+        columns["parcel_id"][start:end] = ids
+        if address_ids is None:
+            columns["address_id"][start:end] = NO_ADDRESS
+        else:
+            columns["address_id"][start:end] = [NO_ADDRESS if value is None else value for value in address_ids]
+        for name, values in (("address", delivery_addresses), ("city", cities), ("state", states),
+                             ("zipcode", zipcodes), ("deadline", deadlines)):
+            intern = self.pools[name].intern
+            columns[name][start:end] = [intern(value) for value in values]
+        pool = self.pools["deadline"]
+        seconds_by_code = np.array([parse_deadline(value) for value in pool.values], dtype=np.int32)
+        columns["deadline_seconds"][start:end] = seconds_by_code[columns["deadline"][start:end]]
+        columns["weight"][start:end] = weights
+        columns["status"][start:end] = self.pools["status"].intern(status)
+        columns["departure_time"][start:end] = NO_TIME
+        columns["delivery_time"][start:end] = NO_TIME
+        if notes is None:
+            columns["note"][start:end] = self.pools["note"].intern("")
+        else:
+            intern = self.pools["note"].intern
+            columns["note"][start:end] = [intern(note) for note in notes]
+        self.size = end
+
+        if count:
+            increasing = (self._last_id is None or ids[0] > self._last_id) and bool(np.all(ids[1:] > ids[:-1]))
+            if self._rows is None and not increasing:
+                self._rows = {int(existing): index for index, existing in enumerate(self.column("parcel_id"))}
+            elif self._rows is not None:
+                self._rows.update((int(parcel_id), start + offset) for offset, parcel_id in enumerate(ids))
+            last = int(ids.max())
+            self._last_id = last if self._last_id is None else max(self._last_id, last)
+        return range(start, end)
+
+    @classmethod
+    def from_columns(cls, columns, pool_values):
+        """
+        Creates a store over existing column arrays without copying them (e.g., arrays mapped from a file).
+
+        Parameters:
+        columns (dict): Column name -> NumPy array, one entry per name in COLUMNS, all of the same length.
+        pool_values (dict): String column name -> list of its pooled strings, in code order.
+
+        Returns:
+        PackageStore: The store; appending to it copies the columns into new arrays.
+        """
+        store = cls(initial_cap=1)
+        store.columns = {name: columns[name] for name in cls.COLUMNS}
+        store.size = len(store.columns["parcel_id"])
+        for name, values in pool_values.items():
+            pool = store.pools[name]
+            for value in values:
+                pool.intern(value)
+        ids = store.column("parcel_id")
+        if store.size:
+            if not bool(np.all(ids[1:] > ids[:-1])):
+                store._rows = {int(parcel_id): row for row, parcel_id in enumerate(ids)}
+            store._last_id = int(ids.max())
+        return store
+
+    def add_parcel(self, parcel):
+        """
+        Copies a Parcel into the store and returns its row. A weight given as text ('2 Kilos') is parsed.
+        """
+        weight = parse_weight(parcel.weight) if isinstance(parcel.weight, str) else parcel.weight
+        row = self.append(parcel.parcel_id, parcel.delivery_address, parcel.city, parcel.state, parcel.zipcode,
+                          parcel.deadline, weight, parcel.status, parcel.address_id)
+        view = ParcelView(self, row)
+        view.departure_time = parcel.departure_time
+        view.delivery_time = parcel.delivery_time
+        return row
+
+    def row_of(self, parcel_id):
+        """
+        Returns the row of a package, or None if it is not in the store.
+        """
+        if self._rows is not None:
+            return self._rows.get(parcel_id)
+        ids = self.column("parcel_id")
+        row = int(np.searchsorted(ids, parcel_id))
+        if row < self.size and ids[row] == parcel_id:
+            return row
+        return None
+
+    def view(self, row):
+        """
+        Returns a ParcelView onto a row.
+        """
+        return ParcelView(self, row)
+
+    def lookup(self, parcel_id):
+        """
+        Returns a ParcelView onto a package, or None if it is not in the store.
+        """
+        row = self.row_of(parcel_id)
+        return None if row is None else ParcelView(self, row)
+
+    def status_counts(self):
+        """
+        Returns the number of packages in each status, e.g. {"At Hub": 12, "Delivered": 28}.
+        """
+        counts = np.bincount(self.column("status"), minlength=len(self.pools["status"]))
+        return {self.pools["status"].value(code): int(count) for code, count in enumerate(counts) if count}
+
+
+def _string_field(name):
+    """
+    Returns a property that reads and writes a pooled string column.
+    """
+    def getter(self):
+        return self.store.pools[name].value(int(self.store.columns[name][self.row]))
+
+    def setter(self, value):
+        self.store.columns[name][self.row] = self.store.pools[name].intern(value)
+
+    return property(getter, setter)
+
+
+def _optional_field(name, missing):
+    """
+    Returns a property that reads and writes a numeric column, mapping the missing marker to None.
+    """
+    def getter(self):
+        value = int(self.store.columns[name][self.row])
+        return None if value == missing else value
+
+    def setter(self, value):
+        self.store.columns[name][self.row] = missing if value is None else value
+
+    return property(getter, setter)
+
+
+class ParcelView:
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        """
+        Creates a handle onto one row of a PackageStore.
+
+        Parameters:
+        store (PackageStore): The store holding the package.
+        row (int): The row of the package in the store.
+        """
+        self.store = store
+        self.row = row
+
+    @property
+    def parcel_id(self):
+        return int(self.store.columns["parcel_id"][self.row])
+
+    @property
+    def weight(self):
+        return float(self.store.columns["weight"][self.row])
+
+    @property
+    def deadline_seconds(self):
+        return int(self.store.columns["deadline_seconds"][self.row])
+
+    delivery_address = _string_field("address")
+    city = _string_field("city")
+    state = _string_field("state")
+    zipcode = _string_field("zipcode")
+    deadline = _string_field("deadline")
+    status = _string_field("status")
+    note = _string_field("note")
+    address_id = _optional_field("address_id", NO_ADDRESS)
+    departure_time = _optional_field("departure_time", NO_TIME)
+    delivery_time = _optional_field("delivery_time", NO_TIME)
+
+    def __eq__(self, other):
+        return isinstance(other, ParcelView) and other.store is self.store and other.row == self.row
+
+    def __hash__(self):
+        return hash((id(self.store), self.row))
+
+    # The Parcel methods only use the attributes above, so they work unchanged on a view
+    __str__ = Parcel.__str__
+    get_id = Parcel.get_id
+    update_status = Parcel.update_status
+    print_package_info_at_time = Parcel.print_package_info_at_time
@@ -0,0 +1,372 @@
+# This module splits a large package set into truckload-sized geographic clusters.
+# Packages are grouped by delivery address, and the addresses are clustered with capacitated k-medoids over
+# the distance matrix: each address joins the nearest cluster centre (medoid) that still has room, and each
+# medoid moves to the member address closest to the rest of its cluster. Packages with a deadline take up
+# more room, so clusters with tight deadlines stay small enough to deliver on time. Addresses on a cluster
+# boundary are then moved to a neighbouring cluster when it is closer and has room.
+# Each cluster becomes one trip; schedule_clusters hands the trips to trucks. The work grows with the number
+# of packages only through grouping them by address, so large days plan in roughly linear time.
+import heapq
+import math
+
+import numpy as np
+
+from TimeModel import EOD, travel_seconds
+from TruckLoader import build_units
+
+# Extra room taken by a package with a deadline, as a fraction of one package
+DEADLINE_WEIGHT = 0.5
+
+# Clusters are sized to this fraction of truck capacity, leaving room to rebalance
+TARGET_FILL = 0.9
+
+# Number of nearest medoids considered for each address
+CANDIDATE_MEDOIDS = 8
+
+# Rows of the address-to-medoid distance table computed at a time
+_CHUNK_ROWS = 2048
+
+
+class Cluster:
+    def __init__(self, medoid, truck=None):
+        """
+        Creates an empty cluster of packages that will be delivered on one trip.
+
+        Parameters:
+        medoid (int): Row of the cluster's centre address in the distance matrix.
+        truck (int): Number of the truck the cluster is pinned to (None if any truck may carry it).
+        """
+        self.medoid = medoid
+        self.truck = truck
+        self.nodes = []  # Indices of the member addresses in the pool being clustered
+        self.parcel_ids = []
+        self.address_ids = []  # Distinct delivery addresses
+        self.load = 0.0  # Packages, counting deadline packages as 1 + DEADLINE_WEIGHT
+        self.available_time = 0  # Latest time a member package reaches the hub
+        self.deadline = EOD  # Earliest member deadline
+
+    def __len__(self):
+        """
+        Returns the number of packages in the cluster.
+        """
+        return len(self.parcel_ids)
+
+    def __str__(self):
+        return "medoid {}, {} packages at {} addresses, load {:.1f}".format(
+            self.medoid, len(self.parcel_ids), len(self.address_ids), self.load)
+
+
+class PartitionResult:
+    def __init__(self, clusters, unassigned, iterations, moves):
+        """
+        Holds the outcome of partition_packages.
+
+        Parameters:
+        clusters (list of Cluster): The clusters, each at most one truckload.
+        unassigned (dict): Package id -> reason it could not be placed in any cluster.
+        iterations (int): k-medoids iterations, summed over the pools that were clustered.
+        moves (int): Addresses moved between clusters while rebalancing boundaries.
+        """
+        self.clusters = clusters
+        self.unassigned = unassigned
+        self.iterations = iterations
+        self.moves = moves
+
+
+class _Node:
+    """
+    One delivery address of a pool, with the loading units going there.
+    """
+    def __init__(self, row):
+        self.row = row  # Row of the address in the distance matrix
+        self.units = []
+        self.weight = 0.0
+
+
+def partition_packages(parcels, constraints, deadlines, trucks, distances, address_correction_time=None,
+                       deadline_weight=DEADLINE_WEIGHT, max_iterations=10, seed=0):
+    """
+    Clusters packages into truckloads.
+
+    Packages pinned to a truck or reaching the hub late are clustered separately from the rest, so a
+    cluster never waits for packages it does not need. Must-be-delivered-with groups stay together.
+
+    Parameters:
+    parcels (list of Parcel): The packages (their address_id must be resolved).
+    constraints (dict): Package id -> PackageConstraints (packages without an entry are unconstrained).
+    deadlines (dict): Package id -> deadline in seconds since midnight (EOD for end of day).
+    trucks (list of DeliveryTruck): The fleet; max_capacity is the number of packages per trip.
+    distances (DistanceMatrix): The distances between addresses.
+    address_correction_time (int): Seconds since midnight at which wrong addresses are corrected.
+    deadline_weight (float): Extra room taken by a package with a deadline.
+    max_iterations (int): Maximum k-medoids iterations per pool.
+    seed (int): Seed for choosing the first medoids.
+
+    Returns:
+    PartitionResult: The clusters and any packages that could not be placed.
+    """
+    units, unassigned = build_units(parcels, constraints, deadlines, address_correction_time)
+    default_capacity = min((truck.max_capacity for truck in trucks), default=0)
+    pools = {}
+    for unit in units:
+        if unit.truck is not None and not 0 < unit.truck <= len(trucks):
+            for parcel_id in unit.parcel_ids:
+                unassigned[parcel_id] = f"pinned to truck {unit.truck}, which does not exist"
+            continue
+        pools.setdefault((unit.truck, unit.available_time), []).append(unit)
+
+    rng = np.random.default_rng(seed)
+    clusters = []
+    iterations = moves = 0
+    for (truck, _), pool in sorted(pools.items(), key=lambda item: (item[0][0] or 0, item[0][1])):
+        capacity = trucks[truck - 1].max_capacity if truck is not None else default_capacity
+        pool_clusters, pool_iterations, pool_moves = _cluster_pool(
+            pool, truck, capacity, deadlines, distances, deadline_weight, max_iterations, rng, unassigned)
+        clusters.extend(pool_clusters)
+        iterations += pool_iterations
+        moves += pool_moves
+    return PartitionResult(clusters, unassigned, iterations, moves)
+
+
+def _unit_weight(unit, deadlines, deadline_weight):
+    """
+    Returns the room a unit takes: one per package plus deadline_weight per package with a deadline.
+    """
+    with_deadline = sum(1 for parcel_id in unit.parcel_ids if deadlines.get(parcel_id, EOD) != EOD)
+    return len(unit.parcel_ids) + deadline_weight * with_deadline
+
+
+def _cluster_pool(units, truck, capacity, deadlines, distances, deadline_weight, max_iterations, rng,
+                  unassigned):
+    """
+    Clusters the units of one pool. Returns (clusters, iterations, boundary moves).
+    """
+    first_id = distances.first_id
+    clusters = []
+    nodes = {}  # Address row -> _Node
+    for unit in units:
+        if len(unit.parcel_ids) > capacity:
+            for parcel_id in unit.parcel_ids:
+                unassigned[parcel_id] = "delivered-with group is larger than a truckload"
+            continue
+        weight = min(_unit_weight(unit, deadlines, deadline_weight), capacity)
+        row = unit.address_ids[0] - first_id
+        node = nodes.get(row)
+        if node is None:
+            node = nodes[row] = _Node(row)
+        if node.weight + weight > capacity:
+            # A full truckload for one address becomes its own cluster
+            full = Cluster(row, truck)
+            full.nodes = [None]
+            for full_unit in node.units:
+                _add_unit(full, full_unit, deadlines, deadline_weight, capacity)
+            clusters.append(full)
+            node.units, node.weight = [], 0.0
+        node.units.append(unit)
+        node.weight += weight
+
+    nodes = [node for node in nodes.values() if node.units]
+    if not nodes:
+        return clusters, 0, 0
+    rows = np.array([node.row for node in nodes])
+    weights = np.array([node.weight for node in nodes])
+    count = max(1, math.ceil(weights.sum() / (capacity * TARGET_FILL)))
+    medoids = _initial_medoids(distances.matrix, rows, weights, min(count, len(nodes)), rng)
+
+    iterations = 0
+    membership = None
+    while iterations < max_iterations:
+        iterations += 1
+        membership, medoids = _assign(distances.matrix, rows, weights, medoids, capacity)
+        updated = _update_medoids(distances.matrix, rows, weights, membership, len(medoids))
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+    moves = _rebalance(distances.matrix, rows, weights, medoids, membership, capacity)
+
+    pool_clusters = [Cluster(int(rows[medoid]), truck) for medoid in medoids]
+    for index, cluster_index in enumerate(membership):
+        cluster = pool_clusters[cluster_index]
+        cluster.nodes.append(index)
+        for unit in nodes[index].units:
+            _add_unit(cluster, unit, deadlines, deadline_weight, capacity)
+    clusters.extend(cluster for cluster in pool_clusters if cluster.parcel_ids)
+    return clusters, iterations, moves
+
+
+def _add_unit(cluster, unit, deadlines, deadline_weight, capacity):
+    """
+    Adds a loading unit's packages to a cluster.
+    """
+    cluster.parcel_ids.extend(unit.parcel_ids)
+    for address_id in unit.address_ids:
+        if address_id not in cluster.address_ids:
+            cluster.address_ids.append(address_id)
+    cluster.load += min(_unit_weight(unit, deadlines, deadline_weight), capacity)
+    cluster.available_time = max(cluster.available_time, unit.available_time)
+    cluster.deadline = min(cluster.deadline, unit.deadline)
+
+
+def _initial_medoids(matrix, rows, weights, count, rng):
+    """
+    Chooses starting medoids with k-means++: each next medoid is drawn with probability proportional to
+    weight times squared distance to the nearest medoid so far.
+
+    Returns:
+    numpy.ndarray: Indices into rows.
+    """
+    medoids = [int(rng.choice(len(rows), p=weights / weights.sum()))]
+    nearest = matrix[rows, rows[medoids[0]]].copy()
+    for _ in range(1, count):
+        score = weights * np.where(np.isfinite(nearest), nearest, 0.0) ** 2
+        total = score.sum()
+        if total <= 0:
+            break  # Every address already is a medoid or sits on one
+        medoids.append(int(rng.choice(len(rows), p=score / total)))
+        np.minimum(nearest, matrix[rows, rows[medoids[-1]]], out=nearest)
+    return np.array(medoids)
+
+
+def _nearest_medoids(matrix, rows, medoids):
+    """
+    Returns, for every address, its CANDIDATE_MEDOIDS nearest medoids (nearest first) and their distances.
+    The address-to-medoid table is built a block of rows at a time to bound memory.
+    """
+    medoid_rows = rows[medoids]
+    width = min(CANDIDATE_MEDOIDS, len(medoids))
+    order = np.empty((len(rows), width), dtype=np.intp)
+    nearest = np.empty((len(rows), width))
+    for start in range(0, len(rows), _CHUNK_ROWS):
+        block = matrix[np.ix_(rows[start:start + _CHUNK_ROWS], medoid_rows)]
+        if width < len(medoids):
+            candidates = np.argpartition(block, width - 1, axis=1)[:, :width]
+        else:
+            candidates = np.broadcast_to(np.arange(width), (len(block), width))
+        candidate_distances = np.take_along_axis(block, candidates, axis=1)
+        ranking = np.argsort(candidate_distances, axis=1)
+        order[start:start + len(block)] = np.take_along_axis(candidates, ranking, axis=1)
+        nearest[start:start + len(block)] = np.take_along_axis(candidate_distances, ranking, axis=1)
+    return order, nearest
+
+
+def _assign(matrix, rows, weights, medoids, capacity):
+    """
+    Assigns every address to the nearest medoid with room. Addresses that lose most by not getting their
+    nearest medoid (largest regret) are placed first; an address with no candidate room starts a new cluster.
+
+    Returns:
+    tuple: (cluster index of every address, medoids including any new ones)
+    """
+    order, nearest = _nearest_medoids(matrix, rows, medoids)
+    regret = nearest[:, 1] - nearest[:, 0] if nearest.shape[1] > 1 else np.zeros(len(rows))
+    regret = np.where(np.isfinite(regret), regret, np.finfo(np.float64).max)
+    medoids = list(medoids)
+    load = [0.0] * len(medoids)
+    membership = np.empty(len(rows), dtype=np.intp)
+    # Medoids take their own address first so they are never pushed out of their cluster
+    for cluster_index, medoid in enumerate(medoids):
+        membership[medoid] = cluster_index
+        load[cluster_index] += weights[medoid]
+    is_medoid = np.zeros(len(rows), dtype=bool)
+    is_medoid[medoids] = True
+    for index in np.lexsort((-weights, -regret)):
+        if is_medoid[index]:
+            continue
+        for cluster_index in order[index]:
+            if load[cluster_index] + weights[index] <= capacity:
+                break
+        else:
+            cluster_index = len(medoids)
+            medoids.append(int(index))
+            load.append(0.0)
+        membership[index] = cluster_index
+        load[cluster_index] += weights[index]
+    return membership, np.array(medoids)
+
+
+def _update_medoids(matrix, rows, weights, membership, count):
+    """
+    Moves each medoid to the member address with the smallest weighted distance to the other members.
+    """
+    medoids = np.empty(count, dtype=np.intp)
+    members_by_cluster = [[] for _ in range(count)]
+    for index, cluster_index in enumerate(membership):
+        members_by_cluster[cluster_index].append(index)
+    for cluster_index, members in enumerate(members_by_cluster):
+        members = np.array(members)
+        block = matrix[np.ix_(rows[members], rows[members])]
+        cost = np.where(np.isfinite(block), block, np.finfo(np.float64).max / len(members)) @ weights[members]
+        medoids[cluster_index] = members[int(np.argmin(cost))]
+    return medoids
+
+
+def _rebalance(matrix, rows, weights, medoids, membership, capacity):
+    """
+    Moves boundary addresses (those closer to another cluster's medoid than their own) to that cluster
+    when it has room, best improvement first. Medoids stay put.
+
+    Returns:
+    int: The number of addresses moved.
+    """
+    order, nearest = _nearest_medoids(matrix, rows, medoids)
+    load = np.bincount(membership, weights=weights, minlength=len(medoids))
+    own = matrix[rows, rows[medoids[membership]]]
+    gains = own - nearest[:, 0]
+    is_medoid = np.zeros(len(rows), dtype=bool)
+    is_medoid[medoids] = True
+    moves = 0
+    for index in np.argsort(-gains):
+        if gains[index] <= 0:
+            break
+        if is_medoid[index]:
+            continue
+        for rank, cluster_index in enumerate(order[index]):
+            if nearest[index, rank] >= own[index]:
+                break
+            if cluster_index != membership[index] and load[cluster_index] + weights[index] <= capacity:
+                load[membership[index]] -= weights[index]
+                load[cluster_index] += weights[index]
+                membership[index] = cluster_index
+                moves += 1
+                break
+    return moves
+
+
+def schedule_clusters(clusters, trucks, distances, hub_address_id):
+    """
+    Turns clusters into trips and hands them to trucks, earliest deadline first, each to the truck that
+    will be free soonest (pinned clusters go to their truck). Trip length is estimated from the distance
+    out to the medoid and back plus each address's distance to the medoid.
+
+    Parameters:
+    clusters (list of Cluster): The clusters from partition_packages.
+    trucks (list of DeliveryTruck): The fleet.
+    distances (DistanceMatrix): The distances between addresses.
+    hub_address_id (int): The address id of the hub.
+
+    Returns:
+    list of list of list of int: Package IDs per trip per truck, in trip order.
+    """
+    matrix = distances.matrix
+    hub_row = hub_address_id - distances.first_id
+    trips = [[] for _ in trucks]
+    free_at = [truck.departure_time for truck in trucks]
+    ready = [(truck.departure_time, index) for index, truck in enumerate(trucks)]
+    heapq.heapify(ready)
+
+    for cluster in sorted(clusters, key=lambda item: (item.deadline, item.available_time)):
+        address_rows = np.asarray(cluster.address_ids) - distances.first_id
+        spread = matrix[address_rows, cluster.medoid]
+        miles = 2 * matrix[hub_row, cluster.medoid] + float(spread[np.isfinite(spread)].sum())
+        if cluster.truck is not None:
+            index = cluster.truck - 1
+        else:
+            while True:
+                time, index = heapq.heappop(ready)
+                if time == free_at[index]:
+                    break  # Skip entries made stale by pinned trips
+        start = max(free_at[index], cluster.available_time)
+        free_at[index] = start + travel_seconds(miles, trucks[index].travel_speed)
+        trips[index].append(list(cluster.parcel_ids))
+        heapq.heappush(ready, (free_at[index], index))
+    return trips
@@ -0,0 +1,254 @@
+# This module improves a truck route produced by the greedy nearest-neighbour scheduler.
+# It applies 2-opt (reverse a stretch of the route) and Or-opt (move a run of 1-3 stops elsewhere)
+# moves. Each move's mileage change is computed from the four to six distances it touches, and a whole
+# row of candidate moves is evaluated at once with NumPy, so a pass over a 200-stop route is fast.
+import time
+
+import numpy as np
+
+from Instrumentation import metrics
+from TimeModel import EOD, SECONDS_PER_HOUR
+
+# Deadline used for stops that have none
+NO_DEADLINE = EOD
+
+
+class RouteResult:
+    def __init__(self, route, mileage_before, mileage_after, moves_accepted, passes):
+        """
+        Holds the outcome of a route optimization.
+
+        Parameters:
+        route (list of int): The improved visiting order, as indices into the stops given to the optimizer.
+        mileage_before (float): Mileage of the seed route.
+        mileage_after (float): Mileage of the improved route.
+        moves_accepted (int): Number of 2-opt and Or-opt moves applied.
+        passes (int): Number of full passes over the route.
+        """
+        self.route = route  # Improved visiting order
+        self.mileage_before = mileage_before  # Mileage of the seed route
+        self.mileage_after = mileage_after  # Mileage after improvement
+        self.moves_accepted = moves_accepted  # Moves that were applied
+        self.passes = passes  # Passes made over the route
+
+    def __str__(self):
+        """
+        Returns a one-line summary of the optimization.
+        """
+        return "{:.2f} -> {:.2f} miles ({} moves, {} passes)".format(
+            self.mileage_before, self.mileage_after, self.moves_accepted, self.passes)
+
+
+class RouteOptimizer:
+    def __init__(self, distances, travel_speed=18, max_passes=50, time_limit=0.5):
+        """
+        Creates a route optimizer over a distance matrix.
+
+        Parameters:
+        distances (DistanceMatrix): The distances between addresses.
+        travel_speed (float): Truck speed in miles per hour, used to check deadlines.
+        max_passes (int): Maximum number of passes over the route.
+        time_limit (float): Maximum number of seconds to spend improving one route.
+        """
+        self.distances = distances
+        self.travel_speed = travel_speed
+        self.max_passes = max_passes
+        self.time_limit = time_limit
+
+    def optimize(self, start_address_id, stop_address_ids, seed_order=None, deadlines=None, start_time=0.0):
+        """
+        Improves a route that starts at start_address_id and visits every stop once.
+        The route ends at its last stop, matching how schedule_deliveries drives.
+
+        A move is only applied when it shortens the route and does not add late time
+        (seconds past a deadline, summed over all stops).
+
+        Parameters:
+        start_address_id (int): The address the truck leaves from.
+        stop_address_ids (list of int): The address id of each stop.
+        seed_order (list of int): Initial visiting order as indices into stop_address_ids (default: as given).
+        deadlines (list of int): Deadline of each stop in seconds since midnight (NO_DEADLINE if none).
+        start_time (int): Departure time in seconds since midnight.
+
+        Returns:
+        RouteResult: The improved route and its mileage before and after.
+        """
+        order = list(range(len(stop_address_ids))) if seed_order is None else list(seed_order)
+        if len(order) == 0:
+            return RouteResult([], 0.0, 0.0, 0, 0)
+
+        first_id = self.distances.first_id
+        # Node 0 is the start; node k + 1 is stop k. The matrix gets an extra row/column for a virtual
+        # end node that is zero distance from every stop, so the open route can be treated as closed.
+        nodes = np.concatenate(([start_address_id], np.asarray(stop_address_ids))) - first_id
+        size = len(nodes)
+        matrix = np.zeros((size + 1, size + 1))
+        matrix[:size, :size] = self.distances.matrix[np.ix_(nodes, nodes)]
+        matrix[0, size] = matrix[size, 0] = np.inf  # The start can never be the last stop
+
+        stop_deadlines = np.full(size, NO_DEADLINE, dtype=np.float64)
+        if deadlines is not None:
+            stop_deadlines[1:] = deadlines
+        checker = _DeadlineChecker(matrix, stop_deadlines, start_time, SECONDS_PER_HOUR / self.travel_speed)
+
+        tour = np.array([0] + [k + 1 for k in order] + [size])
+        mileage_before = _tour_length(matrix, tour)
+        moves = 0
+        passes = 0
+        deadline = time.perf_counter() + self.time_limit
+        while passes < self.max_passes and time.perf_counter() < deadline:
+            passes += 1
+            improved = False
+            for move in (_two_opt_pass, _or_opt_pass):
+                while time.perf_counter() < deadline:
+                    applied, tour = move(matrix, tour, checker)
+                    if not applied:
+                        break
+                    moves += applied
+                    improved = True
+            if not improved:
+                break
+
+        if metrics.enabled:
+            metrics.count("route.optimizations")
+            metrics.count("route.moves_accepted", moves)
+            metrics.count("route.passes", passes)
+            metrics.count("distance.lookups", size * size)
+            metrics.count("distance.inf", int(np.isinf(matrix[:size, :size]).sum()))
+        route = [int(node) - 1 for node in tour[1:-1]]
+        return RouteResult(route, mileage_before, _tour_length(matrix, tour), moves, passes)
+
+
+def greedy_seed(distances, start_address_id, stop_address_ids, deadlines=None):
+    """
+    Builds a nearest-neighbour visiting order to seed the optimizer.
+    Stops with a deadline are visited before stops without one.
+
+    Parameters:
+    distances (DistanceMatrix): The distances between addresses.
+    start_address_id (int): The address the truck leaves from.
+    stop_address_ids (list of int): The address id of each stop.
+    deadlines (list of int): Deadline of each stop in seconds since midnight (NO_DEADLINE if none).
+
+    Returns:
+    list of int: Indices into stop_address_ids; stops that cannot be reached are left out.
+    """
+    order = []
+    unvisited = list(range(len(stop_address_ids)))
+    current_address_id = start_address_id
+    while unvisited:
+        candidates = unvisited
+        if deadlines is not None:
+            candidates = [k for k in unvisited if deadlines[k] != NO_DEADLINE] or unvisited
+        candidate_distances = distances.distances_from(current_address_id,
+                                                       [stop_address_ids[k] for k in candidates])
+        nearest_index = int(candidate_distances.argmin())
+        if candidate_distances[nearest_index] == float('inf'):
+            break  # The remaining stops cannot be reached
+        order.append(candidates[nearest_index])
+        unvisited.remove(candidates[nearest_index])
+        current_address_id = stop_address_ids[order[-1]]
+    return order
+
+
+class _DeadlineChecker:
+    def __init__(self, matrix, deadlines, start_time, seconds_per_mile):
+        """
+        Computes how many seconds past their deadlines the stops of a tour are delivered.
+        """
+        self.matrix = matrix
+        self.deadlines = deadlines
+        self.start_time = start_time
+        self.seconds_per_mile = seconds_per_mile
+        self.has_deadlines = bool((deadlines < NO_DEADLINE).any())
+
+    def late_seconds(self, tour):
+        """
+        Returns the summed lateness of a tour (0 when no stop has a deadline).
+        """
+        if not self.has_deadlines:
+            return 0.0
+        stops = tour[:-1]  # Drop the virtual end node
+        legs = self.matrix[stops[:-1], stops[1:]]
+        arrivals = self.start_time + np.cumsum(legs) * self.seconds_per_mile
+        return float(np.maximum(arrivals - self.deadlines[stops[1:]], 0.0).sum())
+
+    def allows(self, old_tour, new_tour):
+        """
+        Returns True if new_tour is not later than old_tour.
+        """
+        if not self.has_deadlines:
+            return True
+        return self.late_seconds(new_tour) <= self.late_seconds(old_tour) + 1e-9
+
+
+def _tour_length(matrix, tour):
+    """
+    Returns the mileage of a tour (the leg to the virtual end node is free).
+    """
+    return float(matrix[tour[:-1], tour[1:]].sum())
+
+
+def _two_opt_pass(matrix, tour, checker):
+    """
+    Applies every improving 2-opt move found in one sweep over the tour.
+    Reversing tour[i..j] changes the mileage by
+    d(t[i-1], t[j]) + d(t[i], t[j+1]) - d(t[i-1], t[i]) - d(t[j], t[j+1]).
+
+    Returns:
+    tuple: (number of moves applied, new tour)
+    """
+    applied = 0
+    last = len(tour) - 2  # Index of the last real stop
+    for i in range(1, last):
+        j = np.arange(i + 1, last + 1)
+        a, b = tour[i - 1], tour[i]
+        c, d = tour[j], tour[j + 1]
+        delta = matrix[a, c] + matrix[b, d] - matrix[a, b] - matrix[c, d]
+        for k in np.argsort(delta):
+            if delta[k] >= -1e-9:
+                break
+            end = int(j[k])
+            candidate = np.concatenate((tour[:i], tour[i:end + 1][::-1], tour[end + 1:]))
+            if checker.allows(tour, candidate):
+                tour = candidate
+                applied += 1
+                break
+    return applied, tour
+
+
+def _or_opt_pass(matrix, tour, checker):
+    """
+    Applies every improving Or-opt move found in one sweep over the tour.
+    A run of 1-3 stops tour[i..i+length-1] is cut out and reinserted between two other neighbouring stops.
+
+    Returns:
+    tuple: (number of moves applied, new tour)
+    """
+    applied = 0
+    for length in (1, 2, 3):
+        i = 1
+        while i + length < len(tour):
+            first, last_stop = tour[i], tour[i + length - 1]
+            before, after = tour[i - 1], tour[i + length]
+            removal_gain = matrix[before, first] + matrix[last_stop, after] - matrix[before, after]
+
+            rest = np.concatenate((tour[:i], tour[i + length:]))
+            p = np.arange(len(rest) - 1)  # Insert between rest[p] and rest[p + 1]
+            p = p[(p != i - 1)]  # Putting the run back where it was is not a move
+            insertion_cost = matrix[rest[p], first] + matrix[last_stop, rest[p + 1]] - matrix[rest[p], rest[p + 1]]
+            delta = insertion_cost - removal_gain
+            moved = False
+            for k in np.argsort(delta):
+                if delta[k] >= -1e-9:
+                    break
+                position = int(p[k]) + 1
+                candidate = np.concatenate((rest[:position], tour[i:i + length], rest[position:]))
+                if checker.allows(tour, candidate):
+                    tour = candidate
+                    applied += 1
+                    moved = True
+                    break
+            if not moved:
+                i += 1
+    return applied, tour
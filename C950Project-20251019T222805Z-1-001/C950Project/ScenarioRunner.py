@@ -0,0 +1,306 @@
+# This module evaluates many what-if plans of the same day in parallel and ranks them.
+# A scenario changes the trucks (departure times, speed, capacity), the number of drivers, which truck
+# carries which package, the events of the day or the routing settings. Scenarios run in a process pool.
+# The distance matrices and package columns are copied once into shared memory, and every worker maps
+# them instead of receiving a pickled copy. Each scenario plans on a private copy of the small package
+# columns, so workers never see each other's delivery times; the large distance matrices are shared
+# read-only.
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from DatasetCache import CompiledDataset
+from DeliveryEvents import read_events
+from DeliveryPlanner import Dataset, DEFAULT_EVENTS, DRIVER_COUNT, default_trucks, plan
+from TimeModel import format_clock, parse_clock
+from TruckLoader import PackageConstraints
+
+# Scenarios sent to a worker at a time
+DEFAULT_CHUNK_SIZE = 16
+
+# Columns of the ranked table
+RESULT_FIELDS = ("rank", "name", "total_mileage", "late", "finish_time", "undelivered", "unassigned", "error")
+
+
+class Scenario:
+    def __init__(self, name, departures=None, travel_speed=18, max_capacity=16, drivers=DRIVER_COUNT, assignments=None,
+                 events=None, load_seconds_per_package=0, return_to_hub=True, partition="auto", time_limit=0.5,
+                 seed=0):
+        """
+        Describes one what-if plan.
+
+        Parameters:
+        name (str): Label shown in the results.
+        departures (list of int): Departure time of each truck in seconds since midnight (default: the sample day's).
+        travel_speed (float): Speed of every truck in miles per hour.
+        max_capacity (int): Packages every truck can carry per trip.
+        drivers (int): Number of drivers (None for one per truck).
+        assignments (dict): Package ID -> number of the truck that must carry it, on top of the package notes.
+        events (list of DeliveryEvent): Changes during the day (default: DEFAULT_EVENTS).
+        load_seconds_per_package (int): Seconds spent loading each package at the hub.
+        return_to_hub (bool): False to end each truck's day at its last stop.
+        partition (bool or str): Passed to plan(); 'auto' partitions large days into clusters.
+        time_limit (float): Seconds the route optimizer may spend on each trip.
+        seed (int): Seed for the partitioner's first cluster centres.
+        """
+        self.name = name
+        self.departures = departures
+        self.travel_speed = travel_speed
+        self.max_capacity = max_capacity
+        self.drivers = drivers
+        self.assignments = assignments or {}
+        self.events = events
+        self.load_seconds_per_package = load_seconds_per_package
+        self.return_to_hub = return_to_hub
+        self.partition = partition
+        self.time_limit = time_limit
+        self.seed = seed
+
+    @classmethod
+    def from_dict(cls, spec, report=None):
+        """
+        Creates a Scenario from a JSON object such as
+        {"name": "early", "departures": ["7:30 AM", "9:05 AM"], "travel_speed": 20, "drivers": 2,
+         "assignments": {"15": 1}, "events": "changes.csv", "time_limit": 0.05, "seed": 3}.
+
+        Parameters:
+        spec (dict): The scenario; every key but name is optional. 'events' is a CSV file of changes that
+            are applied on top of DEFAULT_EVENTS.
+        report (IngestReport): Collects event rows that cannot be parsed.
+
+        Raises:
+        ValueError: If a field is invalid.
+        """
+        spec = dict(spec)
+        if "name" not in spec:
+            raise ValueError("A scenario needs a name")
+        name = str(spec.pop("name"))
+        if "departures" in spec:
+            spec["departures"] = [parse_clock(departure) if isinstance(departure, str) else int(departure)
+                                  for departure in spec["departures"]]
+        if "assignments" in spec:
+            spec["assignments"] = {int(parcel_id): int(truck) for parcel_id, truck in spec["assignments"].items()}
+        if "events" in spec:
+            spec["events"] = DEFAULT_EVENTS + read_events(spec["events"], report)
+        try:
+            return cls(name, **spec)
+        except TypeError as e:
+            raise ValueError(f"Scenario '{name}': {e}") from None
+
+
+class ScenarioResult:
+    def __init__(self, name, total_mileage=None, late=None, finish_time=None, undelivered=0, unassigned=0, error=None):
+        """
+        Holds the outcome of one scenario.
+
+        Parameters:
+        name (str): The scenario's name.
+        total_mileage (float): Combined mileage of every truck.
+        late (int): Packages delivered after their deadline or not at all.
+        finish_time (int): Seconds since midnight at which the last truck finished.
+        undelivered (int): Packages that were loaded but never delivered.
+        unassigned (int): Packages that could not be loaded on any truck.
+        error (str): Why the scenario could not be planned (None if it was).
+        """
+        self.name = name
+        self.total_mileage = total_mileage
+        self.late = late
+        self.finish_time = finish_time
+        self.undelivered = undelivered
+        self.unassigned = unassigned
+        self.error = error
+
+    def sort_key(self):
+        """
+        Orders results: fewest late packages, then lowest mileage, then earliest finish; failures last.
+        """
+        if self.error is not None:
+            return (1, 0, 0.0, 0)
+        return (0, self.late, self.total_mileage, self.finish_time)
+
+    def to_dict(self, rank=None):
+        """
+        Returns the result as a dictionary with the keys of RESULT_FIELDS.
+        """
+        return {
+            "rank": rank,
+            "name": self.name,
+            "total_mileage": round(self.total_mileage, 2) if self.total_mileage is not None else None,
+            "late": self.late,
+            "finish_time": format_clock(self.finish_time) if self.finish_time is not None else None,
+            "undelivered": self.undelivered,
+            "unassigned": self.unassigned,
+            "error": self.error,
+        }
+
+
+class SharedDataset:
+    def __init__(self, dataset):
+        """
+        Copies a dataset's arrays into shared memory blocks. Use as a context manager, or call close()
+        to free the blocks.
+
+        Parameters:
+        dataset (Dataset): The parsed data.
+        """
+        compiled = dataset.compile()
+        self.header = compiled.header
+        self.specs = {}  # Array name -> (block name, dtype, shape)
+        self._blocks = []
+        try:
+            for name, array in compiled.arrays.items():
+                array = np.ascontiguousarray(array)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+                self.specs[name] = (block.name, array.dtype.str, array.shape)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        """
+        Frees the shared memory blocks.
+        """
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach(header, specs):
+    """
+    Maps the shared memory blocks of a SharedDataset in another process.
+
+    Parameters:
+    header (dict): SharedDataset.header.
+    specs (dict): SharedDataset.specs.
+
+    Returns:
+    CompiledDataset: Read-only arrays backed by the shared blocks.
+    """
+    blocks = []
+    arrays = {}
+    for name, (block_name, dtype, shape) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+    return CompiledDataset(header, arrays, blocks)
+
+
+# The shared dataset of a worker process, set by _init_worker
+_shared = None
+
+
+def _init_worker(header, specs):
+    global _shared
+    _shared = attach(header, specs)
+
+
+def evaluate(compiled, scenario):
+    """
+    Plans one scenario.
+
+    Parameters:
+    compiled (CompiledDataset): The day's data; package columns are copied, distance arrays are only read.
+    scenario (Scenario): The scenario.
+
+    Returns:
+    ScenarioResult: The scenario's mileage, late packages and finish time, or the error that stopped it
+        (e.g., a package assigned to a truck the scenario does not have).
+    """
+    arrays = {name: np.array(array) if name.startswith("package.") else array
+              for name, array in compiled.arrays.items()}
+    try:
+        dataset = Dataset.from_compiled(CompiledDataset(compiled.header, arrays))
+        trucks = default_trucks(dataset, scenario.departures, scenario.travel_speed, scenario.max_capacity)
+        for parcel_id, truck in scenario.assignments.items():
+            if not 1 <= truck <= len(trucks):
+                raise ValueError(f"package {parcel_id} is assigned to truck {truck}, "
+                                 f"but the scenario has {len(trucks)} trucks")
+            constraints = dataset.constraints.get(parcel_id) or PackageConstraints(parcel_id)
+            constraints.truck = truck
+            dataset.constraints[parcel_id] = constraints
+        delivery_plan = plan(dataset, trucks, events=scenario.events, drivers=scenario.drivers,
+                             load_seconds_per_package=scenario.load_seconds_per_package,
+                             return_to_hub=scenario.return_to_hub, partition=scenario.partition,
+                             time_limit=scenario.time_limit, seed=scenario.seed)
+    except (ValueError, KeyError, IndexError) as e:
+        return ScenarioResult(scenario.name, error=str(e) or type(e).__name__)
+    return ScenarioResult(scenario.name, delivery_plan.total_mileage, len(delivery_plan.late_packages()),
+                          delivery_plan.finish_time, len(delivery_plan.simulation.undelivered),
+                          len(delivery_plan.unassigned))
+
+
+def _evaluate_shared(scenario):
+    return evaluate(_shared, scenario)
+
+
+def run_scenarios(dataset, scenarios, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Evaluates scenarios in a process pool and ranks them.
+
+    Parameters:
+    dataset (Dataset): The day's data.
+    scenarios (list of Scenario): The scenarios.
+    workers (int): Worker processes (default: one per CPU; 0 to evaluate in this process).
+    chunk_size (int): Scenarios sent to a worker at a time.
+
+    Returns:
+    list of ScenarioResult: The results, best first (see ScenarioResult.sort_key).
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers == 0:
+        compiled = dataset.compile()
+        results = [evaluate(compiled, scenario) for scenario in scenarios]
+    else:
+        with SharedDataset(dataset) as shared:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shared.header, shared.specs)) as executor:
+                results = list(executor.map(_evaluate_shared, scenarios, chunksize=max(1, chunk_size)))
+    return sorted(results, key=ScenarioResult.sort_key)
+
+
+def read_scenarios(filepath, report=None):
+    """
+    Reads a JSON file holding a list of scenario objects (see Scenario.from_dict).
+
+    Raises:
+    ValueError: If the file is not a list of valid scenarios.
+    """
+    with open(filepath, encoding="utf-8") as spec_file:
+        specs = json.load(spec_file)
+    if not isinstance(specs, list):
+        raise ValueError(f"{filepath}: expected a list of scenarios")
+    return [Scenario.from_dict(spec, report) for spec in specs]
+
+
+def format_table(results):
+    """
+    Formats ranked results as a fixed-width text table.
+    """
+    lines = ["{:>4}  {:<24} {:>9} {:>5} {:>11}  {}".format("Rank", "Scenario", "Miles", "Late", "Finish", "Notes")]
+    for rank, result in enumerate(results, 1):
+        row = result.to_dict(rank)
+        if result.error is not None:
+            lines.append("{:>4}  {:<24} {:>9} {:>5} {:>11}  {}".format(rank, result.name, "-", "-", "-", result.error))
+            continue
+        notes = []
+        if result.undelivered:
+            notes.append(f"{result.undelivered} undelivered")
+        if result.unassigned:
+            notes.append(f"{result.unassigned} unassigned")
+        lines.append("{:>4}  {:<24} {:>9.2f} {:>5} {:>11}  {}".format(
+            rank, result.name, result.total_mileage, result.late, row["finish_time"], ", ".join(notes)))
+    return "\n".join(lines)
@@ -0,0 +1,174 @@
+# This module holds the secondary indexes kept alongside a package hash table (see HashMapCreation.add_index).
+# A HashIndex maps each value of one attribute (a zip code, a status, ...) to the keys holding it, for
+# equality lookups. A SortedIndex keeps (value, key) pairs in order for range queries such as "due by
+# 10:30 AM" or "delivered between 9:00 and 10:00".
+# Each index remembers the value it indexed for every key, so an entry can be moved even after its item was
+# changed in place.
+from bisect import bisect_left, insort
+
+# Pairs per block of a SortedIndex; a block is split when it grows past twice this size
+BLOCK_SIZE = 512
+
+# The package indexes added by HashMapCreation.add_package_indexes(): (name, attribute, ordered)
+PACKAGE_INDEXES = (
+    ("address_id", "address_id", False),
+    ("zip", "zipcode", False),
+    ("status", "status", False),
+    ("deadline", "deadline_seconds", True),
+    ("delivery_time", "delivery_time", True),
+)
+
+
+class HashIndex:
+    def __init__(self, attribute):
+        """
+        Creates an empty equality index on one attribute of the stored items.
+
+        Parameters:
+        attribute (str): Name of the attribute indexed (e.g. 'zipcode').
+        """
+        self.attribute = attribute
+        self.keys = {}  # Value -> set of keys holding it
+        self.values = {}  # Key -> value it is indexed under
+
+    def build(self, pairs):
+        """
+        Replaces the index with (key, item) pairs.
+        """
+        self.keys, self.values = {}, {}
+        for key, item in pairs:
+            self.add(key, item)
+
+    def add(self, key, item):
+        """
+        Indexes an item under its current value, moving it if it was indexed under another one.
+        """
+        value = getattr(item, self.attribute)
+        if key in self.values:
+            old_value = self.values[key]
+            if old_value == value:
+                return
+            self._discard(key, old_value)
+        self.values[key] = value
+        self.keys.setdefault(value, set()).add(key)
+
+    def remove(self, key):
+        """
+        Removes a key from the index (nothing happens if it is not indexed).
+        """
+        if key in self.values:
+            self._discard(key, self.values.pop(key))
+
+    def _discard(self, key, value):
+        keys = self.keys[value]
+        keys.discard(key)
+        if not keys:
+            del self.keys[value]
+
+    def find(self, value):
+        """
+        Returns the keys whose items have a value, sorted.
+        """
+        return sorted(self.keys.get(value, ()))
+
+    def counts(self):
+        """
+        Returns the number of keys under each value.
+        """
+        return {value: len(keys) for value, keys in self.keys.items()}
+
+
+class SortedIndex:
+    def __init__(self, attribute, block_size=BLOCK_SIZE):
+        """
+        Creates an empty ordered index on one attribute of the stored items. Items whose value is None (a
+        package not delivered yet, say) are left out.
+
+        The (value, key) pairs are kept in sorted blocks, with the largest pair of each block in maxes, so an
+        insert or removal finds its block by binary search and only shifts the entries of that block.
+
+        Parameters:
+        attribute (str): Name of the attribute indexed (e.g. 'deadline_seconds').
+        block_size (int): Pairs per block (blocks hold up to twice this many).
+        """
+        self.attribute = attribute
+        self.block_size = block_size
+        self.blocks = []  # Sorted lists of (value, key) pairs; every pair of a block is below the next block's
+        self.maxes = []  # Last pair of each block
+        self.values = {}  # Key -> value it is indexed under
+
+    def __len__(self):
+        """
+        Returns the number of keys indexed.
+        """
+        return len(self.values)
+
+    def build(self, pairs):
+        """
+        Replaces the index with (key, item) pairs, sorting them once instead of inserting one by one.
+        """
+        values = ((key, getattr(item, self.attribute)) for key, item in pairs)
+        self.values = {key: value for key, value in values if value is not None}
+        ordered = sorted((value, key) for key, value in self.values.items())
+        self.blocks = [ordered[start:start + self.block_size] for start in range(0, len(ordered), self.block_size)]
+        self.maxes = [block[-1] for block in self.blocks]
+
+    def add(self, key, item):
+        """
+        Indexes an item under its current value, moving it if it was indexed under another one.
+        """
+        value = getattr(item, self.attribute)
+        if key in self.values:
+            if self.values[key] == value:
+                return
+            self.remove(key)
+        if value is None:
+            return
+        self.values[key] = value
+        pair = (value, key)
+        if not self.blocks:
+            self.blocks.append([pair])
+            self.maxes.append(pair)
+            return
+        index = min(bisect_left(self.maxes, pair), len(self.blocks) - 1)
+        block = self.blocks[index]
+        insort(block, pair)
+        self.maxes[index] = block[-1]
+        if len(block) > 2 * self.block_size:
+            self.blocks[index:index + 1] = [block[:self.block_size], block[self.block_size:]]
+            self.maxes[index:index + 1] = [block[self.block_size - 1], block[-1]]
+
+    def remove(self, key):
+        """
+        Removes a key from the index (nothing happens if it is not indexed).
+        """
+        if key not in self.values:
+            return
+        pair = (self.values.pop(key), key)
+        index = bisect_left(self.maxes, pair)
+        block = self.blocks[index]
+        del block[bisect_left(block, pair)]
+        if block:
+            self.maxes[index] = block[-1]
+        else:
+            del self.blocks[index]
+            del self.maxes[index]
+
+    def find_range(self, low=None, high=None):
+        """
+        Returns the keys with low <= value <= high, ordered by value (then key).
+
+        Parameters:
+        low: Smallest value included (None for no lower bound).
+        high: Largest value included (None for no upper bound).
+        """
+        keys = []
+        index = 0 if low is None else bisect_left(self.maxes, (low,))
+        start = 0 if low is None or index == len(self.blocks) else bisect_left(self.blocks[index], (low,))
+        for block in self.blocks[index:]:
+            for value, key in block[start:] if start else block:
+                if high is not None and value > high:
+                    return keys
+                keys.append(key)
+            start = 0
+        return keys
@@ -0,0 +1,190 @@
+# This module turns the distance table into true shortest-path distances.
+# Distance tables often list a longer direct distance than going through a third address (breaking the
+# triangle inequality), and pairs with no entry are inf. Floyd-Warshall (vectorized one intermediate address
+# at a time) or, for sparse tables, Dijkstra from every address finds the shortest distance between every pair,
+# and a next-hop table records the route so the addresses a truck actually drives through can be listed.
+import heapq
+
+import numpy as np
+
+from DistanceMatrix import DistanceMatrix
+
+# Marks a pair with no path in the next-hop table
+NO_HOP = -1
+
+# Tables with fewer known pairs than this fraction are solved with Dijkstra instead of Floyd-Warshall
+SPARSE_DENSITY = 0.05
+
+# A path through another address must be shorter by more than this to replace the direct distance
+_TOLERANCE = 1e-9
+
+
+class ShortestPaths:
+    def __init__(self, distances, next_hop, direct=None):
+        """
+        Holds shortest-path distances and the next-hop table to rebuild the paths.
+
+        Parameters:
+        distances (DistanceMatrix): Shortest distance between every pair of addresses.
+        next_hop (numpy.ndarray): next_hop[i][j] is the row of the first address after row i on the shortest
+            path from row i to row j (NO_HOP if there is no path).
+        direct (DistanceMatrix): The original table, used to count how many pairs were shortened.
+        """
+        self.distances = distances
+        self.next_hop = next_hop
+        self.direct = direct
+
+    @property
+    def first_id(self):
+        return self.distances.first_id
+
+    @property
+    def matrix(self):
+        return self.distances.matrix
+
+    def distance(self, address_id1, address_id2):
+        """
+        Returns the shortest distance between two addresses (inf if there is no path).
+        """
+        return self.distances.distance(address_id1, address_id2)
+
+    def path(self, address_id1, address_id2):
+        """
+        Returns the addresses on the shortest path between two addresses.
+
+        Returns:
+        list of int: Address ids from address_id1 to address_id2, both included ([] if there is no path).
+        """
+        first_id = self.first_id
+        current, target = address_id1 - first_id, address_id2 - first_id
+        if self.next_hop[current, target] == NO_HOP:
+            return []
+        path = [address_id1]
+        while current != target:
+            current = int(self.next_hop[current, target])
+            path.append(current + first_id)
+        return path
+
+    def expand(self, address_ids):
+        """
+        Returns the addresses driven through when visiting address_ids in order.
+
+        Parameters:
+        address_ids (list of int): The stops, starting with the address the truck leaves from.
+
+        Returns:
+        list of int: Every address passed, with consecutive stops joined by their shortest paths.
+        """
+        if not address_ids:
+            return []
+        driven = [address_ids[0]]
+        for start, end in zip(address_ids, address_ids[1:]):
+            driven.extend(self.path(start, end)[1:])
+        return driven
+
+    def shortened_pairs(self):
+        """
+        Returns the number of pairs whose shortest path is shorter than the table's direct distance.
+        """
+        if self.direct is None:
+            return 0
+        return int((self.distances.matrix < self.direct.matrix - _TOLERANCE).sum())
+
+    @classmethod
+    def compute(cls, distance_matrix, method="auto"):
+        """
+        Computes all-pairs shortest paths over a distance matrix.
+
+        Parameters:
+        distance_matrix (DistanceMatrix): The direct distances (inf where unknown).
+        method (str): 'floyd-warshall', 'dijkstra' or 'auto' (Dijkstra for sparse tables).
+
+        Returns:
+        ShortestPaths: The shortest distances and next-hop table.
+        """
+        matrix = distance_matrix.matrix
+        if method == "auto":
+            size = len(matrix)
+            known = np.isfinite(matrix).sum() - size
+            sparse = size > 1 and known < SPARSE_DENSITY * size * (size - 1)
+            method = "dijkstra" if sparse else "floyd-warshall"
+        if method == "floyd-warshall":
+            distances, next_hop = floyd_warshall(matrix)
+        elif method == "dijkstra":
+            distances, next_hop = dijkstra_all_pairs(matrix)
+        else:
+            raise ValueError(f"Unknown shortest-path method '{method}'")
+        return cls(DistanceMatrix(distances, distance_matrix.first_id), next_hop, distance_matrix)
+
+
+def _initial_next_hop(matrix):
+    """
+    Returns the next-hop table of the direct distances: j itself if the pair has a distance, else NO_HOP.
+    """
+    size = len(matrix)
+    next_hop = np.where(np.isfinite(matrix), np.arange(size, dtype=np.int32)[np.newaxis, :], NO_HOP)
+    next_hop = next_hop.astype(np.int32)
+    np.fill_diagonal(next_hop, np.arange(size, dtype=np.int32))
+    return next_hop
+
+
+def floyd_warshall(matrix):
+    """
+    Runs Floyd-Warshall, updating the whole matrix for one intermediate address per step.
+
+    Parameters:
+    matrix (numpy.ndarray): Square matrix of direct distances (inf where unknown).
+
+    Returns:
+    tuple: (shortest distances as float64, next-hop table as int32)
+    """
+    distances = np.array(matrix, dtype=np.float64)
+    next_hop = _initial_next_hop(distances)
+    via = np.empty_like(distances)
+    better = np.empty(distances.shape, dtype=bool)
+    for k in range(len(distances)):
+        # Going from i to j through k: distances[i, k] + distances[k, j]
+        np.add(distances[:, k, np.newaxis], distances[np.newaxis, k, :], out=via)
+        np.less(via, distances - _TOLERANCE, out=better)
+        np.copyto(distances, via, where=better)
+        np.copyto(next_hop, next_hop[:, k, np.newaxis], where=better)
+    return distances, next_hop
+
+
+def dijkstra_all_pairs(matrix):
+    """
+    Runs Dijkstra from every address over the known (finite) distances. Faster than Floyd-Warshall when
+    most pairs have no direct distance.
+
+    Parameters:
+    matrix (numpy.ndarray): Square matrix of direct distances (inf where unknown).
+
+    Returns:
+    tuple: (shortest distances as float64, next-hop table as int32)
+    """
+    size = len(matrix)
+    neighbours = [[] for _ in range(size)]
+    rows, columns = np.nonzero(np.isfinite(matrix))
+    for row, column in zip(rows.tolist(), columns.tolist()):
+        if row != column:
+            neighbours[row].append((column, float(matrix[row, column])))
+
+    distances = np.full((size, size), np.inf)
+    next_hop = np.full((size, size), NO_HOP, dtype=np.int32)
+    for source in range(size):
+        best = distances[source]
+        first_hop = next_hop[source]
+        best[source] = 0.0
+        first_hop[source] = source
+        heap = [(0.0, source)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > best[node]:
+                continue
+            for neighbour, length in neighbours[node]:
+                candidate = distance + length
+                if candidate < best[neighbour] - _TOLERANCE:
+                    best[neighbour] = candidate
+                    first_hop[neighbour] = neighbour if node == source else first_hop[node]
+                    heapq.heappush(heap, (candidate, neighbour))
+    return distances, next_hop
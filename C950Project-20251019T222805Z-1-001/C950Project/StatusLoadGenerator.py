@@ -0,0 +1,167 @@
+# This module drives a running StatusServer with many concurrent keep-alive clients (standard library only).
+# Each client sends requests drawn from a mix of endpoints (one package, all packages, one truck, all trucks)
+# at random times of day. The throughput, latency percentiles and error count are written as JSON.
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from TimeModel import clock, format_clock
+
+# Share of requests sent to each endpoint
+DEFAULT_MIX = {"package": 0.85, "truck": 0.1, "trucks": 0.04, "packages": 0.01}
+
+# Query times are drawn from the working day
+FIRST_QUERY_TIME = clock(8)
+LAST_QUERY_TIME = clock(17)
+
+
+def _target(kind, rng, packages, trucks):
+    query_time = format_clock(rng.randrange(FIRST_QUERY_TIME, LAST_QUERY_TIME)).replace(" ", "+")
+    if kind == "package":
+        return f"/packages/{rng.randint(1, packages)}?time={query_time}"
+    if kind == "truck":
+        return f"/trucks/{rng.randint(1, trucks)}?time={query_time}"
+    return f"/{kind}?time={query_time}"
+
+
+async def _request(reader, writer, target):
+    """
+    Sends one GET on an open connection and reads the response. Returns the HTTP status code and the body.
+    """
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed the connection")
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    body = await reader.readexactly(length)
+    return int(status_line.split()[1]), body
+
+
+async def _client(host, port, targets, latencies, errors):
+    reader = writer = None
+    for target in targets:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            status, _ = await _request(reader, writer, target)
+        except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError):
+            errors.append("connection")
+            if writer is not None:
+                writer.close()
+            reader = writer = None  # Reconnect for the next request
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors.append(status)
+    if writer is not None:
+        writer.close()
+
+
+def _percentile(ordered, share):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+async def run_load(host="127.0.0.1", port=8950, concurrency=50, requests=10000, mix=None, seed=0):
+    """
+    Sends requests from concurrent clients and measures them.
+
+    Parameters:
+    host (str): Server address.
+    port (int): Server port.
+    concurrency (int): Number of clients, each with its own keep-alive connection.
+    requests (int): Total number of requests, split evenly over the clients.
+    mix (dict): Endpoint kind ('package', 'packages', 'truck' or 'trucks') -> share (default: DEFAULT_MIX).
+    seed (int): Seed for the endpoints, IDs and times requested.
+
+    Returns:
+    dict: requests, errors, seconds, requests_per_second and latency_ms (mean, p50, p95, p99, max).
+    """
+    mix = DEFAULT_MIX if mix is None else mix
+    reader, writer = await asyncio.open_connection(host, port)
+    status, body = await _request(reader, writer, "/snapshot")
+    writer.close()
+    summary = json.loads(body) if status == 200 else {}
+    packages, trucks = max(1, summary.get("packages", 1)), max(1, summary.get("trucks", 1))
+
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=requests)
+    targets = [_target(kind, rng, packages, trucks) for kind in kinds]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, targets[index::concurrency], latencies, errors)
+                           for index in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(latencies) / seconds) if seconds > 0 else None,
+        "latency_ms": {
+            "mean": round(1000 * sum(ordered) / len(ordered), 3) if ordered else None,
+            "p50": round(1000 * _percentile(ordered, 0.5), 3) if ordered else None,
+            "p95": round(1000 * _percentile(ordered, 0.95), 3) if ordered else None,
+            "p99": round(1000 * _percentile(ordered, 0.99), 3) if ordered else None,
+            "max": round(1000 * ordered[-1], 3) if ordered else None,
+        },
+    }
+
+
+def main(argv=None):
+    """
+    Command-line entry point: loads a running status server and prints the measurements as JSON.
+
+    Parameters:
+    argv (list of str): Command-line arguments (default: sys.argv[1:]).
+
+    Returns:
+    int: The exit status (1 if any request failed).
+    """
+    parser = argparse.ArgumentParser(description="Send concurrent queries to a running status server.")
+    parser.add_argument("--host", default="127.0.0.1", help="server address (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8950, help="server port (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent connections (default: %(default)s)")
+    parser.add_argument("--requests", type=int, default=10000, help="total requests (default: %(default)s)")
+    parser.add_argument("--mix", help="endpoint mix, e.g. 'package=0.85,truck=0.1,trucks=0.04,packages=0.01'")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args(argv)
+    mix = None
+    if args.mix is not None:
+        try:
+            mix = {name.strip(): float(share) for name, _, share in
+                   (part.rpartition("=") for part in args.mix.split(",") if part.strip())}
+        except ValueError:
+            parser.error(f"invalid --mix '{args.mix}'")
+        unknown = set(mix) - set(DEFAULT_MIX)
+        if unknown:
+            parser.error(f"unknown endpoint kinds: {', '.join(sorted(unknown))}")
+    if args.concurrency < 1 or args.requests < 1:
+        parser.error("--concurrency and --requests must be positive")
+
+    try:
+        result = asyncio.run(run_load(args.host, args.port, args.concurrency, args.requests, mix, args.seed))
+    except OSError as e:
+        print(f"Cannot reach the server: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+# This module serves package status and truck position queries over HTTP with asyncio (standard library only).
+# Requests are answered from a PlanSnapshot: a published, read-only plan. A re-plan builds a new plan in a
+# worker thread while the current snapshot keeps serving, then swaps it in with a single reference
+# assignment. Each request reads the snapshot reference once, so it is answered entirely from one plan,
+# and readers never wait for a writer.
+#
+# Endpoints (time is 'HH:MM', 'HH:MM:SS' or '10:30 AM'; without it the current time of day is used):
+#   GET /packages/<id>?time=T    one package's status at T
+#   GET /packages?time=T         every package's status at T
+#   GET /trucks/<n>?time=T       truck n's position at T
+#   GET /trucks?time=T           every truck's position at T
+#   GET /snapshot                version, publication time and totals of the plan being served
+# run_server() re-plans when the process receives SIGHUP (where the platform has it).
+import asyncio
+import json
+import signal
+import sys
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from TimeModel import format_clock, parse_clock
+
+# Seconds an idle keep-alive connection stays open
+IDLE_TIMEOUT = 30
+
+# Longest request line or header line accepted, in bytes
+MAX_LINE = 8192
+
+# 'All packages at T' responses kept per snapshot (they are the largest to encode)
+ALL_PACKAGES_CACHE_SIZE = 64
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            431: "Request Header Fields Too Large"}
+
+
+class PlanSnapshot:
+    def __init__(self, delivery_plan, version):
+        """
+        Publishes a plan for reading. The plan must not be modified after it is published.
+
+        Parameters:
+        delivery_plan (DeliveryPlan): The planned day.
+        version (int): Increases with every published plan.
+        """
+        self.plan = delivery_plan
+        self.version = version
+        self.published_at = time.time()
+        self.package_ids = tuple(sorted(delivery_plan.dataset.hash_table))
+        self.summary = {
+            "version": version,
+            "published_at": self.published_at,
+            "packages": len(self.package_ids),
+            "trucks": len(delivery_plan.trucks),
+            "total_mileage": round(delivery_plan.total_mileage, 2),
+            "finish_time": format_clock(delivery_plan.finish_time),
+        }
+        self._all_packages = OrderedDict()  # Query time -> encoded response body
+
+    def package(self, parcel_id, query_time):
+        """
+        Returns a package's status at a time (None if the ID is unknown).
+        """
+        return self.plan.package_status(parcel_id, query_time)
+
+    def all_packages_body(self, query_time):
+        """
+        Returns the encoded response for every package's status at a time. Bodies are cached per time;
+        the plan never changes, so a cached body never goes stale.
+        """
+        body = self._all_packages.get(query_time)
+        if body is None:
+            body = _encode(self.plan.all_package_status(query_time))
+            self._all_packages[query_time] = body
+            if len(self._all_packages) > ALL_PACKAGES_CACHE_SIZE:
+                self._all_packages.popitem(last=False)
+        return body
+
+    def truck(self, number, query_time):
+        """
+        Returns truck number's position at a time (None if there is no such truck).
+        """
+        if not 0 < number <= len(self.plan.trucks):
+            return None
+        return self.plan.truck_position(number - 1, query_time)
+
+    def trucks(self, query_time):
+        """
+        Returns every truck's position at a time.
+        """
+        return self.plan.all_truck_positions(query_time)
+
+
+class StatusServer:
+    def __init__(self, delivery_plan, host="127.0.0.1", port=8950):
+        """
+        Creates a server for a plan; call serve() (or start()) to accept connections.
+
+        Parameters:
+        delivery_plan (DeliveryPlan): The plan served until the first re-plan.
+        host (str): Address to listen on.
+        port (int): Port to listen on (0 to pick a free one; see port after start()).
+        """
+        self.snapshot = PlanSnapshot(delivery_plan, 1)
+        self.host = host
+        self.port = port
+        self.server = None
+        self.requests = 0  # Requests answered, across all connections
+        self._replanning = None  # The running re-plan task, if any
+
+    def publish(self, delivery_plan):
+        """
+        Swaps in a new plan. Requests already running finish on the old snapshot.
+
+        Returns:
+        PlanSnapshot: The new snapshot.
+        """
+        snapshot = PlanSnapshot(delivery_plan, self.snapshot.version + 1)
+        self.snapshot = snapshot
+        return snapshot
+
+    async def replan(self, build_plan):
+        """
+        Builds a new plan in a worker thread and publishes it, while the current snapshot keeps serving.
+        If a re-plan is already running, waits for it instead of starting another.
+
+        Parameters:
+        build_plan (callable): Returns a new DeliveryPlan; it must not modify the plan being served.
+
+        Returns:
+        PlanSnapshot: The published snapshot.
+        """
+        if self._replanning is None:
+            self._replanning = asyncio.ensure_future(self._replan(build_plan))
+        try:
+            return await asyncio.shield(self._replanning)
+        finally:
+            if self._replanning is not None and self._replanning.done():
+                self._replanning = None
+
+    async def _replan(self, build_plan):
+        delivery_plan = await asyncio.get_running_loop().run_in_executor(None, build_plan)
+        return self.publish(delivery_plan)
+
+    async def start(self):
+        """
+        Starts listening. The chosen port is stored in port.
+        """
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, limit=MAX_LINE)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve(self):
+        """
+        Listens and answers requests until cancelled.
+        """
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answers HTTP/1.1 requests on one connection until the client closes it or goes idle.
+        """
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                headers = await _read_headers(reader)
+                if headers is None:
+                    writer.write(_response(431, _encode({"error": "header line too long"}), False))
+                    break
+                parts = request_line.decode("latin-1").split()
+                version = parts[2] if len(parts) == 3 else "HTTP/1.0"
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                length = int(headers.get("content-length", "0") or 0)
+                if length:
+                    await reader.readexactly(length)  # Bodies are not used
+                if len(parts) != 3:
+                    status, body = 400, _encode({"error": "malformed request line"})
+                elif parts[0] != "GET":
+                    status, body = 405, _encode({"error": f"method {parts[0]} not allowed"})
+                else:
+                    status, body = self.route(parts[1])
+                writer.write(_response(status, body, keep_alive))
+                self.requests += 1
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # Client went away or sent something unreadable; drop the connection
+        finally:
+            writer.close()
+
+    def route(self, target):
+        """
+        Answers one GET request.
+
+        Parameters:
+        target (str): The request target, e.g. '/packages/9?time=10:30'.
+
+        Returns:
+        tuple: (HTTP status code, encoded JSON body)
+        """
+        snapshot = self.snapshot  # Read once: the whole request is answered from this plan
+        url = urlsplit(target)
+        path = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+        try:
+            query_time = parse_clock(query["time"][0]) if "time" in query else _time_of_day()
+        except ValueError as e:
+            return 400, _encode({"error": str(e)})
+
+        if path == ["snapshot"]:
+            return 200, _encode(snapshot.summary)
+        if path == ["packages"]:
+            return 200, snapshot.all_packages_body(query_time)
+        if path == ["trucks"]:
+            return 200, _encode(snapshot.trucks(query_time))
+        if len(path) == 2 and path[0] in ("packages", "trucks"):
+            try:
+                key = int(path[1])
+            except ValueError:
+                return 400, _encode({"error": f"invalid id '{path[1]}'"})
+            result = snapshot.package(key, query_time) if path[0] == "packages" else snapshot.truck(key, query_time)
+            if result is None:
+                return 404, _encode({"error": f"{path[0][:-1]} {key} not found"})
+            return 200, _encode(result)
+        return 404, _encode({"error": f"no such endpoint '{url.path}'"})
+
+
+def run_server(delivery_plan, host="127.0.0.1", port=8950, build_plan=None):
+    """
+    Serves a plan until interrupted. On SIGHUP, build_plan is run in a worker thread and its plan published.
+
+    Parameters:
+    delivery_plan (DeliveryPlan): The plan to serve first.
+    host (str): Address to listen on.
+    port (int): Port to listen on.
+    build_plan (callable): Returns a fresh DeliveryPlan (None to disable re-planning).
+    """
+    async def serve():
+        server = StatusServer(delivery_plan, host, port)
+        await server.start()
+        print(f"Serving package status on http://{host}:{server.port}", file=sys.stderr)
+        if build_plan is not None and hasattr(signal, "SIGHUP"):
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGHUP, lambda: asyncio.ensure_future(_replan_and_report(server, build_plan)))
+        async with server.server:
+            await server.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+async def _replan_and_report(server, build_plan):
+    try:
+        snapshot = await server.replan(build_plan)
+    except Exception as e:  # A failed re-plan leaves the current snapshot in service
+        print(f"Re-plan failed: {e}", file=sys.stderr)
+        return
+    print(f"Published plan version {snapshot.version}", file=sys.stderr)
+
+
+async def _read_headers(reader):
+    """
+    Reads header lines up to the blank line. Returns lower-cased name -> value, or None if a line is too long.
+    """
+    headers = {}
+    while True:
+        try:
+            line = await reader.readline()
+        except ValueError:
+            return None  # Longer than the stream limit
+        if line in (b"\r\n", b"\n", b""):
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+
+def _encode(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _response(status, body, keep_alive):
+    head = "HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n".format(
+        status, _REASONS[status], len(body), "keep-alive" if keep_alive else "close")
+    return head.encode("latin-1") + body
+
+
+def _time_of_day():
+    """
+    Returns the current local time in seconds since midnight.
+    """
+    now = time.localtime()
+    return now.tm_hour * 3600 + now.tm_min * 60 + now.tm_sec
@@ -0,0 +1,104 @@
+# This module defines the single time representation used by the simulation: integer seconds since midnight.
+# Clock strings ("10:30 AM", "09:05:00") are parsed once when data is read in and formatted only when
+# shown to the user, so the routing and status code works with plain integers.
+
+# Deadline of packages due at end of day ("EOD"); later than any real time, so slack stays positive
+EOD = 2 ** 31 - 1
+
+SECONDS_PER_HOUR = 3600
+
+
+def clock(hours, minutes=0, seconds=0):
+    """
+    Returns the time of day in seconds since midnight.
+
+    Parameters:
+    hours (int): Hour of the day (0-23).
+    minutes (int): Minutes past the hour.
+    seconds (int): Seconds past the minute.
+
+    Returns:
+    int: Seconds since midnight.
+    """
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def parse_clock(text):
+    """
+    Parses a clock time written as 'H:MM AM', 'H:MM:SS PM', 'HH:MM' or 'HH:MM:SS'.
+
+    Parameters:
+    text (str): The time to parse (case and surrounding spaces are ignored).
+
+    Returns:
+    int: Seconds since midnight.
+
+    Raises:
+    ValueError: If the text is not a valid clock time.
+    """
+    text = text.strip().upper()
+    suffix = None
+    if text.endswith("AM") or text.endswith("PM"):
+        suffix = text[-2:]
+        text = text[:-2].strip()
+    parts = text.split(":")
+    if not 2 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        raise ValueError(f"Invalid time '{text}'")
+    hours, minutes = int(parts[0]), int(parts[1])
+    seconds = int(parts[2]) if len(parts) == 3 else 0
+    if suffix is not None:
+        if not 1 <= hours <= 12:
+            raise ValueError(f"Invalid hour in '{text} {suffix}'")
+        hours = hours % 12 + (12 if suffix == "PM" else 0)
+    if hours > 23 or minutes > 59 or seconds > 59:
+        raise ValueError(f"Invalid time '{text}'")
+    return clock(hours, minutes, seconds)
+
+
+def parse_deadline(text):
+    """
+    Parses a package deadline.
+
+    Parameters:
+    text (str): The deadline from the package file, e.g. '10:30 AM' or 'EOD'.
+
+    Returns:
+    int: Seconds since midnight, or EOD for end-of-day and unreadable deadlines.
+    """
+    try:
+        return parse_clock(text)
+    except ValueError:
+        return EOD
+
+
+def travel_seconds(miles, travel_speed):
+    """
+    Returns the whole number of seconds needed to drive a distance.
+
+    Parameters:
+    miles (float): The distance to drive.
+    travel_speed (float): The speed in miles per hour.
+
+    Returns:
+    int: The driving time in seconds, rounded to the nearest second.
+    """
+    return int(round(miles * SECONDS_PER_HOUR / travel_speed))
+
+
+def format_clock(seconds):
+    """
+    Formats seconds since midnight as a 12-hour clock time (e.g., '10:20 AM').
+    """
+    if seconds == EOD:
+        return "EOD"
+    seconds = int(seconds)
+    hour, minute = seconds // 3600, seconds % 3600 // 60
+    return "{}:{:02d} {}".format((hour - 1) % 12 + 1, minute, "AM" if hour % 24 < 12 else "PM")
+
+
+def format_duration(seconds):
+    """
+    Formats seconds since midnight as 'H:MM:SS' (the way a timedelta prints).
+    """
+    seconds = int(seconds)
+    return "{}:{:02d}:{:02d}".format(seconds // 3600, seconds % 3600 // 60, seconds % 60)
@@ -0,0 +1,273 @@
+# This module records what happened to each package during the planned day.
+# The scheduler adds events (loaded, departed, delivered, address changed, ...) to a TimelineBuilder once;
+# build() freezes them into sorted integer-second NumPy arrays. "Status at time T" is then a binary
+# search per package, or one vectorized comparison for every package, and never changes a Parcel.
+from bisect import bisect_right
+
+import numpy as np
+
+# Event kinds
+LOADED = 0
+DEPARTED = 1
+DELIVERED = 2
+ADDRESS_CHANGED = 3
+RETURNED = 4  # Brought back to the hub undelivered
+CANCELLED = 5
+
+# Status codes returned by snapshot(), and their display names
+AT_HUB = 0
+EN_ROUTE = 1
+STATUS_DELIVERED = 2
+STATUS_CANCELLED = 3
+STATUS_NAMES = ("At Hub", "En route", "Delivered", "Cancelled")
+
+# Time used for events that never happen
+NEVER = np.iinfo(np.int64).max
+
+
+class TimelineBuilder:
+    def __init__(self):
+        """
+        Creates an empty, writable list of events.
+        """
+        self.events = []  # (time, parcel_id, kind, detail) tuples in the order they were added
+        self.addresses = {}  # Parcel id -> address at the start of the day
+
+    def set_initial_address(self, parcel_id, address):
+        """
+        Records the address a package has before any ADDRESS_CHANGED event.
+        """
+        self.addresses[parcel_id] = address
+
+    def add(self, parcel_id, time, kind, detail=None):
+        """
+        Adds an event.
+
+        Parameters:
+        parcel_id (int): The package the event belongs to.
+        time (int): Seconds since midnight at which the event happens.
+        kind (int): LOADED, DEPARTED, DELIVERED, ADDRESS_CHANGED, RETURNED or CANCELLED.
+        detail (object): Extra data, such as the new address for ADDRESS_CHANGED.
+        """
+        self.events.append((int(time), parcel_id, kind, detail))
+
+    def build(self):
+        """
+        Freezes the events into a DeliveryTimeline.
+
+        Returns:
+        DeliveryTimeline: The read-only timeline.
+        """
+        return DeliveryTimeline(self.events, self.addresses)
+
+
+class DeliveryTimeline:
+    def __init__(self, events, addresses):
+        """
+        Builds the sorted per-package and fleet-wide event arrays. Use TimelineBuilder.build() instead of
+        calling this directly.
+
+        Parameters:
+        events (list of tuple): (time, parcel_id, kind, detail) tuples in any order.
+        addresses (dict): Parcel id -> address at the start of the day.
+        """
+        # Stable sort: events at the same second keep the order they were added in
+        events = sorted(events, key=lambda event: event[0])
+        # Fleet-wide arrays, sorted by time
+        self.times = np.array([event[0] for event in events], dtype=np.int64)
+        self.parcel_ids = np.array([event[1] for event in events], dtype=np.int64)
+        self.kinds = np.array([event[2] for event in events], dtype=np.int8)
+        self.times.setflags(write=False)
+        self.parcel_ids.setflags(write=False)
+        self.kinds.setflags(write=False)
+
+        # Per-package event times (plain sorted lists for bisect) and address changes
+        self._package_times = {}
+        self._package_kinds = {}
+        self._address_changes = {}
+        for time, parcel_id, kind, detail in events:
+            self._package_times.setdefault(parcel_id, []).append(time)
+            self._package_kinds.setdefault(parcel_id, []).append(kind)
+            if kind == ADDRESS_CHANGED:
+                self._address_changes.setdefault(parcel_id, ([], []))
+                self._address_changes[parcel_id][0].append(time)
+                self._address_changes[parcel_id][1].append(detail)
+        self._initial_addresses = dict(addresses)
+
+        # One row per package with its departure and delivery times, for vectorized snapshots
+        self.package_ids = np.array(sorted(set(self._package_times) | set(addresses)), dtype=np.int64)
+        self.departed_at = np.full(len(self.package_ids), NEVER, dtype=np.int64)
+        self.delivered_at = np.full(len(self.package_ids), NEVER, dtype=np.int64)
+        self.cancelled_at = np.full(len(self.package_ids), NEVER, dtype=np.int64)
+        rows = np.searchsorted(self.package_ids, self.parcel_ids)
+        for kind, column in ((DEPARTED, self.departed_at), (DELIVERED, self.delivered_at),
+                             (CANCELLED, self.cancelled_at)):
+            mask = self.kinds == kind
+            # Events are sorted by time, so reversing keeps the first occurrence of each package
+            column[rows[mask][::-1]] = self.times[mask][::-1]
+            column.setflags(write=False)
+        self.package_ids.setflags(write=False)
+        # Packages that went back to the hub can leave more than once; snapshot() looks these up one by one
+        self._returned_rows = np.unique(rows[self.kinds == RETURNED])
+
+    def __len__(self):
+        """
+        Returns the number of events.
+        """
+        return len(self.times)
+
+    def status_code_at(self, parcel_id, time):
+        """
+        Returns AT_HUB, EN_ROUTE, STATUS_DELIVERED or STATUS_CANCELLED for one package at a time
+        (seconds since midnight).
+        """
+        times = self._package_times.get(parcel_id, ())
+        kinds = self._package_kinds.get(parcel_id, ())
+        status = AT_HUB
+        for kind in kinds[:bisect_right(times, time)]:
+            if status in (STATUS_DELIVERED, STATUS_CANCELLED):
+                break
+            if kind == DELIVERED:
+                status = STATUS_DELIVERED
+            elif kind == CANCELLED:
+                status = STATUS_CANCELLED
+            elif kind == DEPARTED:
+                status = EN_ROUTE
+            elif kind == RETURNED:
+                status = AT_HUB
+        return status
+
+    def status_at(self, parcel_id, time):
+        """
+        Returns the status name ("At Hub", "En route", "Delivered" or "Cancelled") of one package at a time.
+
+        Parameters:
+        parcel_id (int): The package to look up.
+        time (int): Seconds since midnight.
+
+        Returns:
+        str: The status name.
+        """
+        return STATUS_NAMES[self.status_code_at(parcel_id, time)]
+
+    def address_at(self, parcel_id, time):
+        """
+        Returns the delivery address of a package as known at a time.
+
+        Parameters:
+        parcel_id (int): The package to look up.
+        time (int): Seconds since midnight.
+
+        Returns:
+        str: The address, or None if the timeline has no address for the package.
+        """
+        changes = self._address_changes.get(parcel_id)
+        if changes is not None:
+            index = bisect_right(changes[0], time)
+            if index:
+                return changes[1][index - 1]
+        return self._initial_addresses.get(parcel_id)
+
+    def delivery_time(self, parcel_id):
+        """
+        Returns the delivery time of a package in seconds since midnight, or None if it is never delivered.
+        """
+        row = np.searchsorted(self.package_ids, parcel_id)
+        if row == len(self.package_ids) or self.package_ids[row] != parcel_id or self.delivered_at[row] == NEVER:
+            return None
+        return int(self.delivered_at[row])
+
+    def package_events(self, parcel_id):
+        """
+        Returns one package's events as (time, kind, detail) tuples in time order.
+        """
+        changes = iter(self._address_changes.get(parcel_id, ((), ()))[1])
+        return [(time, kind, next(changes) if kind == ADDRESS_CHANGED else None)
+                for time, kind in zip(self._package_times.get(parcel_id, ()), self._package_kinds.get(parcel_id, ()))]
+
+    def revised(self, package_events, addresses=None):
+        """
+        Returns a new timeline in which every event of some packages is replaced; this timeline is unchanged.
+        Only the replaced packages' rows are rebuilt, and the fleet-wide arrays are merged rather than re-sorted,
+        so a revision costs far less than building the timeline again.
+
+        Parameters:
+        package_events (dict): Parcel id -> list of (time, kind, detail) tuples, the package's complete events.
+        addresses (dict): Parcel id -> address at the start of the day, for packages new to the timeline.
+
+        Returns:
+        DeliveryTimeline: The revised timeline.
+        """
+        timeline = DeliveryTimeline.__new__(DeliveryTimeline)
+        new_events = sorted(((int(time), parcel_id, kind) for parcel_id, events in package_events.items()
+                             for time, kind, _ in events), key=lambda event: event[0])
+        new_times = np.array([event[0] for event in new_events], dtype=np.int64)
+        # Drop the replaced packages' events, then insert the new ones after any kept event at the same second
+        keep = ~np.isin(self.parcel_ids, np.fromiter(package_events, dtype=np.int64, count=len(package_events)))
+        times = self.times[keep]
+        positions = np.searchsorted(times, new_times, side="right")
+        timeline.times = np.insert(times, positions, new_times)
+        timeline.parcel_ids = np.insert(self.parcel_ids[keep], positions, [event[1] for event in new_events])
+        timeline.kinds = np.insert(self.kinds[keep], positions, [event[2] for event in new_events])
+
+        timeline._package_times = dict(self._package_times)
+        timeline._package_kinds = dict(self._package_kinds)
+        timeline._address_changes = dict(self._address_changes)
+        timeline._initial_addresses = dict(self._initial_addresses)
+        timeline._initial_addresses.update(addresses or {})
+        for parcel_id, events in package_events.items():
+            events = sorted(events, key=lambda event: event[0])
+            timeline._package_times[parcel_id] = [int(event[0]) for event in events]
+            timeline._package_kinds[parcel_id] = [event[1] for event in events]
+            changes = [event for event in events if event[1] == ADDRESS_CHANGED]
+            if changes:
+                timeline._address_changes[parcel_id] = ([int(event[0]) for event in changes],
+                                                        [event[2] for event in changes])
+            else:
+                timeline._address_changes.pop(parcel_id, None)
+
+        # Add rows for new packages, then refill the rows of the replaced ones
+        new_ids = np.setdiff1d(np.fromiter(set(package_events) | set(addresses or ()), dtype=np.int64),
+                               self.package_ids)
+        rows = np.searchsorted(self.package_ids, new_ids)
+        timeline.package_ids = np.insert(self.package_ids, rows, new_ids)
+        for kind, name in ((DEPARTED, "departed_at"), (DELIVERED, "delivered_at"), (CANCELLED, "cancelled_at")):
+            column = np.insert(getattr(self, name), rows, NEVER)
+            for parcel_id, events in package_events.items():
+                row = np.searchsorted(timeline.package_ids, parcel_id)
+                column[row] = min((int(time) for time, event_kind, _ in events if event_kind == kind), default=NEVER)
+            column.setflags(write=False)
+            setattr(timeline, name, column)
+        for array in (timeline.times, timeline.parcel_ids, timeline.kinds, timeline.package_ids):
+            array.setflags(write=False)
+        timeline._returned_rows = np.unique(np.searchsorted(timeline.package_ids,
+                                                            timeline.parcel_ids[timeline.kinds == RETURNED]))
+        return timeline
+
+    def snapshot(self, time):
+        """
+        Returns the status of every package at a time in one vectorized step.
+
+        Parameters:
+        time (int): Seconds since midnight.
+
+        Returns:
+        tuple: (package ids, status codes) as NumPy arrays sorted by package id.
+        """
+        status = np.where(self.delivered_at <= time, STATUS_DELIVERED,
+                          np.where(self.cancelled_at <= time, STATUS_CANCELLED,
+                                   np.where(self.departed_at <= time, EN_ROUTE, AT_HUB))).astype(np.int8)
+        for row in self._returned_rows:
+            status[row] = self.status_code_at(int(self.package_ids[row]), time)
+        return self.package_ids, status
+
+    def events_between(self, start, end):
+        """
+        Returns the fleet-wide events with start <= time < end.
+
+        Returns:
+        tuple: (times, parcel ids, kinds) as NumPy arrays sorted by time.
+        """
+        low, high = np.searchsorted(self.times, [start, end], side="left")
+        return self.times[low:high], self.parcel_ids[low:high], self.kinds[low:high]
+
@@ -1,8 +1,9 @@
 # This class models a delivery truck with attributes for its operation and status.
-import datetime
+from TimeModel import travel_seconds, format_duration
 
 class DeliveryTruck:
-    def __init__(self, max_capacity, travel_speed, current_load, package_ids, total_mileage, current_location, departure_time):
+    def __init__(self, max_capacity, travel_speed, current_load, package_ids, total_mileage, current_location, departure_time,
+                 current_address_id=None):
         """
         Creates a new DeliveryTruck object with specified parameters.
 
@@ -13,7 +14,8 @@ class DeliveryTruck:
         package_ids (list of int): List containing IDs of packages loaded onto the truck.
         total_mileage (float): Total distance covered by the truck (in miles).
         current_location (str): The truck's current location address.
-        departure_time (datetime.timedelta): The time when the truck departs from the base or hub.
+        departure_time (int): The time when the truck departs from the base or hub, in seconds since midnight.
+        current_address_id (int): Registry id of the truck's current location (None if not resolved).
         """
         self.max_capacity = max_capacity  # Maximum weight the truck can hold
         self.travel_speed = travel_speed  # The truck's speed (in miles per hour)
@@ -21,6 +23,7 @@ class DeliveryTruck:
         self.package_ids = package_ids  # IDs of the packages currently loaded
         self.total_mileage = total_mileage  # Total miles the truck has traveled
         self.current_location = current_location  # Truck's present address
+        self.current_address_id = current_address_id  # Registry id of the truck's present address
         self.departure_time = departure_time  # Time at which the truck starts its journey
         self.current_time = departure_time  # Initializes current time with the departure time
 
@@ -34,7 +37,7 @@ class DeliveryTruck:
         return "%d, %.2f, %.2f, %s, %.2f, %s, %s" % (
             self.max_capacity, self.travel_speed, self.current_load,
             self.package_ids, self.total_mileage, self.current_location,
-            str(self.current_time)  # Convert timedelta to string for representation
+            format_duration(self.current_time)  # Convert seconds to H:MM:SS for representation
         )
 
     def update_travel(self, distance):
@@ -44,6 +47,6 @@ class DeliveryTruck:
         Parameters:
         distance (float): Distance traveled (in miles).
         """
-        travel_time = datetime.timedelta(hours=distance / self.travel_speed)  # Calculate travel time
+        travel_time = travel_seconds(distance, self.travel_speed)  # Calculate travel time in whole seconds
         self.total_mileage += distance  # Update mileage
         self.current_time += travel_time  # Update current time
@@ -0,0 +1,270 @@
+# This module decides which truck carries each package.
+# The special-notes column of the package file is parsed into structured constraints
+# (truck pinning, delayed arrival, must-be-delivered-with groups, wrong address), and packages are
+# then assigned greedily: the most constrained packages first, each to the feasible truck whose
+# current stops are closest to it, with a repair step that frees room on full trucks.
+import re
+
+import numpy as np
+
+from TimeModel import EOD, parse_clock, travel_seconds
+
+_TRUCK_PATTERN = re.compile(r"only be on truck\s*(\d+)", re.IGNORECASE)
+_DELAY_PATTERN = re.compile(r"until\s*(\d{1,2}:\d{2}\s*[ap]m)", re.IGNORECASE)
+_GROUP_PATTERN = re.compile(r"delivered with\s*([\d,\s]+)", re.IGNORECASE)
+_WRONG_ADDRESS_PATTERN = re.compile(r"wrong address", re.IGNORECASE)
+
+
+class PackageConstraints:
+    def __init__(self, parcel_id, truck=None, available_time=0, delivered_with=(), wrong_address=False):
+        """
+        Holds the loading constraints of one package.
+
+        Parameters:
+        parcel_id (int): The id of the package.
+        truck (int): Number of the only truck allowed to carry the package (None if any truck may).
+        available_time (int): Seconds since midnight at which the package reaches the hub.
+        delivered_with (iterable of int): Ids of packages that must ride on the same truck.
+        wrong_address (bool): True if the listed address is wrong and will be corrected later in the day.
+        """
+        self.parcel_id = parcel_id  # Id of the package
+        self.truck = truck  # Pinned truck number
+        self.available_time = available_time  # Arrival at the hub
+        self.delivered_with = tuple(delivered_with)  # Co-delivery partners
+        self.wrong_address = wrong_address  # Address is waiting for a correction
+
+    def __str__(self):
+        """
+        Returns a string representation of the constraints.
+        """
+        return "{}, truck={}, available={}, with={}, wrong_address={}".format(
+            self.parcel_id, self.truck, self.available_time, list(self.delivered_with), self.wrong_address)
+
+
+def parse_special_note(parcel_id, note):
+    """
+    Parses the special-notes column of the package file.
+
+    Parameters:
+    parcel_id (int): The id of the package the note belongs to.
+    note (str): The note, e.g. "'Can only be on truck 2'" or "'Must be delivered with 15, 19'".
+
+    Returns:
+    PackageConstraints: The structured constraints (all defaults for an empty note).
+    """
+    constraints = PackageConstraints(parcel_id)
+    if not note:
+        return constraints
+    match = _TRUCK_PATTERN.search(note)
+    if match:
+        constraints.truck = int(match.group(1))
+    match = _DELAY_PATTERN.search(note)
+    if match:
+        constraints.available_time = parse_clock(match.group(1))
+    match = _GROUP_PATTERN.search(note)
+    if match:
+        constraints.delivered_with = tuple(int(part) for part in re.findall(r"\d+", match.group(1)))
+    constraints.wrong_address = bool(_WRONG_ADDRESS_PATTERN.search(note))
+    return constraints
+
+
+class TruckAssignment:
+    def __init__(self, package_ids, unassigned):
+        """
+        Holds the result of assign_packages.
+
+        Parameters:
+        package_ids (list of list of int): Package ids for each truck, in the order the trucks were given.
+        unassigned (dict): Package id -> reason it could not be placed on any truck.
+        """
+        self.package_ids = package_ids  # Package ids per truck
+        self.unassigned = unassigned  # Packages that could not be placed
+
+
+class LoadingUnit:
+    """
+    A set of packages that must travel together, with their combined constraints.
+    """
+    def __init__(self, parcel_ids):
+        self.parcel_ids = parcel_ids
+        self.truck = None
+        self.available_time = 0
+        self.deadline = EOD
+        self.address_ids = []
+
+
+def assign_packages(parcels, constraints, deadlines, trucks, distances, hub_address_id,
+                    address_correction_time=None):
+    """
+    Assigns packages to trucks.
+
+    A truck's max_capacity is the number of packages it can carry. A package can only go on a truck that
+    departs after the package reaches the hub (and, for a wrong address, after the correction time), on
+    its pinned truck if it has one, and together with its must-be-delivered-with group. Among the allowed
+    trucks, packages that could not make their deadline on a truck are kept off it when possible, and
+    the rest go to the truck already stopping nearest to them.
+
+    Parameters:
+    parcels (list of Parcel): The packages to load (their address_id must be resolved).
+    constraints (dict): Package id -> PackageConstraints (packages without an entry are unconstrained).
+    deadlines (dict): Package id -> deadline in seconds since midnight (EOD for end of day).
+    trucks (list of DeliveryTruck): The trucks; truck number k is trucks[k - 1].
+    distances (DistanceMatrix): The distances between addresses.
+    hub_address_id (int): The address id of the hub.
+    address_correction_time (int): Seconds since midnight at which wrong addresses are corrected.
+
+    Returns:
+    TruckAssignment: The package ids per truck and the packages that could not be placed.
+    """
+    units, unassigned = build_units(parcels, constraints, deadlines, address_correction_time)
+    departures = [truck.departure_time for truck in trucks]
+    free = [truck.max_capacity - len(truck.package_ids) for truck in trucks]
+    loads = [list(truck.package_ids) for truck in trucks]
+    # Distance from every address to the nearest stop already on each truck (the hub for an empty truck)
+    hub_row = distances.matrix[hub_address_id - distances.first_id]
+    nearest = np.repeat(hub_row[np.newaxis, :], len(trucks), axis=0)
+    truck_units = [[] for _ in trucks]
+
+    # Most constrained units first: pinned, then tight deadlines, then large groups
+    units.sort(key=lambda unit: (unit.truck is None, unit.deadline, -len(unit.parcel_ids)))
+    for unit in units:
+        allowed = _allowed_trucks(unit, trucks, departures)
+        placed = _place(unit, allowed, trucks, departures, free, nearest, distances, hub_address_id)
+        if placed is None:
+            placed = _repair(unit, allowed, departures, free, truck_units, nearest, distances, hub_row)
+        if placed is None:
+            for parcel_id in unit.parcel_ids:
+                unassigned[parcel_id] = "no truck with room that departs after the package is available"
+            continue
+        free[placed] -= len(unit.parcel_ids)
+        truck_units[placed].append(unit)
+        _add_stops(nearest, placed, unit, distances)
+
+    for index, assigned in enumerate(truck_units):
+        for unit in assigned:
+            loads[index].extend(unit.parcel_ids)
+    return TruckAssignment(loads, unassigned)
+
+
+def _add_stops(nearest, index, unit, distances):
+    """
+    Updates a truck's nearest-stop distances after the unit's addresses were added to it.
+    """
+    rows = distances.matrix[np.asarray(unit.address_ids) - distances.first_id]
+    nearest[index] = np.minimum(nearest[index], rows.min(axis=0))
+
+
+def build_units(parcels, constraints, deadlines, address_correction_time):
+    """
+    Merges must-be-delivered-with packages (transitively) into loading units.
+
+    Parameters:
+    parcels (list of Parcel): The packages (their address_id must be resolved).
+    constraints (dict): Package id -> PackageConstraints.
+    deadlines (dict): Package id -> deadline in seconds since midnight.
+    address_correction_time (int): Seconds since midnight at which wrong addresses are corrected.
+
+    Returns:
+    tuple: (list of LoadingUnit, dict of package id -> reason for packages that cannot be loaded)
+    """
+    by_id = {parcel.parcel_id: parcel for parcel in parcels}
+    parent = {parcel_id: parcel_id for parcel_id in by_id}
+
+    def find(parcel_id):
+        while parent[parcel_id] != parcel_id:
+            parent[parcel_id] = parent[parent[parcel_id]]
+            parcel_id = parent[parcel_id]
+        return parcel_id
+
+    for parcel_id in by_id:
+        package_constraints = constraints.get(parcel_id)
+        if package_constraints is None:
+            continue
+        for partner in package_constraints.delivered_with:
+            if partner in parent:
+                parent[find(partner)] = find(parcel_id)
+
+    groups = {}
+    for parcel_id in by_id:
+        groups.setdefault(find(parcel_id), []).append(parcel_id)
+
+    units = []
+    unassigned = {}
+    for parcel_ids in groups.values():
+        unit = LoadingUnit(sorted(parcel_ids))
+        for parcel_id in unit.parcel_ids:
+            parcel = by_id[parcel_id]
+            package_constraints = constraints.get(parcel_id) or PackageConstraints(parcel_id)
+            if package_constraints.truck is not None:
+                if unit.truck is not None and unit.truck != package_constraints.truck:
+                    unit.truck = -1  # Conflicting pins
+                else:
+                    unit.truck = package_constraints.truck
+            unit.available_time = max(unit.available_time, package_constraints.available_time)
+            if package_constraints.wrong_address and address_correction_time is not None:
+                unit.available_time = max(unit.available_time, address_correction_time)
+            unit.deadline = min(unit.deadline, deadlines.get(parcel_id, EOD))
+            unit.address_ids.append(parcel.address_id)
+        if unit.truck == -1:
+            for parcel_id in unit.parcel_ids:
+                unassigned[parcel_id] = "delivered-with group is pinned to different trucks"
+            continue
+        units.append(unit)
+    return units, unassigned
+
+
+def _allowed_trucks(unit, trucks, departures):
+    """
+    Returns the indices of the trucks that may carry the unit, ignoring capacity.
+    """
+    if unit.truck is not None:
+        candidates = [unit.truck - 1] if 0 < unit.truck <= len(trucks) else []
+    else:
+        candidates = range(len(trucks))
+    return [index for index in candidates if departures[index] >= unit.available_time]
+
+
+def _place(unit, allowed, trucks, departures, free, nearest, distances, hub_address_id):
+    """
+    Returns the index of the best allowed truck with room for the unit, or None.
+    Trucks on which a package would miss its deadline even when driven to first are used last.
+    """
+    best, best_cost = None, None
+    columns = np.asarray(unit.address_ids) - distances.first_id
+    for index in allowed:
+        if free[index] < len(unit.parcel_ids):
+            continue
+        direct_miles = distances.matrix[hub_address_id - distances.first_id, columns].max()
+        earliest_arrival = departures[index] + travel_seconds(direct_miles, trucks[index].travel_speed)
+        misses_deadline = earliest_arrival > unit.deadline
+        cost = (misses_deadline, float(nearest[index, columns].max()), departures[index])
+        if best_cost is None or cost < best_cost:
+            best, best_cost = index, cost
+    return best
+
+
+def _repair(unit, allowed, departures, free, truck_units, nearest, distances, hub_row):
+    """
+    Makes room for a unit on one of its allowed trucks by moving an unpinned unit to another truck.
+    Returns the index of the truck that now has room, or None.
+    """
+    for index in allowed:
+        needed = len(unit.parcel_ids) - free[index]
+        for other in sorted(truck_units[index], key=lambda candidate: len(candidate.parcel_ids)):
+            if other.truck is not None or len(other.parcel_ids) < needed:
+                continue
+            for target in range(len(truck_units)):
+                if (target != index and free[target] >= len(other.parcel_ids)
+                        and departures[target] >= other.available_time
+                        and departures[target] <= other.deadline):
+                    truck_units[index].remove(other)
+                    truck_units[target].append(other)
+                    free[index] += len(other.parcel_ids)
+                    free[target] -= len(other.parcel_ids)
+                    _add_stops(nearest, target, other, distances)
+                    # The truck lost stops, so its nearest-stop distances are rebuilt from the hub
+                    nearest[index] = hub_row
+                    for remaining in truck_units[index]:
+                        _add_stops(nearest, index, remaining, distances)
+                    return index
+    return None
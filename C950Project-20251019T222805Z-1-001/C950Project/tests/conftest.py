@@ -0,0 +1,68 @@
+# Shared fixtures for the tests: the project modules live one directory up, and small_dataset writes a
+# five-address day whose distances are easy to work out by hand, so expected times can be written down exactly.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from DeliveryPlanner import Dataset, DeliveryPlan, HUB_ADDRESS, default_trucks  # noqa: E402
+from FleetSimulator import FleetSimulator  # noqa: E402
+from Timeline import TimelineBuilder  # noqa: E402
+
+# Addresses of the small day, in file order; at 18 mph a 9-mile leg takes exactly 30 minutes
+SMALL_ADDRESSES = (HUB_ADDRESS, "100 East Street", "100 West Street", "110 East Street", "10 North Street")
+
+# Miles between the addresses above (hub at the origin, East at (9, 0), West at (-9, 0), the others nearby)
+SMALL_DISTANCES = (
+    (0, 9, 9, 9.1, 1),
+    (9, 0, 18, 1, 9.1),
+    (9, 18, 0, 18, 9.1),
+    (9.1, 1, 18, 0, 9),
+    (1, 9.1, 9.1, 9, 0),
+)
+
+# id, address index, deadline
+SMALL_PACKAGES = (
+    (1, 1, "8:30 AM"),
+    (2, 2, "EOD"),
+    (3, 2, "9:30 AM"),
+)
+
+
+@pytest.fixture
+def small_dataset(tmp_path):
+    """
+    Writes the small day's three CSV files and returns a Dataset reading them.
+    """
+    with open(tmp_path / "Addresses.csv", "w") as file:
+        file.writelines(f"{number},{address}\n" for number, address in enumerate(SMALL_ADDRESSES, 1))
+    with open(tmp_path / "Distances.csv", "w") as file:
+        file.writelines(",".join(str(miles) for miles in row) + "\n" for row in SMALL_DISTANCES)
+    with open(tmp_path / "Packages.csv", "w") as file:
+        file.writelines(f"{parcel_id},{SMALL_ADDRESSES[address]},Salt Lake City,UT,84115,{deadline},2 Kilos,,\n"
+                        for parcel_id, address, deadline in SMALL_PACKAGES)
+    return Dataset(str(tmp_path / "Addresses.csv"), str(tmp_path / "Distances.csv"), str(tmp_path / "Packages.csv"))
+
+
+@pytest.fixture
+def simulate():
+    """
+    Returns a function that simulates fixed trips, without the loader, into a DeliveryPlan.
+    """
+    def simulate(dataset, departures, trips, drivers=None, event_log=None):
+        trucks = default_trucks(dataset, departures)
+        hub_address_id = dataset.find_address_id(HUB_ADDRESS)
+        registry = dataset.address_registry
+        timeline_builder = TimelineBuilder()
+        for parcel_id, parcel in dataset.hash_table.items():
+            timeline_builder.set_initial_address(parcel_id, parcel.delivery_address)
+        simulator = FleetSimulator(dataset.shortest_paths.distances, hub_address_id, drivers=drivers, time_limit=0.05,
+                                   location_name=registry.address, address_ids=registry.get)
+        for truck, truck_trips in zip(trucks, trips):
+            truck.package_ids = [parcel_id for trip in truck_trips for parcel_id in trip]
+        simulation = simulator.run(trucks, dataset.hash_table, trips=trips, events=[],
+                                   timeline_builder=timeline_builder, event_log=event_log)
+        return DeliveryPlan(dataset, trucks, simulation, timeline_builder.build(), {}, simulator, event_log)
+    return simulate
@@ -0,0 +1,84 @@
+import os
+import shutil
+
+import pytest
+
+from DeliveryPlanner import DEFAULT_DATA_DIR, load_dataset, plan
+from HashTableCreation import PackageStoreMap
+from Package import Parcel
+
+SOURCES = ("Addresses.csv", "Distances.csv", "Packages.csv")
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """
+    A copy of the sample CSV files, so each test writes its own cache next to them.
+    """
+    for name in SOURCES:
+        shutil.copy(os.path.join(DEFAULT_DATA_DIR, name), tmp_path / name)
+    return tmp_path
+
+
+def load(data_dir):
+    dataset = load_dataset(*(str(data_dir / name) for name in SOURCES))
+    dataset.hash_table  # Opens or writes the cache
+    return dataset
+
+
+def test_restored_dataset_plans_like_the_csv_files(data_dir):
+    parsed = load(data_dir)
+    restored = load(data_dir)
+    assert not parsed.cache_hit and restored.cache_hit
+    table = restored.hash_table
+    assert isinstance(table, PackageStoreMap)
+    assert len(table) == len(parsed.hash_table) == 40
+    assert sorted(table) == sorted(parsed.hash_table)
+    assert str(table.lookup(9)) == str(parsed.hash_table.lookup(9))
+    assert table.find("zip", "84115") == parsed.hash_table.find("zip", "84115")
+    assert table.lookup(41) is None and 41 not in table
+
+    parsed_plan, restored_plan = plan(parsed, time_limit=0.05), plan(restored, time_limit=0.05)
+    assert restored_plan.total_mileage == pytest.approx(parsed_plan.total_mileage)
+    end_of_day = parsed_plan.finish_time
+    assert restored_plan.all_package_status(end_of_day) == parsed_plan.all_package_status(end_of_day)
+    assert table.find("status", "Delivered") == sorted(table)
+
+
+def test_cache_follows_source_changes(data_dir):
+    load(data_dir)
+    os.utime(data_dir / "Packages.csv")  # Touched but unchanged: the contents still match
+    assert load(data_dir).cache_hit
+
+    packages = data_dir / "Packages.csv"
+    packages.write_text(packages.read_text().replace("EOD,44 Kilos", "EOD,45 Kilos", 1))
+    changed = load(data_dir)
+    assert not changed.cache_hit
+    assert changed.hash_table.lookup(2).weight == 45.0
+
+    restored = load(data_dir)
+    assert restored.cache_hit
+    assert restored.hash_table.lookup(2).weight == 45.0
+
+def test_package_store_map_changes(data_dir):
+    load(data_dir)
+    table = load(data_dir).hash_table
+    store = table.store
+    assert table.find("status", "At Hub") == sorted(table)  # Builds the indexes
+
+    table.set_status(1, "Delivered")
+    table.remove_item(2)
+    table.remove_item(2)
+    parcel = Parcel(41, "4001 South 700 East", "Salt Lake City", "UT", "84107", "EOD", "3 Kilos", "En route")
+    table.insert(41, parcel)
+    replacement = Parcel(3, "233 Canyon Rd", "Salt Lake City", "UT", "84103", "EOD", "2 Kilos", "En route")
+    table.update(replacement)
+
+    assert len(table) == 40 and len(store) == 41
+    assert 2 not in table and table.lookup(2) is None and 2 not in list(table)
+    assert table.lookup(41).weight == 3.0
+    assert table.find("status", "Delivered") == [1]
+    assert table.find("status", "En route") == [3, 41]
+    assert table.find("status", "At Hub") == [key for key in range(4, 41)]
+    table.insert(2, table.lookup(4))  # A removed id comes back with the other package's fields
+    assert table.lookup(2).parcel_id == 2 and table.lookup(2).delivery_address == table.lookup(4).delivery_address
@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+from DeliveryPlanner import Dataset, plan
+from EventLog import EventLogWriter, LoggedState, RecoveredPlan, checkpoint_path, checkpoints, read_records, recover
+from Main import UserInterface
+from OnlineInsertion import insert_package
+from Package import Parcel
+from TimeModel import clock
+
+QUERY_TIMES = [clock(8), clock(8, 35), clock(9, 5), clock(9, 45), clock(10, 20), clock(10, 25), clock(11), clock(13)]
+
+
+@pytest.fixture(scope="module")
+def logged_day(tmp_path_factory):
+    """
+    The sample day planned with an event log that takes a checkpoint every 20 records.
+    """
+    log_path = str(tmp_path_factory.mktemp("log") / "day.log")
+    with EventLogWriter(log_path, batch_records=7, checkpoint_every=20) as event_log:
+        delivery_plan = plan(Dataset(), time_limit=0.05, event_log=event_log)
+    return delivery_plan, log_path
+
+
+def test_recover_until_matches_plan(logged_day):
+    delivery_plan, log_path = logged_day
+    assert len(checkpoints(log_path)) > 2
+    for query_time in QUERY_TIMES:
+        state, _ = recover(log_path, query_time)
+        for parcel_id in sorted(delivery_plan.dataset.hash_table):
+            expected = delivery_plan.package_status(parcel_id, query_time)
+            assert state.package_status(parcel_id)["status"] == expected["status"], (parcel_id, query_time)
+
+
+def test_recover_end_of_day(logged_day):
+    delivery_plan, log_path = logged_day
+    state, _ = recover(log_path)
+    assert state.records == len(read_records(log_path))
+    assert state.fleet.total_mileage == pytest.approx(delivery_plan.total_mileage)
+    assert all(state.package_status(parcel_id)["status"] == "Delivered"
+               for parcel_id in delivery_plan.dataset.hash_table)
+
+
+def test_recovered_plan_answers_like_the_plan(logged_day):
+    delivery_plan, log_path = logged_day
+    recovered = RecoveredPlan(Dataset(), log_path)
+    assert recovered.total_mileage == pytest.approx(delivery_plan.total_mileage)
+    for query_time in QUERY_TIMES:
+        assert recovered.all_package_status(query_time) == delivery_plan.all_package_status(query_time)
+    # The state at the end of the log is written onto the packages
+    assert recovered.dataset.hash_table.lookup(9).delivery_address == "410 S State St"
+    assert recovered.dataset.hash_table.lookup(9).status == "Delivered"
+
+
+def test_torn_last_record_is_ignored(logged_day, tmp_path):
+    _, log_path = logged_day
+    complete, _ = recover(log_path)
+    torn_path = str(tmp_path / "torn.log")
+    with open(log_path, "rb") as log_file:
+        data = log_file.read()
+    with open(torn_path, "wb") as torn_file:
+        torn_file.write(data[:-5])  # The last record loses its last bytes
+    first_checkpoint = checkpoints(log_path)[0][1]
+    with open(first_checkpoint, "rb") as checkpoint, open(checkpoint_path(torn_path, 0), "wb") as copy:
+        copy.write(checkpoint.read())
+
+    assert len(read_records(torn_path)) == complete.records - 1
+    state, replayed = recover(torn_path)
+    assert state.records == replayed == complete.records - 1
+    expected = LoggedState.load(first_checkpoint)
+    expected.apply_records(read_records(log_path)[:-1])
+    assert [state.package_status(parcel_id) for parcel_id in state.parcel_ids.tolist()] == \
+        [expected.package_status(parcel_id) for parcel_id in expected.parcel_ids.tolist()]
+
+
+def test_start_refuses_to_overwrite_a_log(logged_day, tmp_path):
+    delivery_plan, log_path = logged_day
+    copy_path = str(tmp_path / "copy.log")
+    with open(log_path, "rb") as log_file, open(copy_path, "wb") as copy:
+        copy.write(log_file.read())
+    size = os.path.getsize(copy_path)
+
+    with pytest.raises(FileExistsError):
+        EventLogWriter(copy_path).start(delivery_plan.dataset.hash_table, delivery_plan.trucks)
+    assert os.path.getsize(copy_path) == size
+
+    with EventLogWriter(copy_path, overwrite=True) as event_log:
+        event_log.start(delivery_plan.dataset.hash_table, delivery_plan.trucks)
+    assert len(read_records(copy_path)) == 0
+
+
+def test_plan_with_a_log_refuses_insertions(small_dataset, simulate, tmp_path):
+    log_path = str(tmp_path / "small.log")
+    with EventLogWriter(log_path) as event_log:
+        delivery_plan = simulate(small_dataset, [clock(8)], [[[1], [2]]], event_log=event_log)
+    parcel = Parcel(10, "110 East Street", "Salt Lake City", "UT", "84115", "EOD", "1 Kilos", "At Hub")
+    second_departure = delivery_plan.simulation.trips[1].departure_time
+
+    result = insert_package(delivery_plan, parcel)
+    assert not result.inserted
+    assert small_dataset.hash_table.lookup(10) is None
+    assert delivery_plan.simulation.trips[1].departure_time == second_departure
+    # The log still recovers the plan
+    recovered = RecoveredPlan(small_dataset, log_path)
+    assert recovered.all_package_status(clock(17)) == delivery_plan.all_package_status(clock(17))
+
+
+def test_mileage_line_for_a_recovered_plan(logged_day, capsys):
+    delivery_plan, log_path = logged_day
+    interface = UserInterface.__new__(UserInterface)  # Without the interactive loop
+    for shown in (delivery_plan, RecoveredPlan(Dataset(), log_path)):
+        interface.delivery_plan = shown
+        interface.display_combined_mileage()
+    planned, recovered = capsys.readouterr().out.splitlines()
+    assert "greedy route" in planned
+    assert recovered == f"Combined mileage for all trucks: {delivery_plan.total_mileage:.2f} miles"
@@ -0,0 +1,58 @@
+import pytest
+
+from HashTableCreation import HashMapCreation, OpenAddressingHashMap
+
+MAP_TYPES = [HashMapCreation, OpenAddressingHashMap]
+
+
+def capacity(table):
+    return len(table.list) if isinstance(table, HashMapCreation) else len(table.keys)
+
+
+@pytest.mark.parametrize("map_type", MAP_TYPES)
+def test_len_iter_and_contains_across_resize(map_type):
+    table = map_type(initial_cap=4)
+    capacities = set()
+    for key in range(1, 201):
+        table.insert(key, f"item {key}")
+        capacities.add(capacity(table))
+        assert len(table) == key
+        assert key in table
+        assert key + 1 not in table
+    assert len(capacities) > 1  # The table grew
+    assert sorted(table) == list(range(1, 201))
+    assert dict(table.items()) == {key: f"item {key}" for key in range(1, 201)}
+    assert all(table.lookup(key) == f"item {key}" for key in range(1, 201))
+
+
+@pytest.mark.parametrize("map_type", MAP_TYPES)
+def test_replace_and_remove_across_resize(map_type):
+    table = map_type(initial_cap=4)
+    for key in range(100):
+        table.insert(key, key)
+    for key in range(0, 100, 2):
+        table.insert(key, -key)  # Replacing does not add an entry
+    for key in range(1, 100, 4):
+        table.remove_item(key)
+    table.remove_item(1000)
+    for key in range(100, 300):
+        table.insert(key, key)  # Grows again after the removals
+
+    expected = {key: (-key if key < 100 and key % 2 == 0 else key) for key in range(300) if key % 4 != 1 or key >= 100}
+    assert len(table) == len(expected)
+    assert sorted(table) == sorted(expected)
+    assert all(key in table for key in expected)
+    assert not any(key in table for key in range(1, 100, 4))
+    assert dict(table.items()) == expected
+
+
+@pytest.mark.parametrize("map_type", MAP_TYPES)
+def test_bulk_insert_matches_insert(map_type):
+    pairs = [(key, str(key)) for key in range(500)]
+    one_by_one, bulk = map_type(), map_type()
+    for key, item in pairs:
+        one_by_one.insert(key, item)
+    bulk.insert(0, "old")
+    bulk.bulk_insert(pairs)
+    assert len(bulk) == len(one_by_one) == 500
+    assert dict(bulk.items()) == dict(one_by_one.items())
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from CsvIngest import IngestReport, stream_distances, stream_packages
+from DistanceMatrix import DistanceMatrix
+from HashTableCreation import HashMapCreation
+from PackageStore import PackageStore
+
+INF = np.inf
+
+# The same four addresses in every layout; 2-4 and 3-4 are unknown
+EXPECTED = np.array([[0, 5, 2, 7],
+                     [5, 0, 4, INF],
+                     [2, 4, 0, INF],
+                     [7, INF, INF, 0]])
+LAYOUTS = {
+    "square": "0,5,2,7\n5,0,4,\n2,4,0,\n7,,,0\n",
+    "triangle": "0\n5,0\n2,4,0\n7,,,0\n",
+    "numeric triples": "1,2,5.0\n1,3,2\n2,3,4\n4,1,7\n",
+    "named triples": "Hub,North,5.0\nHub,South,2\nNorth,South,4\nEast,Hub,7\n",
+}
+NAMES = {"Hub": 1, "North": 2, "South": 3, "East": 4}
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_stream_distances_reads_every_layout(tmp_path, layout):
+    path = write(tmp_path, "distances.csv", LAYOUTS[layout])
+    report = IngestReport()
+    matrix = stream_distances(path, report, address_ids=NAMES.get)
+    assert np.array_equal(matrix.matrix, EXPECTED)
+    assert np.array_equal(DistanceMatrix.from_csv(path, NAMES.get).matrix, EXPECTED)
+    assert report.error_count == 0
+    assert report.rows_accepted[path] == report.rows_read[path] == 4
+
+
+def test_stream_distances_reports_bad_triples(tmp_path):
+    path = write(tmp_path, "distances.csv", "1,2,5.0\n1,3,2\n2,3,4\n3,4,far\n4,1,7\n2,4\nNowhere,1,3\n0,1,3\n")
+    report = IngestReport()
+    matrix = stream_distances(path, report, address_ids=NAMES.get)
+    assert np.array_equal(matrix.matrix, EXPECTED)
+    assert [(error.line, error.field) for error in report.errors] == [(4, "distance"), (6, "row"), (7, "location"),
+                                                                      (8, "location")]
+    assert report.rows_read[path] == 8
+    assert report.rows_accepted[path] == 4
+
+
+def test_stream_distances_reports_bad_cells(tmp_path):
+    path = write(tmp_path, "distances.csv", "0\n5,0\n2,four,0\n7,,,0\n")
+    report = IngestReport()
+    matrix = stream_distances(path, report)
+    assert matrix.matrix[2, 1] == matrix.matrix[1, 2] == INF
+    assert [(error.line, error.field) for error in report.errors] == [(3, "distance")]
+
+
+def test_three_by_three_matrix_is_not_read_as_triples(tmp_path):
+    path = write(tmp_path, "distances.csv", "0,1,2\n1,0,3\n2,3,0\n")
+    matrix = stream_distances(path, IngestReport())
+    assert np.array_equal(matrix.matrix, [[0, 1, 2], [1, 0, 3], [2, 3, 0]])
+
+
+PACKAGES = """1,195 W Oakland Ave,Salt Lake City,UT,84115,10:30 AM,21 Kilos,,
+2,2530 S 500 E,Salt Lake City,UT,84106,EOD,44 Kilos,,
+two,233 Canyon Rd,Salt Lake City,UT,84103,EOD,2 Kilos,,
+3,233 Canyon Rd,Salt Lake City,UT,84103,EOD,2 Kilos,'Can only be on truck 2',
+4,380 W 2880 S,Salt Lake City,UT,84115,noonish,4 Kilos,,
+5,,Salt Lake City,UT,84111,EOD,5 Kilos,,
+6,410 S State St,Salt Lake City,UT
+1,300 State St,Salt Lake City,UT,84115,10:30 AM,9 Kilos,,
+7,410 S State St,Salt Lake City,UT,84111,EOD,heavy,,
+8,410 S State St,Salt Lake City,UT,84111,EOD,1 Kilos,,
+3,410 S State St,Salt Lake City,UT,84111,EOD,1 Kilos,,
+"""
+
+
+@pytest.mark.parametrize("chunk_size", [2, 3, 100])
+def test_stream_packages_rejects_bad_rows_and_duplicates(tmp_path, chunk_size):
+    path = write(tmp_path, "packages.csv", PACKAGES)
+    report = IngestReport()
+    store, hash_table, constraints = PackageStore(), HashMapCreation(), {}
+    stream_packages(path, store, report, hash_table=hash_table, constraints=constraints, chunk_size=chunk_size)
+
+    assert [(error.line, error.field) for error in report.errors] == [
+        (3, "parcel_id"), (5, "deadline"), (6, "address"), (7, "row"), (8, "parcel_id"), (9, "weight"),
+        (11, "parcel_id")]
+    assert report.rows_read[path] == 11
+    assert report.rows_accepted[path] == 4
+    assert len(store) == len(hash_table) == 4
+    assert sorted(hash_table) == [1, 2, 3, 8]
+    # The first row for an id is kept
+    assert hash_table.lookup(1).delivery_address == "195 W Oakland Ave"
+    assert hash_table.lookup(3).weight == 2.0
+    assert list(constraints) == [3]
@@ -0,0 +1,151 @@
+import json
+
+import pytest
+
+from DeliveryPlanner import Dataset, plan
+from OnlineInsertion import insert_package
+from Package import Parcel
+from StatusServer import PlanSnapshot
+from Timeline import DELIVERED, DEPARTED
+from TimeModel import clock, travel_seconds
+
+
+def new_parcel(parcel_id, address, deadline="EOD"):
+    return Parcel(parcel_id, address, "Salt Lake City", "UT", "84115", deadline, "1 Kilos", "At Hub")
+
+
+def truck_trips(delivery_plan, truck_index):
+    return [trip for trip in delivery_plan.simulation.trips if trip.truck_index == truck_index and trip.visited]
+
+
+def test_rejects_insertion_that_makes_a_later_stop_late(small_dataset, simulate):
+    delivery_plan = simulate(small_dataset, [clock(8)], [[[1]]])
+    trip = truck_trips(delivery_plan, 0)[0]
+    assert trip.visit_times[1] == clock(8, 30)
+
+    # Going there first makes package 1 (due 8:30) late; going there after it misses the new 8:10 deadline
+    result = insert_package(delivery_plan, new_parcel(10, "10 North Street", "8:10 AM"))
+    assert not result.inserted
+    assert small_dataset.hash_table.lookup(10) is None
+
+    result = insert_package(delivery_plan, new_parcel(11, "10 North Street"))
+    assert result.inserted
+    assert result.position == 2
+    assert trip.visit_times[1] == clock(8, 30)
+    assert result.delivery_time == clock(8, 30) + travel_seconds(9.1, 18)
+
+
+def test_delay_carries_over_to_later_trip(small_dataset, simulate):
+    delivery_plan = simulate(small_dataset, [clock(8)], [[[1], [2]]])
+    first, second = truck_trips(delivery_plan, 0)
+    assert second.departure_time == first.return_time == clock(9)
+    before = list(second.visit_times)
+
+    result = insert_package(delivery_plan, new_parcel(10, "110 East Street"))
+    assert result.trip is first
+    shift = travel_seconds(1, 18) + travel_seconds(9.1, 18) - travel_seconds(9, 18)
+    assert first.return_time == clock(9) + shift
+    assert second.departure_time == clock(9) + shift
+    assert second.visit_times == [time + shift for time in before]
+    assert small_dataset.hash_table.lookup(2).delivery_time == clock(9, 30) + shift
+    assert delivery_plan.timeline.delivery_time(2) == clock(9, 30) + shift
+
+
+def test_later_trip_deadline_blocks_insertion(small_dataset, simulate):
+    # Package 3 is due at 9:30 and the second trip reaches it at exactly 9:30, so the first trip cannot grow
+    delivery_plan = simulate(small_dataset, [clock(8)], [[[1], [3]]])
+    first, second = truck_trips(delivery_plan, 0)
+    assert second.visit_times[1] == clock(9, 30)
+
+    result = insert_package(delivery_plan, new_parcel(10, "110 East Street"))
+    assert result.trip is second
+    assert first.return_time == clock(9)
+    assert second.visit_times[1] == clock(9, 30)
+    assert delivery_plan.timeline.delivery_time(3) == clock(9, 30)
+
+
+@pytest.mark.parametrize("drivers, truck_index", [(None, 0), (1, 1)])
+def test_driver_limit_blocks_insertion(small_dataset, simulate, drivers, truck_index):
+    # With one driver, truck 2 leaves when truck 1 is back at 9:00; a later return would keep it waiting
+    delivery_plan = simulate(small_dataset, [clock(8), clock(8)], [[[1]], [[2]]], drivers=drivers)
+    if drivers == 1:
+        assert truck_trips(delivery_plan, 1)[0].departure_time == clock(9)
+
+    result = insert_package(delivery_plan, new_parcel(10, "110 East Street"))
+    assert result.truck_index == truck_index
+    if drivers == 1:
+        assert truck_trips(delivery_plan, 0)[0].return_time == clock(9)
+
+
+def test_no_status_before_the_package_reaches_the_hub(small_dataset, simulate):
+    delivery_plan = simulate(small_dataset, [clock(8), clock(9, 30)], [[[1]], [[2]]])
+
+    result = insert_package(delivery_plan, new_parcel(10, "10 North Street"), available_time=clock(9))
+    assert result.truck_index == 1
+    assert delivery_plan.package_status(10, clock(8, 30)) is None
+    assert 10 not in [row["id"] for row in delivery_plan.all_package_status(clock(8, 30))]
+    assert delivery_plan.package_status(10, clock(9, 15)) is not None
+
+
+@pytest.fixture(scope="module")
+def sample_plan():
+    """
+    The sample day with new packages inserted at some of its addresses.
+    """
+    dataset = Dataset()
+    delivery_plan = plan(dataset, time_limit=0.05)
+    addresses = sorted({parcel.delivery_address for _, parcel in dataset.hash_table.items()})
+    results = [insert_package(delivery_plan, new_parcel(100 + number, address))
+               for number, address in enumerate(addresses[::4])]
+    assert sum(result.inserted for result in results) >= 3
+    return delivery_plan, results
+
+
+def test_visit_times_match_distances_after_inserts(sample_plan):
+    delivery_plan, _ = sample_plan
+    distances = delivery_plan.simulator.distances
+    for trip in delivery_plan.simulation.trips:
+        if not trip.visited or trip.reroutes:
+            continue
+        speed = delivery_plan.trucks[trip.truck_index].travel_speed
+        assert trip.visit_times[0] == trip.departure_time
+        for stop in range(1, len(trip.visited)):
+            miles = distances.distance(trip.visited[stop - 1], trip.visited[stop])
+            assert trip.visit_times[stop] - trip.visit_times[stop - 1] == travel_seconds(miles, speed)
+
+
+def test_package_events_follow_moved_trips(sample_plan):
+    delivery_plan, _ = sample_plan
+    timeline = delivery_plan.timeline
+    for trip in delivery_plan.simulation.trips:
+        for visit, parcel_id, _ in trip.deliveries:
+            events = timeline.package_events(parcel_id)
+            assert (trip.visit_times[visit], DELIVERED, None) in events
+            assert (trip.departure_time, DEPARTED, None) in events
+            assert timeline.delivery_time(parcel_id) == trip.visit_times[visit]
+            assert delivery_plan.dataset.hash_table.lookup(parcel_id).delivery_time == trip.visit_times[visit]
+
+
+def test_inserted_package_is_stored_like_the_others(small_dataset, simulate):
+    delivery_plan = simulate(small_dataset, [clock(8)], [[[1, 2]]])
+    result = insert_package(delivery_plan, new_parcel(10, "110 East Street"))
+    assert result.inserted
+
+    store, hash_table = small_dataset.package_store, small_dataset.hash_table
+    assert len(store) == len(hash_table) == 4
+    inserted = hash_table.lookup(10)
+    assert inserted.weight == 1.0
+    assert inserted.delivery_time == result.delivery_time
+    assert hash_table.find("status", "Delivered") == [1, 2, 10]
+    compiled = small_dataset.compile()
+    assert compiled.arrays["package.parcel_id"].tolist() == [1, 2, 3, 10]
+
+
+def test_all_package_status_matches_each_package(sample_plan):
+    delivery_plan, _ = sample_plan
+    snapshot = PlanSnapshot(delivery_plan, 1)
+    for query_time in range(clock(8), clock(14), 600):
+        rows = delivery_plan.all_package_status(query_time)
+        assert rows == [delivery_plan.package_status(parcel_id, query_time)
+                        for parcel_id in sorted(delivery_plan.dataset.hash_table)]
+        assert json.loads(snapshot.all_packages_body(query_time)) == rows
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from DeliveryPlanner import Dataset
+from ScenarioRunner import Scenario, SharedDataset, attach, evaluate, run_scenarios
+
+SCENARIOS = [
+    {"name": "sample", "time_limit": 0.05},
+    {"name": "two drivers late", "departures": ["8:30 AM", "9:05 AM", "10:20 AM"], "time_limit": 0.05},
+    {"name": "fast", "travel_speed": 25, "time_limit": 0.05},
+    {"name": "pinned", "assignments": {"1": 2, "13": 1}, "time_limit": 0.05},
+]
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return Dataset()
+
+
+def ranked(results):
+    return [result.to_dict(rank) for rank, result in enumerate(results, 1)]
+
+
+def test_assignment_to_a_missing_truck_is_an_error(dataset):
+    scenarios = [Scenario.from_dict(spec) for spec in
+                 ({"name": "no truck 9", "assignments": {"1": 9}, "time_limit": 0.05},
+                  {"name": "no truck 0", "assignments": {"1": 0}, "time_limit": 0.05},
+                  {"name": "sample", "time_limit": 0.05})]
+    results = run_scenarios(dataset, scenarios, workers=0)
+    assert [result.name for result in results] == ["sample", "no truck 9", "no truck 0"]
+    assert results[0].error is None
+    assert results[1].error == "package 1 is assigned to truck 9, but the scenario has 3 trucks"
+    assert results[2].error == "package 1 is assigned to truck 0, but the scenario has 3 trucks"
+    assert results[1].total_mileage is None
+
+
+def test_process_pool_matches_in_process(dataset):
+    scenarios = [Scenario.from_dict(spec) for spec in SCENARIOS]
+    in_process = run_scenarios(dataset, scenarios, workers=0)
+    assert all(result.error is None for result in in_process)
+    assert ranked(run_scenarios(dataset, scenarios, workers=2, chunk_size=1)) == ranked(in_process)
+
+
+def test_shared_dataset_round_trip(dataset):
+    compiled = dataset.compile()
+    with SharedDataset(dataset) as shared:
+        attached = attach(shared.header, shared.specs)
+        assert attached.arrays.keys() == compiled.arrays.keys()
+        for name, array in compiled.arrays.items():
+            assert np.array_equal(attached.arrays[name], array), name
+            assert not attached.arrays[name].flags.writeable
+        delivery_times = attached.arrays["package.delivery_time"].copy()
+
+        # Planning on the attached arrays gives the in-process result and leaves the shared columns untouched
+        scenario = Scenario("sample", time_limit=0.05)
+        assert evaluate(attached, scenario).to_dict() == evaluate(compiled, scenario).to_dict()
+        assert np.array_equal(attached.arrays["package.delivery_time"], delivery_times)
+        restored = Dataset.from_compiled(attached)
+        assert sorted(restored.hash_table) == sorted(dataset.hash_table)
+        del attached, restored
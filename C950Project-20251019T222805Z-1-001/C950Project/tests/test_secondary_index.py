@@ -0,0 +1,102 @@
+import pytest
+
+from DeliveryPlanner import Dataset, plan
+from HashTableCreation import HashMapCreation, OpenAddressingHashMap
+from Package import Parcel
+from SecondaryIndex import SortedIndex
+from TimeModel import clock
+
+MAP_TYPES = [HashMapCreation, OpenAddressingHashMap]
+ZIPS = ("84115", "84106", "84111")
+DEADLINES = ("9:00 AM", "10:30 AM", "EOD")
+
+
+def make_parcel(parcel_id):
+    return Parcel(parcel_id, f"{parcel_id} Main St", "Salt Lake City", "UT", ZIPS[parcel_id % 3],
+                  DEADLINES[parcel_id % 3], "1 Kilos", "At Hub", address_id=parcel_id % 5 + 1)
+
+
+def expected(table, attribute, value):
+    return sorted(key for key, parcel in table.items() if getattr(parcel, attribute) == value)
+
+
+@pytest.mark.parametrize("map_type", MAP_TYPES)
+def test_indexes_follow_update(map_type):
+    table = map_type()
+    table.add_package_indexes()
+    for parcel_id in range(1, 41):
+        table.insert(parcel_id, make_parcel(parcel_id))
+    assert table.find("status", "At Hub") == list(range(1, 41))  # Builds the indexes
+
+    for parcel_id in range(1, 41, 3):
+        parcel = table.lookup(parcel_id)
+        parcel.status = "Delivered"
+        parcel.zipcode = "84121"
+        parcel.delivery_time = 36000 - parcel_id * 60
+        table.update(parcel)
+    table.set_status(2, "En route")
+    table.update(make_parcel(41))
+    table.remove_item(4)
+
+    for status in ("At Hub", "En route", "Delivered"):
+        assert table.find("status", status) == expected(table, "status", status)
+    for zipcode in ZIPS + ("84121",):
+        assert table.find("zip", zipcode) == expected(table, "zipcode", zipcode)
+    for address_id in range(1, 6):
+        assert table.find("address_id", address_id) == expected(table, "address_id", address_id)
+    delivered = sorted((parcel.delivery_time, key) for key, parcel in table.items() if parcel.delivery_time)
+    assert table.find_range("delivery_time") == [key for _, key in delivered]
+    assert table.find_range("delivery_time", 34000, 35000) == [key for time, key in delivered if 34000 <= time <= 35000]
+    assert 4 not in table.find_range("deadline")
+
+
+def test_find_range_across_block_splits():
+    class Item:
+        def __init__(self, value):
+            self.value = value
+
+    index = SortedIndex("value", block_size=2)
+    items = {key: Item((key * 7) % 50) for key in range(50)}
+    for key, item in items.items():
+        index.add(key, item)
+    assert len(index.blocks) > 5  # Blocks were split
+    assert all(len(block) <= 4 for block in index.blocks)
+
+    def expected_range(low, high):
+        return [key for value, key in sorted((item.value, key) for key, item in items.items())
+                if (low is None or value >= low) and (high is None or value <= high)]
+
+    for low, high in ((None, None), (10, 20), (0, 0), (49, None), (None, 3), (17, 16), (51, None)):
+        assert index.find_range(low, high) == expected_range(low, high)
+
+    # Moving and removing entries keeps the blocks in order
+    for key in range(0, 50, 3):
+        items[key].value += 100
+        index.add(key, items[key])
+    for key in range(1, 50, 5):
+        index.remove(key)
+        del items[key]
+    for low, high in ((None, None), (5, 30), (100, None), (40, 120)):
+        assert index.find_range(low, high) == expected_range(low, high)
+    pairs = [pair for block in index.blocks for pair in block]
+    assert pairs == sorted((item.value, key) for key, item in items.items())
+
+
+def test_plan_keeps_package_indexes_in_step():
+    dataset = Dataset()
+    delivery_plan = plan(dataset, time_limit=0.05)
+    table = dataset.hash_table
+    end_of_day = delivery_plan.finish_time
+    delivered = sorted(row["id"] for row in delivery_plan.all_package_status(end_of_day)
+                       if row["status"] == "Delivered")
+    assert delivered == sorted(table)
+    assert table.find("status", "Delivered") == delivered
+    assert table.find("status", "At Hub") == []
+    assert table.find_range("delivery_time") == [parcel_id for _, parcel_id in sorted(
+        (table.lookup(parcel_id).delivery_time, parcel_id) for parcel_id in delivered)]
+
+    # Package 9's address is corrected at 10:20 AM
+    corrected = dataset.find_address_id("410 S State St")
+    assert table.lookup(9).delivery_address == delivery_plan.package_status(9, clock(12))["address"]
+    assert 9 in table.find("address_id", corrected)
+    assert 9 not in table.find("address_id", dataset.find_address_id("300 State St"))